@@ -0,0 +1,20 @@
+"""
+Метрики в формате Prometheus: GET /metrics
+
+Требует заголовок X-Api-Key равный API_SECRET_TOKEN из .env
+(как /health/detailed).
+"""
+from __future__ import annotations
+from fastapi import APIRouter, Header, HTTPException
+from fastapi.responses import PlainTextResponse
+from app.core.config import settings
+from app.core.metrics import metrics
+
+router = APIRouter()
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics(x_api_key: str = Header(default="")) -> PlainTextResponse:
+    if settings.API_SECRET_TOKEN and x_api_key != settings.API_SECRET_TOKEN:
+        raise HTTPException(status_code=403, detail="Forbidden")
+    return PlainTextResponse(metrics.prometheus(), media_type="text/plain; version=0.0.4")
@@ -3,9 +3,11 @@ from aiogram.client.default import DefaultBotProperties
 from aiogram.enums import ParseMode
 from aiogram.fsm.storage.redis import RedisStorage
 from app.core.config import settings
+from app.core.fsm import FallbackStorage
 from app.middlewares.security import SecurityMiddleware
-from app.middlewares.rate_limit import RateLimitMiddleware
-from app.middlewares.logging import LoggingMiddleware
+from app.middlewares.context import UpdateContextMiddleware
+from app.middlewares.db import DbSessionMiddleware
+from app.middlewares.logging import LoggingMiddleware, TelegramTimingMiddleware, UpdateTimingMiddleware
 
 # Клиентские хендлеры
 from app.handlers.client import start, tariffs, my_vps
@@ -20,25 +22,36 @@ from app.handlers.payments import cryptobot, yukassa
 # Админ
 from app.handlers.admin import panel, users, broadcast
 from app.handlers.admin.promo import router as admin_promo_router
+from app.handlers.admin.perf import router as admin_perf_router
+from app.handlers.admin.errors import router as admin_errors_router
 
 
 def create_bot() -> Bot:
-    return Bot(
+    bot = Bot(
         token=settings.BOT_TOKEN,
         default=DefaultBotProperties(parse_mode=ParseMode.HTML),
     )
+    bot.session.middleware(TelegramTimingMiddleware())
+    return bot
 
 
 def create_dispatcher() -> Dispatcher:
-    storage = RedisStorage.from_url(settings.REDIS_URL)
+    # Redis недоступен — FSM в памяти, апдейты не падают (app.core.fsm)
+    storage = FallbackStorage(RedisStorage.from_url(settings.REDIS_URL))
     dp = Dispatcher(storage=storage)
 
     # ── Middlewares ─────────────────────────────────────────
-    dp.message.middleware(LoggingMiddleware())
+    # Время апдейта + разбивка DB/Redis/Telegram/Proxmox (app.core.metrics)
+    dp.update.outer_middleware(UpdateTimingMiddleware())
+    # Rate limit + lang/autorenew одним Redis pipeline — раньше Security,
+    # флуд отсекается до похода в БД
+    dp.update.outer_middleware(UpdateContextMiddleware())
+    # Одна сессия БД на апдейт (data["session"]), commit один раз в конце
+    dp.update.outer_middleware(DbSessionMiddleware())
     dp.message.middleware(SecurityMiddleware())
-    dp.message.middleware(RateLimitMiddleware())
+    dp.message.middleware(LoggingMiddleware())
     dp.callback_query.middleware(SecurityMiddleware())
-    dp.callback_query.middleware(RateLimitMiddleware())
+    dp.callback_query.middleware(LoggingMiddleware())
 
     # ── Client ──────────────────────────────────────────────
     dp.include_router(start.router)
@@ -54,6 +67,8 @@ def create_dispatcher() -> Dispatcher:
     dp.include_router(yukassa.router)
 
     # ── Admin ───────────────────────────────────────────────
+    dp.include_router(admin_perf_router)       # ДО users: тот ловит любой текст админа
+    dp.include_router(admin_errors_router)
     dp.include_router(panel.router)
     dp.include_router(users.router)
     dp.include_router(broadcast.router)
@@ -14,7 +14,9 @@ class Settings(BaseSettings):
 
     # ── Telegram ──────────────────────────────────────────────
     BOT_TOKEN: str
-    ADMIN_IDS: list[int] = Field(default_factory=list)
+    # Списки в .env — через запятую. «| str» в типе: иначе pydantic-settings
+    # разбирает значение как JSON и падает на «1,2» ещё до валидаторов внизу
+    ADMIN_IDS: list[int] | str = Field(default_factory=list)
     BOT_RUN_MODE: Literal["polling", "webhook"] = "polling"
 
     # ── Webhook ───────────────────────────────────────────────
@@ -51,7 +53,23 @@ class Settings(BaseSettings):
     PROXMOX_BRIDGE: str = "vmbr0"
     PROXMOX_GATEWAY: str = ""
     PROXMOX_TEMPLATE: str = "local:vztmpl/ubuntu-22.04-standard_22.04-1_amd64.tar.zst"
-    PROXMOX_IP_POOL: list[str] = Field(default_factory=list)
+    PROXMOX_IP_POOL: list[str] | str = Field(default_factory=list)
+    PROXMOX_POOL_SIZE: int = 10              # соединений к API (keep-alive)
+    PROXMOX_CONNECT_TIMEOUT: float = 3.0     # секунд
+    PROXMOX_READ_TIMEOUT: float = 5.0        # секунд на GET (статусы, карточки)
+    PROXMOX_WRITE_TIMEOUT: float = 30.0      # секунд на POST/DELETE (создание, удаление)
+    PROXMOX_BREAKER_FAILURES: int = 5        # ошибок подряд → circuit breaker открыт
+    PROXMOX_BREAKER_RESET: float = 30.0      # секунд до пробного запроса
+    PROXMOX_NODES: list[str] | str = Field(default_factory=list)  # разрешённые ноды; пусто — все online
+    PROXMOX_PLACEMENT: str = "spread"        # spread — на самую свободную, binpack — плотнее
+    PROXMOX_MAX_CPU_LOAD: float = 0.85       # ноды загруженнее — не кандидаты
+    PROXMOX_MEM_RESERVE_MB: int = 1024       # запас RAM на ноде сверх тарифа
+    PROXMOX_SNAPSHOT_INTERVAL: float = 5.0   # секунд между опросами /cluster/resources
+    PROXMOX_SNAPSHOT_MAX_AGE: float = 30.0   # секунд; старше — прямой запрос к ноде
+    PROXMOX_READ_CACHE_TTL: float = 2.0      # секунд кешируем GET (статус контейнера и т.п.)
+    PROXMOX_NODE_STATUS_TTL: float = 10.0    # секунд кешируем статус ноды
+    PROXMOX_TASK_TIMEOUT: float = 180.0      # секунд ждём задачу PVE (UPID)
+    PROXMOX_SSH_TIMEOUT: float = 60.0        # секунд ждём открытый 22 порт нового VPS
 
     # ── Payments: CryptoBot ───────────────────────────────────
     CRYPTOBOT_ENABLED: bool = False
@@ -70,8 +88,33 @@ class Settings(BaseSettings):
 
     # ── Security ──────────────────────────────────────────────
     API_SECRET_TOKEN: str = ""
+    RATE_LIMIT_WINDOW: int = 60         # секунд, общее окно для всех бакетов
     RATE_LIMIT_MESSAGES: int = 30
+    RATE_LIMIT_CALLBACKS: int = 60
     RATE_LIMIT_PAYMENTS: int = 5
+    RATE_LIMIT_PINGS: int = 5
+    RATE_LIMIT_LOCAL_SIZE: int = 100_000  # записей на бакет в локальном pre-filter
+
+    # ── Cache ─────────────────────────────────────────────────
+    USER_CACHE_SIZE: int = 50_000     # записей telegram_id → is_banned
+    USER_CACHE_TTL: int = 300         # секунд
+    RENDER_HASH_TTL: int = 3600       # секунд, хеш последнего edit_text сообщения
+
+    # ── Delivery (исходящие сообщения) ────────────────────────
+    DELIVERY_GLOBAL_RATE: float = 30.0   # сообщений/сек на бота
+    DELIVERY_CHAT_INTERVAL: float = 1.0  # секунд между сообщениями в один чат
+    DELIVERY_MAX_INFLIGHT: int = 30      # одновременных запросов к Bot API
+    DELIVERY_MAX_ATTEMPTS: int = 5       # повторов при сетевых/5xx ошибках
+    BROADCAST_CHUNK: int = 500           # получателей на пачку (шаг checkpoint)
+    BROADCAST_WORKERS: int = 30          # параллельных отправителей рассылки
+    UNREACHABLE_FLUSH_SIZE: int = 500    # пометок «недоступен» на один UPDATE
+    UNREACHABLE_FLUSH_INTERVAL: float = 5.0  # секунд между UPDATE
+
+    # ── Errors (агрегация необработанных ошибок) ──────────────
+    ERROR_ALERT_WINDOW: int = 600        # секунд: одно оповещение на отпечаток
+    ERROR_DIGEST_MINUTES: int = 60       # период дайджеста админам
+    ERROR_TRACK_MAX: int = 500           # отпечатков в памяти реплики
+    ERROR_TOP: int = 10                  # строк в /errors и дайджесте
 
     # ── Antifrod ──────────────────────────────────────────────
     MAX_VPS_PER_USER: int = 5
@@ -85,10 +128,14 @@ class Settings(BaseSettings):
     # ── Notifications ─────────────────────────────────────────
     NOTIFY_CHANNEL_ID: int | None = None
     NOTIFY_TOPIC_ID: int | None = None
+    NOTIFY_BURST_THRESHOLD: int = 5      # событий за окно — дальше дайджест
+    NOTIFY_BURST_WINDOW: float = 60.0    # секунд
+    NOTIFY_DIGEST_DELAY: float = 30.0    # секунд копим события в дайджест
 
     # ── Backup ────────────────────────────────────────────────
     AUTO_BACKUP_ENABLED: bool = False
     AUTO_BACKUP_HOUR: int = 3
+    BACKUP_PART_SIZE: int = 49 * 1024 * 1024  # байт; лимит загрузки Bot API — 50 МБ
 
     # ── Logs ──────────────────────────────────────────────────
     LOG_LEVEL: str = "INFO"
@@ -103,11 +150,13 @@ class Settings(BaseSettings):
     @field_validator("ADMIN_IDS", mode="before")
     @classmethod
     def parse_admin_ids(cls, v):
+        if isinstance(v, int):      # один id: «123» из .env — валидный JSON
+            return [v]
         if isinstance(v, str):
             return [int(x.strip()) for x in v.split(",") if x.strip()]
         return v
 
-    @field_validator("PROXMOX_IP_POOL", mode="before")
+    @field_validator("PROXMOX_IP_POOL", "PROXMOX_NODES", mode="before")
     @classmethod
     def parse_ip_pool(cls, v):
         if isinstance(v, str):
@@ -1,6 +1,9 @@
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Awaitable, Callable
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import DeclarativeBase
 from app.core.config import settings
+from app.core.metrics import instrument_engine
 import logging
 
 logger = logging.getLogger(__name__)
@@ -13,6 +16,8 @@ engine = create_async_engine(
     max_overflow=20,
 )
 
+instrument_engine(engine)
+
 AsyncSessionLocal = async_sessionmaker(
     engine,
     class_=AsyncSession,
@@ -40,3 +45,73 @@ async def init_db() -> None:
 async def get_session() -> AsyncSession:
     async with AsyncSessionLocal() as session:
         yield session
+
+
+# ── Unit of work ──────────────────────────────────────────────
+# Репозитории вызывают commit_or_flush(): вне unit_of_work — commit как
+# раньше, внутри — только flush, а commit один раз на выходе из блока.
+
+_UOW_KEY = "unit_of_work"
+_AFTER_COMMIT_KEY = "after_commit"
+
+
+@asynccontextmanager
+async def unit_of_work(session: AsyncSession | None = None) -> AsyncIterator[AsyncSession]:
+    """
+    Одна транзакция на несколько репозиториев.
+
+        async with unit_of_work() as session:
+            await VpsRepository(session).create(...)
+            await PaymentRepository(session).set_status(...)
+        # ← один COMMIT здесь, ROLLBACK при исключении
+
+    Без аргумента открывает новую сессию. Вложенный вызов на сессии,
+    которая уже в unit_of_work, ничего не коммитит — это делает внешний.
+    Для частичного отката внутри — session.begin_nested() (SAVEPOINT).
+    """
+    if session is None:
+        async with AsyncSessionLocal() as new_session:
+            async with unit_of_work(new_session) as s:
+                yield s
+        return
+
+    if session.info.get(_UOW_KEY):
+        yield session
+        return
+
+    session.info[_UOW_KEY] = True
+    try:
+        yield session
+        if session.in_transaction():
+            await session.commit()
+    except BaseException:
+        await session.rollback()
+        session.info.pop(_AFTER_COMMIT_KEY, None)
+        raise
+    finally:
+        session.info.pop(_UOW_KEY, None)
+
+    for callback in session.info.pop(_AFTER_COMMIT_KEY, []):
+        try:
+            await callback()
+        except Exception as e:
+            logger.warning(f"after_commit callback failed: {e}")
+
+
+async def commit_or_flush(session: AsyncSession) -> None:
+    """Commit вне unit_of_work, flush — внутри (commit сделает владелец транзакции)."""
+    if session.info.get(_UOW_KEY):
+        await session.flush()
+    else:
+        await session.commit()
+
+
+async def after_commit(session: AsyncSession, callback: Callable[[], Awaitable[None]]) -> None:
+    """
+    Выполнить callback после фиксации изменений: сразу, если сессия
+    не в unit_of_work (commit уже был), иначе — после commit блока.
+    """
+    if session.info.get(_UOW_KEY):
+        session.info.setdefault(_AFTER_COMMIT_KEY, []).append(callback)
+    else:
+        await callback()
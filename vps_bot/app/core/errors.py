@@ -2,7 +2,8 @@
 Глобальный обработчик ошибок.
 Ловит все необработанные исключения, логирует их
 и отправляет красивое сообщение пользователю.
-Критические ошибки отправляет администраторам.
+Необработанные ошибки агрегируются по отпечатку (services/error_tracker.py):
+админам — одно оповещение на отпечаток за окно, остальное — в дайджест.
 """
 from __future__ import annotations
 import logging
@@ -16,6 +17,9 @@ from aiogram.exceptions import (
     TelegramRetryAfter,
 )
 from app.core.config import settings
+from app.services.delivery import delivery
+from app.services.error_tracker import error_tracker, format_alert
+from app.services.reachability import unreachable
 
 logger = logging.getLogger(__name__)
 
@@ -42,12 +46,16 @@ def setup_error_handlers(dp: Dispatcher, bot: Bot) -> None:
         # ── Известные ошибки Telegram ────────────────────────
 
         if isinstance(exc, TelegramForbiddenError):
-            # Юзер заблокировал бота
+            # Юзер заблокировал бота — больше не тратим на него рассылки
             logger.info(f"User {user_id} blocked the bot")
+            if chat_id:
+                unreachable.mark(chat_id)
             return True
 
         if isinstance(exc, TelegramNotFound):
             logger.warning(f"Chat not found: {chat_id}")
+            if chat_id:
+                unreachable.mark(chat_id)
             return True
 
         if isinstance(exc, TelegramRetryAfter):
@@ -64,32 +72,27 @@ def setup_error_handlers(dp: Dispatcher, bot: Bot) -> None:
 
         # ── Неизвестная ошибка ───────────────────────────────
 
-        tb = traceback.format_exc()
-        logger.error(f"Unhandled error [{type(exc).__name__}]: {exc}\n{tb}")
+        stat, alert = await error_tracker.record(exc)
+        if stat.count == 1:
+            tb = "".join(traceback.format_exception(exc))
+            logger.error(f"Unhandled error [{type(exc).__name__}] {stat.fingerprint}: {exc}\n{tb}")
+        else:
+            logger.error(f"Unhandled error [{type(exc).__name__}] {stat.fingerprint} ×{stat.count}: {exc}")
 
         # Сообщаем пользователю
+        # Не ждём доставки: при шторме ошибок очередь сама держит лимиты
         if chat_id:
-            try:
-                await bot.send_message(
-                    chat_id,
-                    "⚠️ Что-то пошло не так. Попробуй ещё раз или напиши в поддержку.",
-                )
-            except Exception:
-                pass
+            delivery.send_message(
+                bot,
+                chat_id,
+                "⚠️ Что-то пошло не так. Попробуй ещё раз или напиши в поддержку.",
+                wait=False,
+            )
 
-        # Уведомляем администраторов о критических ошибках
-        short_tb = tb[-1500:] if len(tb) > 1500 else tb
-        admin_msg = (
-            f"🚨 <b>Unhandled Error</b>\n\n"
-            f"<b>Type:</b> {type(exc).__name__}\n"
-            f"<b>User:</b> {user_id}\n"
-            f"<b>Error:</b> {str(exc)[:300]}\n\n"
-            f"<pre>{short_tb}</pre>"
-        )
-        for admin_id in settings.ADMIN_IDS:
-            try:
-                await bot.send_message(admin_id, admin_msg)
-            except Exception:
-                pass
+        # Администраторам — один раз на отпечаток за окно, повторы уйдут в дайджест
+        if alert:
+            admin_msg = format_alert(stat, user_id)
+            for admin_id in settings.ADMIN_IDS:
+                delivery.send_message(bot, admin_id, admin_msg, wait=False)
 
         return True
@@ -0,0 +1,82 @@
+"""
+FSM-хранилище, которое переживает недоступный Redis.
+
+aiogram регистрирует FSMContextMiddleware в Dispatcher.__init__ — раньше
+всех наших outer-middleware — и на каждый апдейт читает состояние из
+хранилища. С голым RedisStorage падение Redis роняет любой апдейт ещё до
+rate limiter'а, и его degraded mode (services/rate_limiter.py) не срабатывает.
+
+FallbackStorage оборачивает RedisStorage: при ошибке Redis состояние и данные
+FSM читаются/пишутся в память процесса (MemoryStorage). Диалоги, начатые
+до сбоя, теряют шаг, но бот продолжает отвечать. Когда Redis возвращается,
+снова работаем через него; то, что было записано в память во время сбоя,
+там и остаётся до следующей записи.
+"""
+from __future__ import annotations
+import asyncio
+import logging
+from typing import Any
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+from redis.exceptions import RedisError
+
+logger = logging.getLogger(__name__)
+
+_REDIS_ERRORS = (RedisError, OSError, asyncio.TimeoutError)
+
+
+class FallbackStorage(BaseStorage):
+    def __init__(self, primary: BaseStorage) -> None:
+        self.primary = primary
+        self.fallback = MemoryStorage()
+        self.degraded = False
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        try:
+            await self.primary.set_state(key, state)
+            self._set_degraded(None)
+        except _REDIS_ERRORS as e:
+            self._set_degraded(e)
+            await self.fallback.set_state(key, state)
+
+    async def get_state(self, key: StorageKey) -> str | None:
+        try:
+            state = await self.primary.get_state(key)
+            self._set_degraded(None)
+            return state
+        except _REDIS_ERRORS as e:
+            self._set_degraded(e)
+            return await self.fallback.get_state(key)
+
+    async def set_data(self, key: StorageKey, data: dict[str, Any]) -> None:
+        try:
+            await self.primary.set_data(key, data)
+            self._set_degraded(None)
+        except _REDIS_ERRORS as e:
+            self._set_degraded(e)
+            await self.fallback.set_data(key, data)
+
+    async def get_data(self, key: StorageKey) -> dict[str, Any]:
+        try:
+            data = await self.primary.get_data(key)
+            self._set_degraded(None)
+            return data
+        except _REDIS_ERRORS as e:
+            self._set_degraded(e)
+            return await self.fallback.get_data(key)
+
+    async def close(self) -> None:
+        await self.fallback.close()
+        try:
+            await self.primary.close()
+        except _REDIS_ERRORS:
+            pass
+
+    def _set_degraded(self, error: Exception | None) -> None:
+        """Логируем только смену состояния, а не каждый апдейт."""
+        if error is not None and not self.degraded:
+            self.degraded = True
+            logger.warning(f"⚠️ FSM: Redis недоступен ({error}) — состояние в памяти процесса")
+        elif error is None and self.degraded:
+            self.degraded = False
+            logger.info("✅ FSM: Redis снова доступен")
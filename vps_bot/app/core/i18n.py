@@ -4,12 +4,18 @@
 Использование:
     from app.core.i18n import t, get_lang, set_lang
 
-    lang = await get_lang(telegram_id)
+    lang = await get_lang(telegram_id)   # в хендлерах язык уже есть в data["lang"]
     text = t("welcome", lang).format(name="Иван")
     await set_lang(telegram_id, "en")
+
+STRINGS компилируется при импорте в плоский каталог lang → key → строка
+с уже применённым fallback на DEFAULT_LANG: t() — два dict-lookup без
+цепочки .get(). Плейсхолдеры {name} разбираются там же, и расхождение
+между языками видно в логе сразу при старте, а не на живом юзере.
 """
 from __future__ import annotations
 import logging
+from string import Formatter
 from app.core.redis import get_redis
 
 logger = logging.getLogger(__name__)
@@ -152,20 +158,49 @@ STRINGS: dict[str, dict[str, str]] = {
 }
 
 DEFAULT_LANG = "ru"
+LANGS = ("ru", "en")
+
+
+def _fields(template: str) -> frozenset[str]:
+    return frozenset(name for _, name, _, _ in Formatter().parse(template) if name)
+
+
+def compile_catalog(strings: dict[str, dict[str, str]]) -> dict[str, dict[str, str]]:
+    """STRINGS (key → lang → text) → каталог (lang → key → text) с fallback."""
+    catalog: dict[str, dict[str, str]] = {lang: {} for lang in LANGS}
+    for key, variants in strings.items():
+        default = variants.get(DEFAULT_LANG) or f"[{key}]"
+        expected = _fields(default)
+        for lang in LANGS:
+            text = variants.get(lang) or default
+            if _fields(text) != expected:
+                logger.warning(f"i18n: placeholders differ in {key!r} ({lang}): {sorted(_fields(text))}")
+            catalog[lang][key] = text
+    return catalog
+
+
+_CATALOG = compile_catalog(STRINGS)
 
 
 def t(key: str, lang: str = DEFAULT_LANG) -> str:
     """Получить перевод по ключу."""
-    strings = STRINGS.get(key, {})
-    return strings.get(lang) or strings.get(DEFAULT_LANG) or f"[{key}]"
+    return (_CATALOG.get(lang) or _CATALOG[DEFAULT_LANG]).get(key) or f"[{key}]"
+
+
+def lang_key(telegram_id: int) -> str:
+    return f"lang:{telegram_id}"
+
+
+def parse_lang(val: str | None) -> str:
+    """Значение из Redis → поддерживаемый язык."""
+    return val if val in LANGS else DEFAULT_LANG
 
 
 async def get_lang(telegram_id: int) -> str:
     """Получить язык пользователя из Redis."""
     try:
         redis = await get_redis()
-        val = await redis.get(f"lang:{telegram_id}")
-        return val if val in ("ru", "en") else DEFAULT_LANG
+        return parse_lang(await redis.get(lang_key(telegram_id)))
     except Exception:
         return DEFAULT_LANG
 
@@ -174,6 +209,6 @@ async def set_lang(telegram_id: int, lang: str) -> None:
     """Сохранить язык пользователя в Redis."""
     try:
         redis = await get_redis()
-        await redis.set(f"lang:{telegram_id}", lang, ex=86400 * 365)
+        await redis.set(lang_key(telegram_id), lang, ex=86400 * 365)
     except Exception as e:
         logger.warning(f"set_lang failed: {e}")
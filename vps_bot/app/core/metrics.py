@@ -0,0 +1,193 @@
+"""
+In-process метрики: гистограммы латентности и счётчики.
+
+Histogram — HDR-подобные log-linear бакеты (~4% относительной ошибки),
+фиксированная память, p50/p95/p99 без хранения сырых значений.
+
+Что меряем:
+  handler / router       — LoggingMiddleware (сообщения и кнопки)
+  update.total           — весь апдейт целиком (UpdateTimingMiddleware)
+  io.db / io.redis / io.telegram / io.proxmox
+                         — каждый вызов внешней системы
+  update.db / ...        — суммарно на апдейт (breakdown через ContextVar)
+
+Отдаются через GET /metrics (Prometheus text) и админскую команду /perf.
+
+Использование:
+    with metrics.timed("proxmox"):
+        await ...
+    metrics.inc("render.skipped")
+"""
+from __future__ import annotations
+import logging
+import math
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator
+
+logger = logging.getLogger(__name__)
+
+# Компоненты I/O, по которым строится разбивка апдейта
+IO_COMPONENTS = ("db", "redis", "telegram", "proxmox")
+
+# Разбивка текущего апдейта: компонент → мс. None вне апдейта.
+_breakdown: ContextVar[dict[str, float] | None] = ContextVar("metrics_breakdown", default=None)
+
+
+class Histogram:
+    """
+    Log-linear гистограмма в миллисекундах: SUB_BUCKETS бакетов на
+    каждую степень двойки от MIN_MS до MAX_MS (значения вне — в крайние).
+    """
+    __slots__ = ("counts", "count", "total", "max")
+
+    MIN_MS = 0.01
+    MAX_MS = 120_000.0
+    SUB_BUCKETS = 16
+    _SIZE = math.ceil(math.log2(MAX_MS / MIN_MS) * SUB_BUCKETS) + 1
+
+    def __init__(self) -> None:
+        self.counts = [0] * self._SIZE
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    @classmethod
+    def _index(cls, ms: float) -> int:
+        if ms <= cls.MIN_MS:
+            return 0
+        return min(cls._SIZE - 1, int(math.log2(ms / cls.MIN_MS) * cls.SUB_BUCKETS))
+
+    @classmethod
+    def _upper(cls, index: int) -> float:
+        return cls.MIN_MS * 2 ** ((index + 1) / cls.SUB_BUCKETS)
+
+    def record(self, ms: float) -> None:
+        self.counts[self._index(ms)] += 1
+        self.count += 1
+        self.total += ms
+        if ms > self.max:
+            self.max = ms
+
+    def quantile(self, q: float) -> float:
+        """Верхняя граница бакета, в который попал q-квантиль (не больше max)."""
+        if not self.count:
+            return 0.0
+        rank = max(1, math.ceil(q * self.count))
+        seen = 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if seen >= rank:
+                return min(self._upper(i), self.max)
+        return self.max
+
+
+class Metrics:
+    def __init__(self) -> None:
+        self.histograms: dict[tuple[str, str], Histogram] = {}
+        self.counters: dict[str, int] = {}
+        self.started_at = time.time()
+
+    def observe(self, kind: str, name: str, ms: float) -> None:
+        key = (kind, name)
+        hist = self.histograms.get(key)
+        if hist is None:
+            hist = self.histograms[key] = Histogram()
+        hist.record(ms)
+
+    def inc(self, name: str, value: int = 1) -> None:
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe_io(self, component: str, ms: float, endpoint: str | None = None) -> None:
+        """Вызов внешней системы: общая гистограмма + вклад в разбивку апдейта."""
+        self.observe("io", component, ms)
+        if endpoint:
+            self.observe(f"io.{component}", endpoint, ms)
+        current = _breakdown.get()
+        if current is not None:
+            current[component] = current.get(component, 0.0) + ms
+
+    @contextmanager
+    def timed(self, component: str, endpoint: str | None = None) -> Iterator[None]:
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe_io(component, (time.perf_counter() - t0) * 1000, endpoint)
+
+    @contextmanager
+    def track_update(self, event_type: str) -> Iterator[dict[str, float]]:
+        """Открыть разбивку для апдейта; на выходе записать total и доли I/O."""
+        parts: dict[str, float] = {}
+        token = _breakdown.set(parts)
+        t0 = time.perf_counter()
+        try:
+            yield parts
+        finally:
+            _breakdown.reset(token)
+            total = (time.perf_counter() - t0) * 1000
+            self.observe("update", "total", total)
+            self.observe("update", event_type, total)
+            for component in IO_COMPONENTS:
+                self.observe("update", component, parts.get(component, 0.0))
+
+    # ── Экспорт ───────────────────────────────────────────
+
+    def snapshot(self, kind: str | None = None) -> list[tuple[str, str, Histogram]]:
+        return sorted(
+            (k, n, h) for (k, n), h in self.histograms.items()
+            if kind is None or k == kind
+        )
+
+    def prometheus(self) -> str:
+        """Текстовый формат Prometheus: summary с квантилями + counters."""
+        lines = [
+            "# TYPE bot_latency_ms summary",
+        ]
+        for kind, name, h in self.snapshot():
+            labels = f'kind="{_escape(kind)}",name="{_escape(name)}"'
+            for q in (0.5, 0.95, 0.99):
+                lines.append(f'bot_latency_ms{{{labels},quantile="{q}"}} {h.quantile(q):.3f}')
+            lines.append(f"bot_latency_ms_sum{{{labels}}} {h.total:.3f}")
+            lines.append(f"bot_latency_ms_count{{{labels}}} {h.count}")
+        lines.append("# TYPE bot_events_total counter")
+        for name, value in sorted(self.counters.items()):
+            lines.append(f'bot_events_total{{name="{_escape(name)}"}} {value}')
+        lines.append("# TYPE bot_uptime_seconds gauge")
+        lines.append(f"bot_uptime_seconds {time.time() - self.started_at:.0f}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self) -> None:
+        self.histograms.clear()
+        self.counters.clear()
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ")
+
+
+metrics = Metrics()
+
+
+# ── Инструментирование ────────────────────────────────────────
+
+def instrument_engine(engine) -> None:
+    """Время каждого SQL-запроса → io.db (события SQLAlchemy на sync_engine)."""
+    from sqlalchemy import event
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_t0", []).append(time.perf_counter())
+
+    @event.listens_for(engine.sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        stack = conn.info.get("metrics_t0")
+        if stack:
+            metrics.observe_io("db", (time.perf_counter() - stack.pop()) * 1000)
+
+    @event.listens_for(engine.sync_engine, "handle_error")
+    def _error(context):
+        stack = context.connection.info.get("metrics_t0") if context.connection else None
+        if stack:
+            stack.pop()
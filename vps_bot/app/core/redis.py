@@ -1,14 +1,35 @@
 import logging
-from redis.asyncio import Redis, from_url
+from redis.asyncio import Redis
+from redis.asyncio.client import Pipeline
 from app.core.config import settings
+from app.core.metrics import metrics
 
 logger = logging.getLogger(__name__)
 redis: Redis | None = None
 
 
+class InstrumentedRedis(Redis):
+    """Redis-клиент, который пишет время каждой команды/pipeline в metrics (io.redis)."""
+
+    async def execute_command(self, *args, **options):
+        with metrics.timed("redis"):
+            return await super().execute_command(*args, **options)
+
+    def pipeline(self, transaction: bool = True, shard_hint: str | None = None) -> Pipeline:
+        return InstrumentedPipeline(
+            self.connection_pool, self.response_callbacks, transaction, shard_hint,
+        )
+
+
+class InstrumentedPipeline(Pipeline):
+    async def execute(self, raise_on_error: bool = True):
+        with metrics.timed("redis"):
+            return await super().execute(raise_on_error)
+
+
 async def init_redis() -> None:
     global redis
-    redis = from_url(settings.REDIS_URL, encoding="utf-8", decode_responses=True)
+    redis = InstrumentedRedis.from_url(settings.REDIS_URL, encoding="utf-8", decode_responses=True)
     await redis.ping()
     logger.info("✅ Redis connected")
 
@@ -1,6 +1,7 @@
 import logging
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.interval import IntervalTrigger
 from aiogram import Bot
 from app.core.config import settings, TARIFFS
 
@@ -8,50 +9,99 @@ logger = logging.getLogger(__name__)
 scheduler = AsyncIOScheduler(timezone=settings.TZ)
 
 
+def _render_expiring(days: int, rows: list) -> str:
+    """Напоминание одному пользователю — по всем его истекающим VPS."""
+    emoji = "⚠️" if days == 3 else "🚨"
+    when = f"{days} {'дня' if days == 3 else 'день'}"
+    if len(rows) == 1:
+        vps = rows[0]
+        t = TARIFFS.get(vps.tariff, {})
+        return (
+            f"{emoji} <b>Твой VPS истекает через {when}!</b>\n\n"
+            f"🌐 IP: <code>{vps.ip}</code>\n"
+            f"📅 Истекает: <b>{vps.expires_at.strftime('%d.%m.%Y')}</b>\n\n"
+            f"💰 Продли сейчас:\n"
+            f"  • Карта РФ: <b>{t.get('price_rub', '?')} ₽</b>\n"
+            f"  • USDT: <b>{t.get('price_usdt', '?')}</b>\n\n"
+            f"👉 /start → Мои серверы → Продлить"
+        )
+    lines = []
+    for vps in rows:
+        t = TARIFFS.get(vps.tariff, {})
+        lines.append(
+            f"• <code>{vps.ip}</code> — до <b>{vps.expires_at.strftime('%d.%m.%Y')}</b>, "
+            f"{t.get('price_rub', '?')} ₽ / {t.get('price_usdt', '?')} USDT"
+        )
+    return (
+        f"{emoji} <b>{len(rows)} твоих VPS истекают через {when}!</b>\n\n"
+        + "\n".join(lines)
+        + "\n\n👉 /start → Мои серверы → Продлить"
+    )
+
+
+def _render_deleted(ips: list[str]) -> str:
+    if len(ips) == 1:
+        return (
+            f"❌ <b>Сервер удалён</b>\n\n"
+            f"VPS <code>{ips[0]}</code> удалён — срок истёк.\n"
+            f"Купи новый: /start → Тарифы"
+        )
+    return (
+        f"❌ <b>Серверы удалены ({len(ips)})</b>\n\n"
+        + "\n".join(f"• <code>{ip}</code>" for ip in ips)
+        + "\n\nСрок истёк. Купи новый: /start → Тарифы"
+    )
+
+
 async def _notify_expiring(bot: Bot) -> None:
-    """Напоминания за 3 дня и 1 день до истечения."""
+    """Напоминания за 3 дня и 1 день до истечения — одно сообщение на пользователя."""
+    from functools import partial
     from app.repositories.vps import VpsRepository
     from app.core.database import AsyncSessionLocal
+    from app.services.delivery import Priority
+    from app.services.user_notices import UserNotices
 
     async with AsyncSessionLocal() as session:
         repo = VpsRepository(session)
         for days in (3, 1):
-            rows = await repo.get_expiring(days)
-            for vps in rows:
-                t = TARIFFS.get(vps.tariff, {})
-                emoji = "⚠️" if days == 3 else "🚨"
-                text = (
-                    f"{emoji} <b>Твой VPS истекает через {days} {'дня' if days == 3 else 'день'}!</b>\n\n"
-                    f"🌐 IP: <code>{vps.ip}</code>\n"
-                    f"📅 Истекает: <b>{vps.expires_at.strftime('%d.%m.%Y')}</b>\n\n"
-                    f"💰 Продли сейчас:\n"
-                    f"  • Карта РФ: <b>{t.get('price_rub', '?')} ₽</b>\n"
-                    f"  • USDT: <b>{t.get('price_usdt', '?')}</b>\n\n"
-                    f"👉 /start → Мои серверы → Продлить"
-                )
+            notices = UserNotices()
+            for vps in await repo.get_expiring(days):
+                notices.add(vps.telegram_id, vps)
+            # Ставим всю пачку в очередь доставки, отмечаем только доставленные
+            pending = notices.send(bot, partial(_render_expiring, days), priority=Priority.REMINDER)
+            for telegram_id, rows, sent in pending:
                 try:
-                    await bot.send_message(vps.telegram_id, text)
-                    await repo.mark_reminded(vps.id, days)
+                    await sent
+                    for vps in rows:
+                        await repo.mark_reminded(vps.id, days)
                 except Exception as e:
-                    logger.warning(f"Reminder failed for {vps.telegram_id}: {e}")
+                    logger.warning(f"Reminder failed for {telegram_id}: {e}")
 
 
 async def _delete_expired(bot: Bot) -> None:
     """Удаление истёкших VPS."""
+    from app.repositories.user import UserRepository
     from app.repositories.vps import VpsRepository
     from app.services.proxmox import proxmox_service
-    from app.core.database import AsyncSessionLocal
+    from app.core.database import AsyncSessionLocal, unit_of_work
     from app.services.n8n import n8n_notify
     from app.services.notify import notify_vps_expired
+    from app.services.delivery import Priority
+    from app.services.user_notices import UserNotices
 
     async with AsyncSessionLocal() as session:
         repo = VpsRepository(session)
         expired = await repo.get_expired()
+        # Удаляем всё, но недоступным чатам уведомление не шлём
+        unreachable = await UserRepository(session).get_unreachable(
+            list({vps.telegram_id for vps in expired})
+        )
 
+    notices = UserNotices()
     for vps in expired:
         try:
-            await proxmox_service.delete_lxc(vps.vmid)
-            async with AsyncSessionLocal() as session:
+            await proxmox_service.delete_lxc(vps.vmid, node=vps.node)
+            async with unit_of_work() as session:
                 await VpsRepository(session).mark_deleted(vps.id)
                 await VpsRepository(session).release_ip(vps.ip)
 
@@ -62,20 +112,16 @@ async def _delete_expired(bot: Bot) -> None:
             })
             await notify_vps_expired(bot, vps.telegram_id, vps.ip, vps.tariff)
 
-            try:
-                await bot.send_message(
-                    vps.telegram_id,
-                    f"❌ <b>Сервер удалён</b>\n\n"
-                    f"VPS <code>{vps.ip}</code> удалён — срок истёк.\n"
-                    f"Купи новый: /start → Тарифы",
-                )
-            except Exception:
-                pass
+            if vps.telegram_id not in unreachable:
+                notices.add(vps.telegram_id, vps.ip)
 
             logger.info(f"Deleted expired VPS #{vps.id} ({vps.ip})")
         except Exception as e:
             logger.error(f"Failed to delete expired VPS #{vps.id}: {e}")
 
+    # Одно сообщение на пользователя со всеми удалёнными серверами
+    notices.send(bot, _render_deleted, priority=Priority.REMINDER, wait=False)
+
 
 async def _auto_backup(bot: Bot) -> None:
     """Автобекап PostgreSQL → Telegram."""
@@ -115,11 +161,40 @@ async def start_scheduler(bot: Bot) -> None:
         id="autorenew",
         replace_existing=True,
     )
+    scheduler.add_job(
+        _run_broadcast_jobs,
+        CronTrigger(minute="*"),
+        args=[bot],
+        id="broadcast_jobs",
+        replace_existing=True,
+    )
+    scheduler.add_job(
+        _error_digest,
+        IntervalTrigger(minutes=settings.ERROR_DIGEST_MINUTES),
+        args=[bot],
+        id="error_digest",
+        replace_existing=True,
+    )
     scheduler.start()
-    logger.info("✅ Scheduler started (expiring/6h, delete/30min, autorenew/6h)")
+    logger.info(
+        "✅ Scheduler started (expiring/6h, delete/30min, autorenew/6h, broadcasts/1min, "
+        f"error digest/{settings.ERROR_DIGEST_MINUTES}min)"
+    )
 
 
 async def _run_autorenew(bot: Bot) -> None:
     """Проверяем VPS с включённым автопродлением."""
-    from app.services.autorenew import check_autorenew
-    await check_autorenew(bot)
+    from app.services.autorenew import try_autorenew_all
+    await try_autorenew_all(bot)
+
+
+async def _run_broadcast_jobs(bot: Bot) -> None:
+    """Запланированные рассылки, у которых наступил run_at."""
+    from app.services.broadcast_jobs import run_due_jobs
+    await run_due_jobs(bot)
+
+
+async def _error_digest(bot: Bot) -> None:
+    """Дайджест необработанных ошибок админам (если они были)."""
+    from app.services.error_tracker import send_digest
+    await send_digest(bot)
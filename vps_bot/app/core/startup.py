@@ -2,6 +2,7 @@
 Проверки при старте бота:
 1. Тест подключения к Proxmox
 2. Заполнение IP пула из .env если пул в БД пуст
+3. users.language из Redis (lang:{id}) для тех, у кого колонка ещё пустая
 """
 from __future__ import annotations
 import logging
@@ -13,6 +14,7 @@ logger = logging.getLogger(__name__)
 async def run_startup_checks() -> None:
     await _test_proxmox()
     await _init_ip_pool()
+    await _backfill_languages()
 
 
 async def _test_proxmox() -> None:
@@ -64,3 +66,47 @@ async def _init_ip_pool() -> None:
                 await session.commit()
                 logger.info(f"✅ Добавлено {added} новых IP в пул")
             logger.info(f"✅ IP пул: {existing + added} адресов")
+
+
+_BACKFILL_BATCH = 1000
+
+
+async def _backfill_languages() -> None:
+    """
+    Язык выбирали и до колонки users.language (миграция 0006) — он лежит
+    только в Redis. Сегмент рассылки «lang» читает колонку, где NULL = ru,
+    поэтому переносим lang:{id} в users.language для строк с NULL.
+    Повторный запуск трогает только ещё пустые строки.
+    """
+    from sqlalchemy import update
+    from app.core.database import unit_of_work
+    from app.core.i18n import LANGS
+    from app.core.redis import get_redis
+    from app.models import User
+
+    try:
+        redis = await get_redis()
+        keys = [key async for key in redis.scan_iter(match="lang:*", count=_BACKFILL_BATCH)]
+        by_lang: dict[str, list[int]] = {}
+        for i in range(0, len(keys), _BACKFILL_BATCH):
+            chunk = keys[i:i + _BACKFILL_BATCH]
+            for key, lang in zip(chunk, await redis.mget(chunk)):
+                user_id = key.partition(":")[2]
+                if lang in LANGS and user_id.isdigit():
+                    by_lang.setdefault(lang, []).append(int(user_id))
+
+        updated = 0
+        async with unit_of_work() as session:
+            for lang, ids in by_lang.items():
+                for i in range(0, len(ids), _BACKFILL_BATCH):
+                    result = await session.execute(
+                        update(User)
+                        .where(User.telegram_id.in_(ids[i:i + _BACKFILL_BATCH]))
+                        .where(User.language.is_(None))
+                        .values(language=lang)
+                    )
+                    updated += result.rowcount or 0
+        if updated:
+            logger.info(f"✅ users.language заполнен из Redis: {updated} пользователей")
+    except Exception as e:
+        logger.error(f"❌ Перенос языков из Redis не удался: {e}")
@@ -19,6 +19,7 @@ from app.core.config import settings
 from app.api.health import router as health_router
 from app.api.webhooks import router as payment_webhook_router
 from app.api.status import router as status_router
+from app.api.metrics import router as metrics_router
 
 logger = logging.getLogger(__name__)
 
@@ -59,6 +60,7 @@ async def start_webhook(bot: Bot, dp: Dispatcher) -> None:
     app.include_router(health_router)
     app.include_router(payment_webhook_router)
     app.include_router(status_router)
+    app.include_router(metrics_router)
 
     # ── Telegram webhook — aiogram обрабатывает верификацию секрета ──
     # SimpleRequestHandler автоматически проверяет заголовок
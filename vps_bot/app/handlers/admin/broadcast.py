@@ -2,10 +2,28 @@
 Рассылка пользователям.
 
 FSM:
-  adm:broadcast → (ввод текста) → предпросмотр → подтверждение → рассылка
+  adm:broadcast → (текст / медиа / альбом) → предпросмотр → подтверждение → рассылка
 
-Статус обновляется каждые 50 сообщений.
-Уважает лимиты Telegram: 25 msg/сек.
+Кнопка «🎯 Сегмент» сужает получателей (services/segments.py):
+  adm:broadcast:segment → adm:bcseg:<условие> … → adm:broadcast:segdone
+Число получателей в предпросмотре — COUNT с тем же условием.
+
+Текст рассылается как раньше (📢 + HTML). Фото, видео, документы и
+альбомы — копией исходного сообщения админа (copy_message(s)), без
+повторной загрузки файла. Части альбома приходят отдельными апдейтами:
+их id собираются в Redis-список bc_album:<media_group_id>, предпросмотр
+показывает первый апдейт после паузы _ALBUM_WAIT.
+
+«🗓 Запланировать» вместо немедленной отправки сохраняет задание
+(services/broadcast_jobs.py) — старт через N часов, повтор, окно отправки:
+  adm:broadcast:schedule → adm:bcsched:<параметр> … → adm:broadcast:schedconfirm
+Запускает задания планировщик (core/scheduler.py), не хендлер.
+Список заданий и отмена: adm:broadcast:jobs → adm:bcjob:cancel:<id>
+
+После подтверждения рассылка уходит в фон (services/broadcast.py):
+пачки получателей, checkpoint в Redis, продолжение после рестарта.
+Сообщение со статусом обновляется после каждой пачки, кнопки:
+  adm:bc:pause:<id> / adm:bc:resume:<id> / adm:bc:cancel:<id>
 """
 from __future__ import annotations
 import asyncio
@@ -17,10 +35,21 @@ from aiogram.fsm.context import FSMContext
 from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
 
 from app.core.database import AsyncSessionLocal
+from app.core.redis import get_redis
 from app.core.states import BroadcastFSM
 from app.repositories.user import UserRepository
+from app.services.broadcast import (
+    cancel_broadcast, format_progress, get_broadcast, pause_broadcast,
+    resume_broadcast, start_broadcast,
+)
+from app.services.broadcast_jobs import Schedule, cancel_job, create_job, list_jobs
+from app.services.broadcast_jobs import describe_repeat, describe_window
+from app.services.segments import Segment
 from app.utils.admin import AdminFilter
-from app.utils.keyboards import back_kb, adm_confirm_kb
+from app.utils.keyboards import (
+    back_kb, adm_broadcast_ctl_kb, adm_broadcast_jobs_kb, adm_confirm_kb,
+    adm_schedule_kb, adm_segment_kb,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -28,8 +57,12 @@ router = Router(name="admin_broadcast")
 router.message.filter(AdminFilter())
 router.callback_query.filter(AdminFilter())
 
-_RATE_CHUNK = 25    # сообщений перед паузой
-_RATE_SLEEP = 1.0   # секунд паузы
+_ALBUM_WAIT = 1.5  # секунд ждём остальные части альбома
+
+_START_KB = InlineKeyboardMarkup(inline_keyboard=[
+    [InlineKeyboardButton(text="🗓 Запланированные", callback_data="adm:broadcast:jobs")],
+    [InlineKeyboardButton(text="◀️ Назад",           callback_data="adm:home")],
+])
 
 
 @router.callback_query(F.data == "adm:broadcast")
@@ -38,36 +71,134 @@ async def cb_broadcast_start(call: CallbackQuery, state: FSMContext) -> None:
     await state.set_state(BroadcastFSM.waiting_text)
     await call.message.edit_text(
         "📢 <b>Рассылка пользователям</b>\n\n"
-        "Напиши текст сообщения.\n"
+        "Напиши текст сообщения или пришли фото, видео, документ, альбом.\n"
         "Поддерживается HTML: <b>жирный</b>, <i>курсив</i>, <code>код</code>, "
         "<a href='https://example.com'>ссылка</a>\n\n"
         "<i>Отмена — /cancel</i>",
-        reply_markup=back_kb("adm:home"),
+        reply_markup=_START_KB,
     )
     await call.answer()
 
 
+_CONFIRM_KB = InlineKeyboardMarkup(inline_keyboard=[
+    [InlineKeyboardButton(text="✅ Отправить",   callback_data="adm:broadcast:confirm")],
+    [InlineKeyboardButton(text="🗓 Запланировать", callback_data="adm:broadcast:schedule")],
+    [InlineKeyboardButton(text="🎯 Сегмент",     callback_data="adm:broadcast:segment")],
+    [InlineKeyboardButton(text="✏️ Изменить",    callback_data="adm:broadcast:edit")],
+    [InlineKeyboardButton(text="❌ Отменить",    callback_data="adm:broadcast:cancel")],
+])
+
+
 @router.message(BroadcastFSM.waiting_text)
 async def msg_broadcast_preview(message: Message, state: FSMContext) -> None:
     """Показать предпросмотр сообщения перед отправкой."""
-    await state.update_data(broadcast_text=message.html_text)
+    if message.text:
+        await state.update_data(broadcast_text=message.html_text, broadcast_copy=None)
+        segment = await _get_segment(state)
+        total = await _count_recipients(segment)
+        await message.answer(
+            f"📋 <b>Предпросмотр рассылки</b>\n\n"
+            f"━━━━━━━━━━━━━━━━━\n"
+            f"{message.html_text}\n"
+            f"━━━━━━━━━━━━━━━━━\n\n"
+            f"🎯 Сегмент: {segment.describe()}\n"
+            f"👥 Получателей: <b>{total}</b>\n\n"
+            "Подтвердить отправку?",
+            reply_markup=_CONFIRM_KB,
+        )
+        return
 
-    async with AsyncSessionLocal() as session:
-        total = await UserRepository(session).count()
+    message_ids = [message.message_id]
+    if message.media_group_id:
+        message_ids = await _collect_album(message.media_group_id, message.message_id)
+        if message_ids is None:
+            return  # не первая часть альбома — предпросмотр покажет первая
 
+    await state.update_data(
+        broadcast_text="",
+        broadcast_copy=[message.chat.id, message_ids],
+    )
+    segment = await _get_segment(state)
+    total = await _count_recipients(segment)
+    kind = f"альбом из {len(message_ids)} шт." if len(message_ids) > 1 else "медиа-сообщение"
     await message.answer(
         f"📋 <b>Предпросмотр рассылки</b>\n\n"
-        f"━━━━━━━━━━━━━━━━━\n"
-        f"{message.html_text}\n"
-        f"━━━━━━━━━━━━━━━━━\n\n"
+        f"📎 Будет разослано {kind} выше — как есть, без повторной загрузки.\n\n"
+        f"🎯 Сегмент: {segment.describe()}\n"
+        f"👥 Получателей: <b>{total}</b>\n\n"
+        "Подтвердить отправку?",
+        reply_to_message_id=message_ids[0],
+        reply_markup=_CONFIRM_KB,
+    )
+
+
+async def _count_recipients(segment: Segment) -> int:
+    """Дешёвый COUNT с тем же условием, что и выборка получателей."""
+    async with AsyncSessionLocal() as session:
+        return await UserRepository(session).count_active(segment)
+
+
+async def _get_segment(state: FSMContext) -> Segment:
+    data = await state.get_data()
+    return Segment.decode(data.get("broadcast_segment"))
+
+
+@router.callback_query(F.data == "adm:broadcast:segment")
+async def cb_broadcast_segment(call: CallbackQuery, state: FSMContext) -> None:
+    """Экран выбора сегмента."""
+    await _render_segment(call, await _get_segment(state))
+    await call.answer()
+
+
+@router.callback_query(F.data.startswith("adm:bcseg:"))
+async def cb_broadcast_segment_toggle(call: CallbackQuery, state: FSMContext) -> None:
+    segment = (await _get_segment(state)).toggle(call.data.split(":")[2])
+    await state.update_data(broadcast_segment=segment.encode())
+    await _render_segment(call, segment)
+    await call.answer()
+
+
+@router.callback_query(F.data == "adm:broadcast:segdone")
+async def cb_broadcast_segment_done(call: CallbackQuery, state: FSMContext) -> None:
+    data = await state.get_data()
+    if not data.get("broadcast_text") and not data.get("broadcast_copy"):
+        await call.answer("Сначала пришли сообщение для рассылки", show_alert=True)
+        return
+    segment = Segment.decode(data.get("broadcast_segment"))
+    total = await _count_recipients(segment)
+    await call.message.edit_text(
+        f"📋 <b>Рассылка готова</b>\n\n"
+        f"🎯 Сегмент: {segment.describe()}\n"
         f"👥 Получателей: <b>{total}</b>\n\n"
         "Подтвердить отправку?",
-        reply_markup=InlineKeyboardMarkup(inline_keyboard=[
-            [InlineKeyboardButton(text="✅ Отправить",   callback_data="adm:broadcast:confirm")],
-            [InlineKeyboardButton(text="✏️ Изменить",    callback_data="adm:broadcast:edit")],
-            [InlineKeyboardButton(text="❌ Отменить",    callback_data="adm:broadcast:cancel")],
-        ]),
+        reply_markup=_CONFIRM_KB,
     )
+    await call.answer()
+
+
+async def _render_segment(call: CallbackQuery, segment: Segment) -> None:
+    total = await _count_recipients(segment)
+    await call.message.edit_text(
+        f"🎯 <b>Сегмент рассылки</b>\n\n"
+        f"{segment.describe()}\n"
+        f"👥 Получателей: <b>{total}</b>\n\n"
+        "<i>Условия объединяются через И.</i>",
+        reply_markup=adm_segment_kb(segment),
+    )
+
+
+async def _collect_album(media_group_id: str, message_id: int) -> list[int] | None:
+    """Id всех частей альбома — только для первой части, остальным None."""
+    redis = await get_redis()
+    key = f"bc_album:{media_group_id}"
+    pipe = redis.pipeline(transaction=True)
+    pipe.rpush(key, message_id)
+    pipe.expire(key, 60)
+    position, _ = await pipe.execute()
+    if position > 1:
+        return None
+    await asyncio.sleep(_ALBUM_WAIT)
+    return sorted(int(m) for m in await redis.lrange(key, 0, -1))
 
 
 @router.callback_query(F.data == "adm:broadcast:edit")
@@ -95,57 +226,141 @@ async def cb_broadcast_confirm(call: CallbackQuery, state: FSMContext) -> None:
     """Запустить рассылку."""
     data = await state.get_data()
     text = data.get("broadcast_text", "")
+    copy_from = data.get("broadcast_copy")
+    segment = Segment.decode(data.get("broadcast_segment"))
     await state.clear()
 
-    if not text:
-        await call.answer("Текст пустой", show_alert=True)
+    if not text and not copy_from:
+        await call.answer("Сообщение пустое", show_alert=True)
         return
 
-    async with AsyncSessionLocal() as session:
-        ids = await UserRepository(session).get_all_ids()
+    status_msg = await call.message.edit_text("📢 <b>Рассылка запускается...</b>")
+    broadcast_id = await start_broadcast(
+        call.bot, text, status_msg.chat.id, status_msg.message_id,
+        copy_from=tuple(copy_from) if copy_from else None,
+        segment=segment,
+    )
+    await call.answer(f"Рассылка #{broadcast_id} запущена")
+    logger.info(f"Broadcast #{broadcast_id} started by admin {call.from_user.id}")
 
-    total = len(ids)
-    status_msg = await call.message.edit_text(
-        f"📢 <b>Рассылка запущена...</b>\n\n"
-        f"👥 Получателей: {total}\n"
-        f"⏳ Отправляю..."
+
+# ── Расписание ───────────────────────────────────────────────
+
+async def _get_schedule(state: FSMContext) -> Schedule:
+    data = await state.get_data()
+    return Schedule.decode(data.get("broadcast_schedule"))
+
+
+async def _render_schedule(call: CallbackQuery, schedule: Schedule) -> None:
+    await call.message.edit_text(
+        f"🗓 <b>Расписание рассылки</b>\n\n"
+        f"{schedule.describe()}\n\n"
+        "<i>Окно растягивает отправку на указанное время, чтобы не создавать пик.</i>",
+        reply_markup=adm_schedule_kb(schedule),
     )
 
-    sent = failed = 0
-    for i, uid in enumerate(ids):
-        try:
-            await call.bot.send_message(uid, f"📢 {text}")
-            sent += 1
-        except Exception:
-            failed += 1
-
-        # Обновляем статус каждые 50 сообщений
-        if (i + 1) % 50 == 0:
-            pct = (i + 1) / total * 100
-            bar = "█" * int(pct / 10) + "░" * (10 - int(pct / 10))
-            try:
-                await status_msg.edit_text(
-                    f"📢 <b>Рассылка...</b>\n\n"
-                    f"{bar} {pct:.0f}%\n"
-                    f"Прогресс: {i + 1}/{total}\n"
-                    f"✅ Отправлено: {sent}  ❌ Ошибок: {failed}"
-                )
-            except Exception:
-                pass
-
-        # Rate limiting
-        if (i + 1) % _RATE_CHUNK == 0:
-            await asyncio.sleep(_RATE_SLEEP)
-
-    await status_msg.edit_text(
-        f"✅ <b>Рассылка завершена</b>\n\n"
-        f"📊 Итоги:\n"
-        f"  👥 Всего: {total}\n"
-        f"  ✅ Доставлено: {sent}\n"
-        f"  ❌ Заблокировали бота: {failed}",
+
+@router.callback_query(F.data == "adm:broadcast:schedule")
+async def cb_broadcast_schedule(call: CallbackQuery, state: FSMContext) -> None:
+    """Экран расписания."""
+    await _render_schedule(call, await _get_schedule(state))
+    await call.answer()
+
+
+@router.callback_query(F.data.startswith("adm:bcsched:"))
+async def cb_broadcast_schedule_toggle(call: CallbackQuery, state: FSMContext) -> None:
+    schedule = (await _get_schedule(state)).toggle(call.data.split(":")[2])
+    await state.update_data(broadcast_schedule=schedule.encode())
+    await _render_schedule(call, schedule)
+    await call.answer()
+
+
+@router.callback_query(F.data == "adm:broadcast:schedconfirm")
+async def cb_broadcast_schedule_confirm(call: CallbackQuery, state: FSMContext) -> None:
+    """Сохранить задание — запустит планировщик."""
+    data = await state.get_data()
+    text = data.get("broadcast_text", "")
+    copy_from = data.get("broadcast_copy")
+    if not text and not copy_from:
+        await call.answer("Сначала пришли сообщение для рассылки", show_alert=True)
+        return
+    schedule = Schedule.decode(data.get("broadcast_schedule"))
+    segment = Segment.decode(data.get("broadcast_segment"))
+    await state.clear()
+
+    job = await create_job(
+        call.from_user.id, text, schedule,
+        copy_from=tuple(copy_from) if copy_from else None,
+        segment=segment,
+    )
+    await call.message.edit_text(
+        f"🗓 <b>Рассылка #{job.id} запланирована</b>\n\n"
+        f"⏰ Старт: {job.run_at:%d.%m.%Y %H:%M} UTC\n"
+        f"🔁 {describe_repeat(job.repeat_hours).capitalize()}\n"
+        f"🕒 {describe_window(job.window_minutes).capitalize()}\n"
+        f"🎯 Сегмент: {segment.describe()}",
         reply_markup=back_kb("adm:home"),
     )
-    logger.info(f"Broadcast done: {sent}/{total} delivered by admin {call.from_user.id}")
+    await call.answer()
+    logger.info(f"Broadcast job #{job.id} scheduled by admin {call.from_user.id}")
+
+
+@router.callback_query(F.data == "adm:broadcast:jobs")
+async def cb_broadcast_jobs(call: CallbackQuery, state: FSMContext) -> None:
+    """Активные задания; кнопка — отменить."""
+    await state.clear()
+    await _render_jobs(call)
+    await call.answer()
+
+
+async def _render_jobs(call: CallbackQuery) -> None:
+    jobs = await list_jobs()
+    lines = [
+        f"#{job.id} · {job.run_at:%d.%m %H:%M} UTC · {describe_repeat(job.repeat_hours)}, "
+        f"{describe_window(job.window_minutes)}"
+        for job in jobs
+    ]
+    await call.message.edit_text(
+        "🗓 <b>Запланированные рассылки</b>\n\n" + ("\n".join(lines) or "Заданий нет."),
+        reply_markup=adm_broadcast_jobs_kb(jobs),
+    )
+
+
+@router.callback_query(F.data.startswith("adm:bcjob:cancel:"))
+async def cb_broadcast_job_cancel(call: CallbackQuery) -> None:
+    job_id = int(call.data.split(":")[3])
+    ok = await cancel_job(job_id)
+    await _render_jobs(call)
+    await call.answer(f"Задание #{job_id} отменено" if ok else "Задание уже неактивно")
+    logger.info(f"Broadcast job #{job_id} cancelled by admin {call.from_user.id}: {ok}")
+
+
+@router.callback_query(F.data.startswith("adm:bc:"))
+async def cb_broadcast_control(call: CallbackQuery) -> None:
+    """Пауза / продолжение / отмена фоновой рассылки."""
+    _, _, action, raw_id = call.data.split(":")
+    broadcast_id = int(raw_id)
+
+    if action == "pause":
+        ok = await pause_broadcast(broadcast_id)
+    elif action == "resume":
+        ok = await resume_broadcast(call.bot, broadcast_id)
+    elif action == "cancel":
+        ok = await cancel_broadcast(broadcast_id)
+    else:
+        ok = False
+
+    state = await get_broadcast(broadcast_id)
+    if state is not None:
+        try:
+            await call.message.edit_text(
+                format_progress(state),
+                reply_markup=adm_broadcast_ctl_kb(state.id, state.status),
+            )
+        except Exception:
+            pass
+    await call.answer("✅ Готово" if ok else "Рассылка уже в другом состоянии")
+    logger.info(f"Broadcast #{broadcast_id} {action} by admin {call.from_user.id}: {ok}")
 
 
 @router.message(Command("cancel"))
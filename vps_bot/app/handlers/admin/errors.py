@@ -0,0 +1,68 @@
+"""
+/errors — необработанные ошибки по отпечаткам.
+
+Сводка из app.services.error_tracker (Redis, все реплики):
+  /errors         — топ отпечатков: сколько раз, тип, последняя строка traceback
+  /errors <fp>    — полный пример traceback для отпечатка
+  /errors reset   — очистить статистику
+"""
+from __future__ import annotations
+from datetime import datetime
+from aiogram import Router
+from aiogram.filters import Command, CommandObject
+from aiogram.types import Message
+from app.core.config import settings
+from app.services.error_tracker import ErrorStat, error_tracker, escape
+from app.utils.admin import AdminFilter
+
+router = Router(name="admin_errors")
+
+_MESSAGE_LIMIT = 4096   # символов в сообщении Telegram
+router.message.filter(AdminFilter())
+
+
+def _last_line(sample: str) -> str:
+    lines = [line for line in sample.strip().splitlines() if line.strip()]
+    return lines[-1][:120] if lines else ""
+
+
+def format_errors_text(stats: list[ErrorStat]) -> str:
+    if not stats:
+        return "✅ <b>Ошибок нет</b>"
+    lines = [f"🚨 <b>Ошибки</b> (топ-{settings.ERROR_TOP})\n"]
+    for s in stats:
+        seen = datetime.utcfromtimestamp(s.last_seen).strftime("%d.%m %H:%M") if s.last_seen else "—"
+        lines.append(
+            f"<code>{s.fingerprint}</code> ×<b>{s.count}</b> · {s.type} · {seen} UTC\n"
+            f"<pre>{escape(_last_line(s.sample))}</pre>"
+        )
+    lines.append("<i>Пример traceback: /errors &lt;отпечаток&gt;</i>")
+    return "\n".join(lines)
+
+
+def format_error_detail(stat: ErrorStat) -> str:
+    head = (
+        f"🚨 <code>{stat.fingerprint}</code> ×<b>{stat.count}</b>\n\n"
+        f"<b>Type:</b> {stat.type}\n"
+        f"<b>Error:</b> {escape(stat.message)}\n\n"
+    )
+    # Сначала экранируем, потом режем: «<module>» после escape длиннее на 6 символов
+    budget = _MESSAGE_LIMIT - len(head) - len("<pre></pre>")
+    return f"{head}<pre>{escape(stat.sample)[-budget:]}</pre>"
+
+
+@router.message(Command("errors"))
+async def cmd_errors(message: Message, command: CommandObject) -> None:
+    arg = (command.args or "").strip()
+    if arg == "reset":
+        await error_tracker.reset()
+        await message.answer("✅ Статистика ошибок сброшена.")
+        return
+    if arg:
+        stat = await error_tracker.get(arg)
+        if stat is None:
+            await message.answer(f"Отпечаток <code>{escape(arg)}</code> не найден.")
+            return
+        await message.answer(format_error_detail(stat))
+        return
+    await message.answer(format_errors_text(await error_tracker.top(settings.ERROR_TOP)))
@@ -29,8 +29,10 @@ from app.core.states import BroadcastFSM, AdminFSM
 from app.repositories.user import UserRepository, PaymentRepository
 from app.repositories.vps import VpsRepository
 from app.services.proxmox import proxmox_service
+from app.services.vm_status import format_age, vm_snapshot
 from app.services.stats import StatsService, format_stats_text
 from app.utils.admin import AdminFilter
+from app.utils.render import edit_or_skip
 from app.utils.keyboards import (
     adm_home_kb, adm_stats_kb, adm_users_kb, adm_user_profile_kb,
     adm_user_vps_kb, adm_vps_kb, adm_vps_card_kb, adm_settings_kb,
@@ -59,7 +61,8 @@ async def cmd_admin(message: Message) -> None:
 
 @router.callback_query(F.data == "adm:home")
 async def cb_adm_home(call: CallbackQuery) -> None:
-    await call.message.edit_text(
+    await edit_or_skip(
+        call.message,
         _home_text(),
         reply_markup=adm_home_kb(),
     )
@@ -101,7 +104,7 @@ async def cb_adm_stats(call: CallbackQuery) -> None:
 
     text = format_stats_text(stats) + proxmox_info
 
-    await call.message.edit_text(text, reply_markup=adm_stats_kb())
+    await edit_or_skip(call.message, text, reply_markup=adm_stats_kb())
 
 
 @router.callback_query(F.data.in_({"adm:stats:7d", "adm:stats:30d"}))
@@ -125,7 +128,8 @@ async def cb_adm_stats_revenue(call: CallbackQuery) -> None:
         total += d["total"]
     lines.append(f"\n💰 <b>Итого: {total:.2f}</b>")
 
-    await call.message.edit_text(
+    await edit_or_skip(
+        call.message,
         "\n".join(lines),
         reply_markup=back_kb("adm:stats"),
     )
@@ -150,7 +154,8 @@ async def cb_adm_stats_tariffs(call: CallbackQuery) -> None:
         bar = "█" * int(pct / 10) + "░" * (10 - int(pct / 10))
         lines.append(f"  {i}. {t['name']}\n     {bar} {pct:.0f}%  ({t['count']} шт.)")
 
-    await call.message.edit_text(
+    await edit_or_skip(
+        call.message,
         "\n".join(lines),
         reply_markup=back_kb("adm:stats"),
     )
@@ -171,7 +176,7 @@ async def cb_adm_users(call: CallbackQuery) -> None:
         f"Всего зарегистрировано: <b>{total}</b>\n\n"
         "Выбери действие:"
     )
-    await call.message.edit_text(text, reply_markup=adm_users_kb())
+    await edit_or_skip(call.message, text, reply_markup=adm_users_kb())
     await call.answer()
 
 
@@ -595,7 +600,7 @@ async def cb_adm_vps(call: CallbackQuery) -> None:
         f"Просроченных: <b>{expired}</b>\n\n"
         "Выбери действие:"
     )
-    await call.message.edit_text(text, reply_markup=adm_vps_kb())
+    await edit_or_skip(call.message, text, reply_markup=adm_vps_kb())
     await call.answer()
 
 
@@ -666,13 +671,13 @@ async def cb_adm_vps_card(call: CallbackQuery) -> None:
 
     # Статус из Proxmox
     try:
-        st = await proxmox_service.status_lxc(vps.vmid)
-        prox_icon = "🟢" if st["running"] else "🔴"
+        st = await vm_snapshot.status(vps.vmid, node=vps.node)
+        prox_icon = "🟢" if st.running else "🔴"
         prox_line = (
-            f"{prox_icon} {'Работает' if st['running'] else 'Остановлен'} · "
-            f"CPU {st['cpu_pct']}% · "
-            f"RAM {st['mem_used_mb']}/{st['mem_total_mb']}MB\n"
-            f"⏱️ Аптайм: {st['uptime_sec'] // 3600}ч"
+            f"{prox_icon} {'Работает' if st.running else 'Остановлен'} · "
+            f"CPU {st.cpu_pct}% · "
+            f"RAM {st.mem_used_mb}/{st.mem_total_mb}MB\n"
+            f"⏱️ Аптайм: {st.uptime_sec // 3600}ч · 🕐 {format_age(st)}"
         )
     except Exception:
         prox_line = "⚠️ Proxmox недоступен"
@@ -689,7 +694,7 @@ async def cb_adm_vps_card(call: CallbackQuery) -> None:
         f"📦 Тариф: {t.get('name', vps.tariff)}\n"
         f"📅 Истекает: {vps.expires_at.strftime('%d.%m.%Y')} ({days}д.)\n"
         f"👤 Владелец: <code>{vps.telegram_id}</code>\n"
-        f"🆔 VMID: {vps.vmid}"
+        f"🆔 VMID: {vps.vmid} · нода {vps.node or settings.PROXMOX_NODE}"
     )
 
     await call.message.edit_text(text, reply_markup=adm_vps_card_kb(vps_id, vps.telegram_id))
@@ -708,7 +713,7 @@ async def cb_adm_vps_reboot(call: CallbackQuery) -> None:
         return
 
     try:
-        await proxmox_service.reboot_lxc(vps.vmid)
+        await proxmox_service.reboot_lxc(vps.vmid, node=vps.node)
         await call.answer("✅ Перезагружено", show_alert=True)
         logger.info(f"Admin {call.from_user.id} rebooted VPS #{vps_id}")
     except Exception as e:
@@ -782,7 +787,7 @@ async def cb_adm_vps_delete_do(call: CallbackQuery) -> None:
             return
 
         try:
-            await proxmox_service.delete_lxc(vps.vmid)
+            await proxmox_service.delete_lxc(vps.vmid, node=vps.node)
             prox_ok = True
         except Exception as e:
             prox_ok = False
@@ -0,0 +1,76 @@
+"""
+/perf — латентность бота для администратора.
+
+Сводка из app.core.metrics: апдейты целиком, разбивка I/O на апдейт,
+самые медленные хендлеры по p95, Bot API по методам. Каждый раздел
+ограничен топом, а весь текст — лимитом сообщения Telegram: счётчиков
+(proxmox.error.* по эндпоинтам, delivery.*) на живом боте сотни.
+/perf reset — обнулить накопленные гистограммы.
+"""
+from __future__ import annotations
+from aiogram import Router
+from aiogram.filters import Command, CommandObject
+from aiogram.types import Message
+from app.core.metrics import metrics, Histogram, IO_COMPONENTS
+from app.utils.admin import AdminFilter
+
+router = Router(name="admin_perf")
+router.message.filter(AdminFilter())
+
+TOP_HANDLERS = 10
+TOP_COUNTERS = 15
+_MESSAGE_LIMIT = 4096   # символов в сообщении Telegram
+
+
+def _row(name: str, h: Histogram) -> str:
+    return (
+        f"<code>{name[:28]:<28} {h.quantile(0.5):>7.1f} {h.quantile(0.95):>7.1f} "
+        f"{h.quantile(0.99):>7.1f} {h.count:>6}</code>"
+    )
+
+
+def format_perf_text() -> str:
+    header = f"<code>{'':<28} {'p50':>7} {'p95':>7} {'p99':>7} {'n':>6}</code>"
+    updates = dict(((n, h) for _, n, h in metrics.snapshot("update")))
+    lines = ["⏱️ <b>Производительность</b> (мс)\n", "<b>Апдейт</b>", header]
+    for name in ("total", *IO_COMPONENTS):
+        if name in updates:
+            lines.append(_row(name, updates[name]))
+
+    handlers = sorted(metrics.snapshot("handler"), key=lambda x: x[2].quantile(0.95), reverse=True)
+    if handlers:
+        lines += ["", f"<b>Хендлеры</b> (топ-{TOP_HANDLERS} по p95)", header]
+        lines += [_row(n, h) for _, n, h in handlers[:TOP_HANDLERS]]
+
+    io = sorted(metrics.snapshot("io"), key=lambda x: x[2].count, reverse=True)
+    if io:
+        lines += ["", f"<b>Вызовы I/O</b> (топ-{TOP_HANDLERS} по числу)", header]
+        lines += [_row(n, h) for _, n, h in io[:TOP_HANDLERS]]
+
+    telegram = sorted(metrics.snapshot("io.telegram"), key=lambda x: x[2].count, reverse=True)
+    if telegram:
+        lines += ["", "<b>Bot API</b>", header]
+        lines += [_row(n, h) for _, n, h in telegram[:TOP_HANDLERS]]
+
+    if metrics.counters:
+        counters = sorted(metrics.counters.items(), key=lambda x: x[1], reverse=True)
+        lines += ["", f"<b>Счётчики</b> (топ-{TOP_COUNTERS})"]
+        lines += [f"<code>{n}: {v}</code>" for n, v in counters[:TOP_COUNTERS]]
+        if len(counters) > TOP_COUNTERS:
+            lines.append(f"… ещё {len(counters) - TOP_COUNTERS} — полный список в GET /metrics")
+
+    if len(lines) == 3:
+        return "⏱️ <b>Производительность</b>\n\nДанных пока нет."
+    # Длинные имена метрик всё ещё могут не влезть — режем хвост целыми строками
+    while len("\n".join(lines)) > _MESSAGE_LIMIT:
+        lines.pop()
+    return "\n".join(lines)
+
+
+@router.message(Command("perf"))
+async def cmd_perf(message: Message, command: CommandObject) -> None:
+    if command.args and command.args.strip() == "reset":
+        metrics.reset()
+        await message.answer("✅ Метрики сброшены.")
+        return
+    await message.answer(format_perf_text())
@@ -2,10 +2,13 @@ from aiogram import Router, F
 from aiogram.filters import Command
 from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
 from app.core.redis import get_redis
+from app.services.autorenew import autorenew_key
+from app.utils.keyboards import cached_kb
 
 router = Router(name="autorenew")
 
 
+@cached_kb
 def autorenew_kb(enabled: bool) -> InlineKeyboardMarkup:
     if enabled:
         return InlineKeyboardMarkup(inline_keyboard=[
@@ -19,10 +22,7 @@ def autorenew_kb(enabled: bool) -> InlineKeyboardMarkup:
         ])
 
 
-async def _show_autorenew(event: Message | CallbackQuery) -> None:
-    user_id = event.from_user.id
-    redis = await get_redis()
-    enabled = (await redis.get(f"autorenew:{user_id}")) == "1"
+async def _show_autorenew(event: Message | CallbackQuery, enabled: bool) -> None:
     status = "🟢 Включено" if enabled else "🔴 Выключено"
 
     text = (
@@ -42,26 +42,27 @@ async def _show_autorenew(event: Message | CallbackQuery) -> None:
 
 
 @router.message(Command("autorenew"))
-async def cmd_autorenew(message: Message) -> None:
-    await _show_autorenew(message)
+async def cmd_autorenew(message: Message, autorenew: bool) -> None:
+    await _show_autorenew(message, autorenew)
 
 
 @router.callback_query(F.data == "autorenew_settings")
-async def cb_autorenew(call: CallbackQuery) -> None:
-    await _show_autorenew(call)
+async def cb_autorenew(call: CallbackQuery, autorenew: bool) -> None:
+    await _show_autorenew(call, autorenew)
 
 
 @router.callback_query(F.data.startswith("autorenew:"))
 async def cb_toggle_autorenew(call: CallbackQuery) -> None:
     action = call.data.split(":")[1]
     redis = await get_redis()
-    key = f"autorenew:{call.from_user.id}"
+    key = autorenew_key(call.from_user.id)
+    enabled = action == "on"
 
-    if action == "on":
+    if enabled:
         await redis.set(key, "1")
         await call.answer("✅ Автопродление включено", show_alert=True)
     else:
         await redis.set(key, "0")
         await call.answer("❌ Автопродление выключено", show_alert=True)
 
-    await _show_autorenew(call)
+    await _show_autorenew(call, enabled)
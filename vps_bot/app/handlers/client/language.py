@@ -1,10 +1,14 @@
 from aiogram import Router, F
 from aiogram.types import CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
-from app.core.i18n import set_lang, get_lang, t
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.i18n import set_lang, t
+from app.repositories.user import UserRepository
+from app.utils.keyboards import cached_kb, main_menu_kb
 
 router = Router(name="language")
 
 
+@cached_kb
 def lang_kb() -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(inline_keyboard=[
         [
@@ -16,8 +20,7 @@ def lang_kb() -> InlineKeyboardMarkup:
 
 
 @router.callback_query(F.data == "language")
-async def cb_language(call: CallbackQuery) -> None:
-    lang = await get_lang(call.from_user.id)
+async def cb_language(call: CallbackQuery, lang: str) -> None:
     current = "🇷🇺 Русский" if lang == "ru" else "🇬🇧 English"
     await call.message.edit_text(
         f"🌐 <b>Язык / Language</b>\n\nТекущий / Current: <b>{current}</b>",
@@ -27,19 +30,18 @@ async def cb_language(call: CallbackQuery) -> None:
 
 
 @router.callback_query(F.data.startswith("setlang:"))
-async def cb_set_lang(call: CallbackQuery) -> None:
+async def cb_set_lang(call: CallbackQuery, session: AsyncSession) -> None:
     lang = call.data.split(":")[1]
     if lang not in ("ru", "en"):
         await call.answer("Unknown language", show_alert=True)
         return
 
     await set_lang(call.from_user.id, lang)
+    await UserRepository(session).set_language(call.from_user.id, lang)  # для сегментов рассылок
     await call.answer(t("lang_changed", lang), show_alert=True)
 
     # Обновляем главное меню на новом языке
-    from app.handlers.client.start import main_menu_kb
-    from app.core.config import settings
     await call.message.edit_text(
         t("welcome", lang).format(name=call.from_user.first_name),
-        reply_markup=main_menu_kb(settings.REFERRAL_ENABLED),
+        reply_markup=main_menu_kb(lang),
     )
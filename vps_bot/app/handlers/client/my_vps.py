@@ -1,16 +1,20 @@
 """
 Управление серверами пользователя.
 /start → Мои серверы → выбор VPS → детали → действия
+
+Статус контейнеров (список и карточка) — из снимка services/vm_status.py,
+без запроса к Proxmox на клик. «🔄 Обновить» (vps_refresh:<id>) — прямой запрос.
 """
 from __future__ import annotations
 from datetime import datetime
 from aiogram import Router, F
 from aiogram.types import CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
-from app.core.database import AsyncSessionLocal
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.repositories.vps import VpsRepository
 from app.services.proxmox import proxmox_service
-from app.services.autorenew import AutoRenewRepository
+from app.services.vm_status import format_age, vm_snapshot
 from app.core.config import TARIFFS
+from app.utils.render import edit_or_skip
 
 router = Router(name="my_vps")
 
@@ -19,13 +23,23 @@ def _vps_list_kb(vps_list) -> InlineKeyboardMarkup:
     rows = []
     for vps in vps_list:
         days = (vps.expires_at - datetime.utcnow()).days
-        icon = "🟢" if vps.status.value == "active" and days > 0 else "🔴"
+        icon = _list_icon(vps, days)
         label = f"{icon} {vps.ip}  ({days}д.)  {TARIFFS.get(vps.tariff, {}).get('name', vps.tariff)}"
         rows.append([InlineKeyboardButton(text=label, callback_data=f"vps:{vps.id}")])
     rows.append([InlineKeyboardButton(text="◀️ Главное меню", callback_data="main_menu")])
     return InlineKeyboardMarkup(inline_keyboard=rows)
 
 
+def _list_icon(vps, days: int) -> str:
+    """🟢 работает · 🟡 остановлен · ⚪ статус неизвестен · 🔴 истёк."""
+    if vps.status.value != "active" or days <= 0:
+        return "🔴"
+    st = vm_snapshot.get(vps.vmid)
+    if st is None:
+        return "⚪"
+    return "🟢" if st.running else "🟡"
+
+
 async def _build_vps_detail_kb(
     vps_id: int,
     tariff_id: str,
@@ -41,6 +55,7 @@ async def _build_vps_detail_kb(
             InlineKeyboardButton(text="🔄 Перезагрузить", callback_data=f"vps_reboot:{vps_id}"),
             InlineKeyboardButton(text="⚡ Ping", callback_data=f"ping:{vps_id}"),
         ],
+        [InlineKeyboardButton(text="🔄 Обновить статус", callback_data=f"vps_refresh:{vps_id}")],
         [
             InlineKeyboardButton(text="💳 Продлить", callback_data=f"vps_renew:{vps_id}:{tariff_id}"),
             ar_btn,
@@ -50,21 +65,23 @@ async def _build_vps_detail_kb(
 
 
 @router.callback_query(F.data == "my_vps")
-async def cb_my_vps(call: CallbackQuery) -> None:
-    async with AsyncSessionLocal() as session:
-        vps_list = await VpsRepository(session).get_user_vps(call.from_user.id)
+async def cb_my_vps(call: CallbackQuery, session: AsyncSession) -> None:
+    vps_list = await VpsRepository(session).get_user_vps(call.from_user.id)
 
     if not vps_list:
-        await call.message.edit_text(
+        await edit_or_skip(
+            call.message,
             "🖥️ <b>Мои серверы</b>\n\nУ тебя пока нет серверов.\n\nКупи первый VPS! 👇",
             reply_markup=InlineKeyboardMarkup(inline_keyboard=[
                 [InlineKeyboardButton(text="📦 Смотреть тарифы", callback_data="tariffs")],
                 [InlineKeyboardButton(text="◀️ Назад", callback_data="main_menu")],
             ]),
         )
+        await call.answer()
         return
 
-    await call.message.edit_text(
+    await edit_or_skip(
+        call.message,
         f"🖥️ <b>Мои серверы</b> — {len(vps_list)} шт.\n\nВыбери сервер:",
         reply_markup=_vps_list_kb(vps_list),
     )
@@ -72,29 +89,38 @@ async def cb_my_vps(call: CallbackQuery) -> None:
 
 
 @router.callback_query(F.data.startswith("vps:"))
-async def cb_vps_detail(call: CallbackQuery) -> None:
+async def cb_vps_detail(call: CallbackQuery, autorenew: bool, session: AsyncSession) -> None:
+    await _show_vps_detail(call, autorenew, session, fresh=False)
+
+
+@router.callback_query(F.data.startswith("vps_refresh:"))
+async def cb_vps_refresh(call: CallbackQuery, autorenew: bool, session: AsyncSession) -> None:
+    """Статус мимо снимка — прямой запрос к ноде."""
+    await _show_vps_detail(call, autorenew, session, fresh=True)
+
+
+async def _show_vps_detail(call: CallbackQuery, autorenew: bool, session: AsyncSession, fresh: bool) -> None:
     vps_id = int(call.data.split(":", 1)[1])
 
-    async with AsyncSessionLocal() as session:
-        vps = await VpsRepository(session).get_by_id(vps_id)
-        ar = await AutoRenewRepository(session).get(vps_id)
+    vps = await VpsRepository(session).get_by_id(vps_id)
 
     if not vps or vps.telegram_id != call.from_user.id:
         await call.answer("Сервер не найден", show_alert=True)
         return
+    await session.commit()  # соединение — обратно в пул на время запроса к Proxmox
 
-    autorenew_on = ar.enabled if ar else False
-
-    # Получаем статус из Proxmox
+    # Статус из снимка кластера (или из Proxmox, если снимок устарел / fresh)
     try:
-        st = await proxmox_service.status_lxc(vps.vmid)
-        running = st["running"]
-        status_icon = "🟢" if running else "🔴"
-        status_str = "Работает" if running else "Остановлен"
-        cpu_str = f"CPU: {st['cpu_pct']}%"
-        ram_str = f"RAM: {st['mem_used_mb']}/{st['mem_total_mb']} MB"
-        uptime_h = st["uptime_sec"] // 3600
-        proxmox_line = f"{status_icon} {status_str} · {cpu_str} · {ram_str}\n⏱️ Аптайм: {uptime_h}ч"
+        st = await vm_snapshot.status(vps.vmid, node=vps.node, fresh=fresh)
+        status_icon = "🟢" if st.running else "🔴"
+        status_str = "Работает" if st.running else "Остановлен"
+        cpu_str = f"CPU: {st.cpu_pct}%"
+        ram_str = f"RAM: {st.mem_used_mb}/{st.mem_total_mb} MB"
+        uptime_h = st.uptime_sec // 3600
+        proxmox_line = (
+            f"{status_icon} {status_str} · {cpu_str} · {ram_str}\n"
+            f"⏱️ Аптайм: {uptime_h}ч · 🕐 {format_age(st)}"
+        )
     except Exception:
         proxmox_line = "⚠️ Статус недоступен"
 
@@ -116,28 +142,29 @@ async def cb_vps_detail(call: CallbackQuery) -> None:
         f"🔌 <code>ssh root@{vps.ip}</code>"
     )
 
-    await call.message.edit_text(
+    await edit_or_skip(
+        call.message,
         text,
-        reply_markup=await _build_vps_detail_kb(vps_id, vps.tariff, autorenew_on),
+        reply_markup=await _build_vps_detail_kb(vps_id, vps.tariff, autorenew),
     )
-    await call.answer()
+    await call.answer("🔄 Обновлено" if fresh else None)
 
 
 @router.callback_query(F.data.startswith("vps_reboot:"))
-async def cb_vps_reboot(call: CallbackQuery) -> None:
+async def cb_vps_reboot(call: CallbackQuery, session: AsyncSession) -> None:
     vps_id = int(call.data.split(":", 1)[1])
 
-    async with AsyncSessionLocal() as session:
-        vps = await VpsRepository(session).get_by_id(vps_id)
+    vps = await VpsRepository(session).get_by_id(vps_id)
 
     if not vps or vps.telegram_id != call.from_user.id:
         await call.answer("Сервер не найден", show_alert=True)
         return
 
+    await session.commit()  # соединение — обратно в пул на время запроса к Proxmox
     await call.answer("⏳ Перезагружаю...")
 
     try:
-        await proxmox_service.reboot_lxc(vps.vmid)
+        await proxmox_service.reboot_lxc(vps.vmid, node=vps.node)
         await call.message.answer(
             f"✅ <b>Сервер перезагружен</b>\n\n"
             f"🌐 IP: <code>{vps.ip}</code>\n"
@@ -148,12 +175,11 @@ async def cb_vps_reboot(call: CallbackQuery) -> None:
 
 
 @router.callback_query(F.data.startswith("vps_renew:"))
-async def cb_vps_renew(call: CallbackQuery) -> None:
+async def cb_vps_renew(call: CallbackQuery, session: AsyncSession) -> None:
     parts = call.data.split(":")
     vps_id, tariff_id = int(parts[1]), parts[2]
 
-    async with AsyncSessionLocal() as session:
-        vps = await VpsRepository(session).get_by_id(vps_id)
+    vps = await VpsRepository(session).get_by_id(vps_id)
 
     if not vps or vps.telegram_id != call.from_user.id:
         await call.answer("Сервер не найден", show_alert=True)
@@ -11,9 +11,10 @@ import logging
 from aiogram import Router, F
 from aiogram.filters import Command
 from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
-from app.core.database import AsyncSessionLocal
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.repositories.vps import VpsRepository
 from app.models import VpsStatus
+from app.services.rate_limiter import rate_limiter
 
 logger = logging.getLogger(__name__)
 router = Router(name="ping")
@@ -115,11 +116,10 @@ def _format_ping_result(ip: str, result: dict) -> str:
 
 
 @router.callback_query(F.data.startswith("ping:"))
-async def cb_ping_vps(call: CallbackQuery) -> None:
+async def cb_ping_vps(call: CallbackQuery, session: AsyncSession) -> None:
     vps_id = int(call.data.split(":", 1)[1])
 
-    async with AsyncSessionLocal() as session:
-        vps = await VpsRepository(session).get_by_id(vps_id)
+    vps = await VpsRepository(session).get_by_id(vps_id)
 
     if not vps or vps.telegram_id != call.from_user.id:
         await call.answer("VPS не найден", show_alert=True)
@@ -129,6 +129,12 @@ async def cb_ping_vps(call: CallbackQuery) -> None:
         await call.answer("Сервер неактивен", show_alert=True)
         return
 
+    rl = await rate_limiter.hit("pings", call.from_user.id)
+    if not rl.allowed:
+        await call.answer(f"⏳ Ping можно повторить через {rl.retry_after:.0f} сек.", show_alert=True)
+        return
+
+    await session.commit()  # соединение — обратно в пул на время ping
     await call.answer("⏳ Пингую...")
     msg = await call.message.answer(f"⏳ Проверяю доступность {vps.ip}...")
 
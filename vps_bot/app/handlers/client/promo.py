@@ -12,8 +12,8 @@ from aiogram import Router, F
 from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.core.config import TARIFFS
-from app.core.database import AsyncSessionLocal
 from app.services.promo import PromoRepository
 
 logger = logging.getLogger(__name__)
@@ -69,7 +69,7 @@ async def cb_enter_promo(call: CallbackQuery, state: FSMContext) -> None:
 
 
 @router.message(PromoFSM.waiting_code)
-async def handle_promo_code(message: Message, state: FSMContext) -> None:
+async def handle_promo_code(message: Message, state: FSMContext, session: AsyncSession) -> None:
     code = message.text.strip().upper()
     data = await state.get_data()
     context = data.get("promo_context", "")
@@ -83,19 +83,18 @@ async def handle_promo_code(message: Message, state: FSMContext) -> None:
         await state.clear()
         return
 
-    async with AsyncSessionLocal() as session:
-        repo = PromoRepository(session)
-        try:
-            promo, discount, currency = await repo.validate(code, message.from_user.id, tariff_id)
-        except ValueError as e:
-            await message.answer(
-                f"{e}\n\nПопробуй другой код или продолжи без промокода.",
-                reply_markup=InlineKeyboardMarkup(inline_keyboard=[
-                    [InlineKeyboardButton(text="◀️ К оплате", callback_data=f"buy:{tariff_id}")]
-                ])
-            )
-            await state.clear()
-            return
+    repo = PromoRepository(session)
+    try:
+        promo, discount, currency = await repo.validate(code, message.from_user.id, tariff_id)
+    except ValueError as e:
+        await message.answer(
+            f"{e}\n\nПопробуй другой код или продолжи без промокода.",
+            reply_markup=InlineKeyboardMarkup(inline_keyboard=[
+                [InlineKeyboardButton(text="◀️ К оплате", callback_data=f"buy:{tariff_id}")]
+            ])
+        )
+        await state.clear()
+        return
 
     await state.clear()
 
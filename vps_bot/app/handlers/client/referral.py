@@ -9,8 +9,8 @@ import logging
 from aiogram import Router, F
 from aiogram.filters import CommandStart, CommandObject
 from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.core.config import settings
-from app.core.database import AsyncSessionLocal
 from app.services.referral import ReferralRepository
 
 logger = logging.getLogger(__name__)
@@ -26,7 +26,7 @@ def referral_kb(bot_username: str, telegram_id: int) -> InlineKeyboardMarkup:
 
 
 @router.message(CommandStart(deep_link=True))
-async def cmd_start_ref(message: Message, command: CommandObject) -> None:
+async def cmd_start_ref(message: Message, command: CommandObject, session: AsyncSession) -> None:
     """Обработка /start ref<id>"""
     if not settings.REFERRAL_ENABLED:
         return
@@ -40,9 +40,8 @@ async def cmd_start_ref(message: Message, command: CommandObject) -> None:
     except ValueError:
         return
 
-    async with AsyncSessionLocal() as session:
-        repo = ReferralRepository(session)
-        added = await repo.register_referral(referrer_id, message.from_user.id)
+    repo = ReferralRepository(session)
+    added = await repo.register_referral(referrer_id, message.from_user.id)
 
     if added:
         logger.info(f"New referral: {referrer_id} → {message.from_user.id}")
@@ -61,7 +60,7 @@ async def cmd_start_ref(message: Message, command: CommandObject) -> None:
 
 @router.message(F.text == "/ref")
 @router.callback_query(F.data == "referral")
-async def show_referral(event: Message | CallbackQuery) -> None:
+async def show_referral(event: Message | CallbackQuery, session: AsyncSession) -> None:
     if not settings.REFERRAL_ENABLED:
         if isinstance(event, CallbackQuery):
             await event.answer("Реферальная программа отключена.", show_alert=True)
@@ -70,11 +69,10 @@ async def show_referral(event: Message | CallbackQuery) -> None:
     user_id = event.from_user.id
     me = await event.bot.get_me()
 
-    async with AsyncSessionLocal() as session:
-        repo = ReferralRepository(session)
-        total = await repo.count_referrals(user_id)
-        paid = await repo.count_paid_referrals(user_id)
-        balance = await repo.get_or_create_balance(user_id)
+    repo = ReferralRepository(session)
+    total = await repo.count_referrals(user_id)
+    paid = await repo.count_paid_referrals(user_id)
+    balance = await repo.get_or_create_balance(user_id)
 
     ref_link = f"https://t.me/{me.username}?start=ref{user_id}"
     text = (
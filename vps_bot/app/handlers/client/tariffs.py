@@ -2,19 +2,22 @@ from aiogram import Router, F
 from aiogram.types import CallbackQuery
 from app.core.config import TARIFFS
 from app.utils.keyboards import tariffs_kb, tariff_detail_kb, payment_method_kb
+from app.utils.render import edit_or_skip
 
 router = Router(name="tariffs")
 
 
 @router.callback_query(F.data == "tariffs")
 async def cb_tariffs(call: CallbackQuery) -> None:
-    await call.message.edit_text(
+    await edit_or_skip(
+        call.message,
         "📦 <b>Тарифы VPS</b>\n\n"
         "Все серверы на <b>Hetzner</b> (Германия)\n"
         "🐧 Ubuntu 22.04 • 🌐 1 Гбит/с порт\n\n"
         "Выбери подходящий план:",
         reply_markup=tariffs_kb(),
     )
+    await call.answer()
 
 
 @router.callback_query(F.data.startswith("tariff:"))
@@ -34,7 +37,8 @@ async def cb_tariff_detail(call: CallbackQuery) -> None:
         f"🌍 Локация: Германия\n"
         f"⚡ Создание: ~1 минута автоматически"
     )
-    await call.message.edit_text(text, reply_markup=tariff_detail_kb(tariff_id))
+    await edit_or_skip(call.message, text, reply_markup=tariff_detail_kb(tariff_id))
+    await call.answer()
 
 
 @router.callback_query(F.data.startswith("buy:"))
@@ -45,10 +49,12 @@ async def cb_buy(call: CallbackQuery) -> None:
         await call.answer("Тариф не найден", show_alert=True)
         return
 
-    await call.message.edit_text(
+    await edit_or_skip(
+        call.message,
         f"💳 <b>Выбери способ оплаты</b>\n\n"
         f"Тариф: <b>{t['name']}</b>\n\n"
         f"• Карта РФ (ЮKassa): <b>{t['price_rub']} ₽</b>\n"
         f"• Крипта USDT (CryptoBot): <b>{t['price_usdt']}</b>",
         reply_markup=payment_method_kb(tariff_id),
     )
+    await call.answer()
@@ -12,9 +12,9 @@ import aiohttp
 from aiogram import Router, F, Bot
 from aiogram.types import CallbackQuery
 from aiogram.fsm.context import FSMContext
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.core.config import settings, TARIFFS
 from app.core.states import PaymentFSM
-from app.core.database import AsyncSessionLocal
 from app.repositories.user import PaymentRepository
 from app.models import PaymentProvider
 from app.services.vps_provision import provision_vps
@@ -64,7 +64,7 @@ def _verify_cryptobot_signature(body: bytes, signature: str) -> bool:
 
 
 @router.callback_query(F.data.startswith("pay:crypto:"))
-async def cb_pay_crypto(call: CallbackQuery, state: FSMContext) -> None:
+async def cb_pay_crypto(call: CallbackQuery, state: FSMContext, session: AsyncSession) -> None:
     if not settings.CRYPTOBOT_ENABLED:
         await call.answer("Оплата крипто временно недоступна.", show_alert=True)
         return
@@ -82,28 +82,32 @@ async def cb_pay_crypto(call: CallbackQuery, state: FSMContext) -> None:
     # ── Антифрод ─────────────────────────────────────────
     try:
         from app.services.antifrod import run_pre_payment_checks
-        await run_pre_payment_checks(call.from_user.id)
+        await run_pre_payment_checks(call.from_user.id, session)
     except Exception as af_err:
         from app.utils.keyboards import back_kb
         await call.message.edit_text(str(af_err), reply_markup=back_kb("tariffs"))
         return
 
+    # Соединение — обратно в пул на время запроса к платёжке
+    await session.commit()
+
     try:
         inv = await _create_invoice(
             t["price_usdt"],
             f"VPS {t['name']} — 1 месяц",
         )
 
-        async with AsyncSessionLocal() as session:
-            await PaymentRepository(session).create(
-                telegram_id=call.from_user.id,
-                external_id=inv["invoice_id"],
-                provider=PaymentProvider.CRYPTOBOT,
-                tariff=tariff_id,
-                amount=t["price_usdt"],
-                currency="USDT",
-                renew_vps_id=renew_vps_id,
-            )
+        await PaymentRepository(session).create(
+            telegram_id=call.from_user.id,
+            external_id=inv["invoice_id"],
+            provider=PaymentProvider.CRYPTOBOT,
+            tariff=tariff_id,
+            amount=t["price_usdt"],
+            currency="USDT",
+            renew_vps_id=renew_vps_id,
+        )
+        # Платёж — в БД до того, как пользователь увидит ссылку: вебхук его найдёт
+        await session.commit()
 
         await state.set_state(PaymentFSM.waiting_payment)
         await state.update_data(
@@ -137,15 +141,14 @@ async def cb_pay_crypto(call: CallbackQuery, state: FSMContext) -> None:
 
 
 @router.callback_query(F.data.startswith("check:crypto:"))
-async def cb_check_crypto(call: CallbackQuery, state: FSMContext) -> None:
+async def cb_check_crypto(call: CallbackQuery, state: FSMContext, session: AsyncSession) -> None:
     invoice_id = call.data.split(":", 2)[2]
     await call.answer("⏳ Проверяю оплату...")
 
     status = await _check_invoice_status(invoice_id)
 
     if status == "paid":
-        async with AsyncSessionLocal() as session:
-            payment = await PaymentRepository(session).get_by_external_id(invoice_id)
+        payment = await PaymentRepository(session).get_by_external_id(invoice_id)
 
         if not payment:
             await call.answer("❌ Платёж не найден в системе.", show_alert=True)
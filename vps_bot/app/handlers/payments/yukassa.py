@@ -15,9 +15,9 @@ import aiohttp
 from aiogram import Router, F
 from aiogram.types import CallbackQuery
 from aiogram.fsm.context import FSMContext
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.core.config import settings, TARIFFS
 from app.core.states import PaymentFSM
-from app.core.database import AsyncSessionLocal
 from app.repositories.user import PaymentRepository
 from app.models import PaymentProvider
 from app.services.vps_provision import provision_vps
@@ -89,7 +89,7 @@ async def _get_payment_status(payment_id: str) -> str:
 
 
 @router.callback_query(F.data.startswith("pay:yukassa:"))
-async def cb_pay_yukassa(call: CallbackQuery, state: FSMContext) -> None:
+async def cb_pay_yukassa(call: CallbackQuery, state: FSMContext, session: AsyncSession) -> None:
     if not settings.YUKASSA_ENABLED:
         await call.answer("Оплата картой временно недоступна.", show_alert=True)
         return
@@ -107,12 +107,15 @@ async def cb_pay_yukassa(call: CallbackQuery, state: FSMContext) -> None:
     # ── Антифрод ─────────────────────────────────────────
     try:
         from app.services.antifrod import run_pre_payment_checks
-        await run_pre_payment_checks(call.from_user.id)
+        await run_pre_payment_checks(call.from_user.id, session)
     except Exception as af_err:
         from app.utils.keyboards import back_kb
         await call.message.edit_text(str(af_err), reply_markup=back_kb("tariffs"))
         return
 
+    # Соединение — обратно в пул на время запроса к платёжке
+    await session.commit()
+
     try:
         result = await _create_payment(
             t["price_rub"],
@@ -124,16 +127,17 @@ async def cb_pay_yukassa(call: CallbackQuery, state: FSMContext) -> None:
             },
         )
 
-        async with AsyncSessionLocal() as session:
-            await PaymentRepository(session).create(
-                telegram_id=call.from_user.id,
-                external_id=result["payment_id"],
-                provider=PaymentProvider.YUKASSA,
-                tariff=tariff_id,
-                amount=t["price_rub"],
-                currency="RUB",
-                renew_vps_id=renew_vps_id,
-            )
+        await PaymentRepository(session).create(
+            telegram_id=call.from_user.id,
+            external_id=result["payment_id"],
+            provider=PaymentProvider.YUKASSA,
+            tariff=tariff_id,
+            amount=t["price_rub"],
+            currency="RUB",
+            renew_vps_id=renew_vps_id,
+        )
+        # Платёж — в БД до того, как пользователь увидит ссылку: вебхук его найдёт
+        await session.commit()
 
         await state.set_state(PaymentFSM.waiting_payment)
         await state.update_data(
@@ -167,15 +171,14 @@ async def cb_pay_yukassa(call: CallbackQuery, state: FSMContext) -> None:
 
 
 @router.callback_query(F.data.startswith("check:yukassa:"))
-async def cb_check_yukassa(call: CallbackQuery, state: FSMContext) -> None:
+async def cb_check_yukassa(call: CallbackQuery, state: FSMContext, session: AsyncSession) -> None:
     payment_id = call.data.split(":", 2)[2]
     await call.answer("⏳ Проверяю оплату...")
 
     status = await _get_payment_status(payment_id)
 
     if status in ("succeeded", "waiting_for_capture"):
-        async with AsyncSessionLocal() as session:
-            payment = await PaymentRepository(session).get_by_external_id(payment_id)
+        payment = await PaymentRepository(session).get_by_external_id(payment_id)
 
         if not payment:
             await call.answer("❌ Платёж не найден в системе.", show_alert=True)
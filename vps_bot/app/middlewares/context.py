@@ -0,0 +1,55 @@
+"""
+Update-level middleware: rate limit + предзагрузка контекста пользователя.
+
+Один pipeline в Redis на апдейт:
+  EVALSHA rl:{bucket}:{id}   — GCRA rate limit (сообщения / кнопки)
+  GET lang:{id}              — язык → data["lang"]
+  GET autorenew:{id}         — флаг автопродления → data["autorenew"]
+
+Хендлеры и билдеры клавиатур берут lang/autorenew аргументами
+и сами в Redis не ходят. Регистрируется на dp.update (outer) —
+отрабатывает раньше SecurityMiddleware, флуд до БД не доходит.
+"""
+from __future__ import annotations
+import logging
+from typing import Any, Callable, Awaitable
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Update, Message, CallbackQuery
+from app.core.config import settings
+from app.core.i18n import lang_key, parse_lang
+from app.services.autorenew import autorenew_key
+from app.services.rate_limiter import rate_limiter
+
+logger = logging.getLogger(__name__)
+
+_BUCKETS = {"message": "messages", "callback_query": "callbacks"}
+
+
+class UpdateContextMiddleware(BaseMiddleware):
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        user = data.get("event_from_user")
+        if not isinstance(event, Update) or event.event_type not in _BUCKETS or not user:
+            return await handler(event, data)
+
+        # Admins bypass rate limit
+        bucket = None if user.id in settings.ADMIN_IDS else _BUCKETS[event.event_type]
+        rl, (lang, autorenew) = await rate_limiter.hit_and_fetch(
+            bucket, user.id, lang_key(user.id), autorenew_key(user.id),
+        )
+
+        if not rl.allowed:
+            inner = event.event
+            if isinstance(inner, Message):
+                await inner.answer(f"⏳ Слишком много запросов. Подожди {rl.retry_after:.0f} сек.")
+            elif isinstance(inner, CallbackQuery):
+                await inner.answer("⏳ Подожди немного.", show_alert=True)
+            return None
+
+        data["lang"] = parse_lang(lang)
+        data["autorenew"] = autorenew == "1"
+        return await handler(event, data)
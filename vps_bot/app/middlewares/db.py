@@ -0,0 +1,33 @@
+"""
+Session-per-update: одна сессия БД на апдейт → data["session"].
+
+Соединение из пула берётся лениво, при первом запросе — апдейт без
+обращений к БД пул не трогает. Сессия работает в unit_of_work:
+репозитории только flush-ат, commit / rollback — один раз в конце апдейта.
+
+Хендлеры, которые после чтения из БД идут в долгий внешний I/O
+(Proxmox, ping), вызывают session.commit(): сделанное к этому моменту
+фиксируется, соединение возвращается в пул, загруженные объекты остаются
+доступны (expire_on_commit=False). session.close() здесь нельзя — он молча
+откатит всё, что уже flush-нуто в этом апдейте (например, регистрацию).
+Фоновые задачи (provision_vps и т.п.) живут дольше апдейта и открывают
+свою сессию.
+"""
+from __future__ import annotations
+from typing import Any, Callable, Awaitable
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+from app.core.database import AsyncSessionLocal, unit_of_work
+
+
+class DbSessionMiddleware(BaseMiddleware):
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        async with AsyncSessionLocal() as session:
+            async with unit_of_work(session):
+                data["session"] = session
+                return await handler(event, data)
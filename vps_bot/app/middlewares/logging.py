@@ -1,13 +1,38 @@
+"""
+Логирование и метрики латентности.
+
+UpdateTimingMiddleware   — outer на dp.update: полное время апдейта и
+                           разбивка по DB / Redis / Telegram / Proxmox
+LoggingMiddleware        — на message и callback_query: латентность
+                           по хендлеру и роутеру
+TelegramTimingMiddleware — middleware сессии бота: время каждого Bot API вызова
+"""
 from __future__ import annotations
 import logging
 import time
 from typing import Any, Callable, Awaitable
-from aiogram import BaseMiddleware
-from aiogram.types import TelegramObject, Message
+from aiogram import BaseMiddleware, Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.methods import TelegramMethod
+from aiogram.methods.base import Response, TelegramType
+from aiogram.types import TelegramObject, Message, CallbackQuery, Update
+from app.core.metrics import metrics
 
 logger = logging.getLogger(__name__)
 
 
+class UpdateTimingMiddleware(BaseMiddleware):
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        event_type = event.event_type if isinstance(event, Update) else type(event).__name__
+        with metrics.track_update(event_type):
+            return await handler(event, data)
+
+
 class LoggingMiddleware(BaseMiddleware):
     async def __call__(
         self,
@@ -17,11 +42,30 @@ class LoggingMiddleware(BaseMiddleware):
     ) -> Any:
         user = data.get("event_from_user")
         t0 = time.perf_counter()
-        result = await handler(event, data)
-        elapsed = (time.perf_counter() - t0) * 1000
+        try:
+            return await handler(event, data)
+        finally:
+            elapsed = (time.perf_counter() - t0) * 1000
+
+            callback = getattr(data.get("handler"), "callback", None)
+            name = f"{callback.__module__.rsplit('.', 1)[-1]}.{callback.__name__}" if callback else "unhandled"
+            router = data.get("event_router")
+            metrics.observe("handler", name, elapsed)
+            metrics.observe("router", router.name if router else "unhandled", elapsed)
 
-        if isinstance(event, Message) and user:
-            text = (event.text or "")[:60]
-            logger.debug(f"[{user.id}] {text!r} → {elapsed:.0f}ms")
+            if user and isinstance(event, Message):
+                text = (event.text or "")[:60]
+                logger.debug(f"[{user.id}] {text!r} → {name} {elapsed:.0f}ms")
+            elif user and isinstance(event, CallbackQuery):
+                logger.debug(f"[{user.id}] cb {event.data!r} → {name} {elapsed:.0f}ms")
 
-        return result
+
+class TelegramTimingMiddleware(BaseRequestMiddleware):
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType],
+    ) -> Response[TelegramType]:
+        with metrics.timed("telegram", method.__api_method__):
+            return await make_request(bot, method)
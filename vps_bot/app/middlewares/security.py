@@ -3,6 +3,12 @@ Security Middleware:
 - Проверяет бан пользователя
 - Создаёт запись в БД при первом обращении + уведомляет n8n
 - Блокирует ботов (is_bot=True)
+
+Известные пользователи берутся из in-process кеша (services/user_cache),
+в БД идём только при промахе или смене username/имени — через сессию
+апдейта из DbSessionMiddleware. Upsert коммитится сразу, своей короткой
+транзакцией: кеш и событие n8n «user.registered» появляются только для
+зафиксированной строки, а ошибка хендлера регистрацию не откатывает.
 """
 from __future__ import annotations
 import logging
@@ -10,8 +16,8 @@ from typing import Any, Callable, Awaitable
 from aiogram import BaseMiddleware
 from aiogram.types import TelegramObject, Message, CallbackQuery
 from app.core.config import settings
-from app.core.database import AsyncSessionLocal
 from app.repositories.user import UserRepository
+from app.services.user_cache import user_cache
 
 logger = logging.getLogger(__name__)
 
@@ -31,22 +37,29 @@ class SecurityMiddleware(BaseMiddleware):
         if user.is_bot:
             return None
 
-        async with AsyncSessionLocal() as session:
-            repo = UserRepository(session)
+        is_new = False
+        is_banned = user_cache.get(user.id, user.username, user.full_name)
+
+        if is_banned is None:
+            session = data["session"]
 
-            # get_or_create возвращает (user, is_new)
-            db_user, is_new = await repo.get_or_create(
+            # Один upsert: регистрация, обновление профиля и бан-статус
+            db_user, is_new = await UserRepository(session).get_or_create(
                 telegram_id=user.id,
                 username=user.username,
                 full_name=user.full_name,
             )
+            await session.commit()
+            is_banned = db_user.is_banned
 
-            if db_user.is_banned:
-                if isinstance(event, Message):
-                    await event.answer("🚫 Ваш аккаунт заблокирован. Обратитесь в поддержку.")
-                elif isinstance(event, CallbackQuery):
-                    await event.answer("🚫 Аккаунт заблокирован.", show_alert=True)
-                return None
+            user_cache.put(user.id, user.username, user.full_name, is_banned)
+
+        if is_banned:
+            if isinstance(event, Message):
+                await event.answer("🚫 Ваш аккаунт заблокирован. Обратитесь в поддержку.")
+            elif isinstance(event, CallbackQuery):
+                await event.answer("🚫 Аккаунт заблокирован.", show_alert=True)
+            return None
 
         # Уведомляем n8n о новом пользователе
         if is_new:
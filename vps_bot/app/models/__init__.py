@@ -3,7 +3,7 @@ import enum
 from datetime import datetime
 from sqlalchemy import (
     BigInteger, Boolean, DateTime, Enum, ForeignKey,
-    Integer, Numeric, String, Text, func,
+    Index, Integer, Numeric, String, Text, func, text,
 )
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from app.core.database import Base
@@ -38,11 +38,22 @@ class User(Base):
     username: Mapped[str | None] = mapped_column(String(64))
     full_name: Mapped[str | None] = mapped_column(String(128))
     is_banned: Mapped[bool] = mapped_column(Boolean, default=False)
+    # Бот заблокирован / чат не найден — такие не попадают в рассылки.
+    # Сбрасывается, когда пользователь снова пишет боту.
+    unreachable_since: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    language: Mapped[str | None] = mapped_column(String(8), nullable=True)  # NULL — DEFAULT_LANG
     created_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now())
 
     vps_list: Mapped[list[Vps]] = relationship("Vps", back_populates="user", lazy="select")
     payments: Mapped[list[Payment]] = relationship("Payment", back_populates="user", lazy="select")
 
+    __table_args__ = (
+        Index(
+            "ix_users_reachable_id", "id",
+            postgresql_where=text("is_banned = false AND unreachable_since IS NULL"),
+        ),
+    )
+
 
 # ── VPS ───────────────────────────────────────────────────────
 
@@ -52,6 +63,7 @@ class Vps(Base):
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     telegram_id: Mapped[int] = mapped_column(BigInteger, ForeignKey("users.telegram_id"), nullable=False, index=True)
     vmid: Mapped[int] = mapped_column(Integer, unique=True, nullable=False)
+    node: Mapped[str | None] = mapped_column(String(64), nullable=True)  # NULL — PROXMOX_NODE
     hostname: Mapped[str] = mapped_column(String(128), nullable=False)
     ip: Mapped[str] = mapped_column(String(45), nullable=False)
     password: Mapped[str] = mapped_column(String(64), nullable=False)
@@ -94,6 +106,32 @@ class IpPool(Base):
     in_use: Mapped[bool] = mapped_column(Boolean, default=False)
 
 
+# ── Broadcast jobs ────────────────────────────────────────────
+
+class BroadcastJob(Base):
+    """Запланированная (и, возможно, повторяющаяся) рассылка."""
+    __tablename__ = "broadcast_jobs"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    created_by: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    body: Mapped[str] = mapped_column(Text, nullable=False, default="")  # HTML-текст; пусто — copy_message
+    from_chat_id: Mapped[int | None] = mapped_column(BigInteger, nullable=True)
+    message_ids: Mapped[str] = mapped_column(String(256), nullable=False, default="")
+    segment: Mapped[str] = mapped_column(String(256), nullable=False, default="")
+    run_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    repeat_hours: Mapped[int | None] = mapped_column(Integer, nullable=True)   # NULL — один раз
+    window_minutes: Mapped[int] = mapped_column(Integer, nullable=False, default=0)  # 0 — без растяжки
+    is_active: Mapped[bool] = mapped_column(Boolean, nullable=False, default=True)
+    last_broadcast_id: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    failures: Mapped[int] = mapped_column(Integer, nullable=False, default=0)  # неудачных запусков подряд
+    retry_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)  # повтор после сбоя; run_at не трогаем
+    created_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_broadcast_jobs_due", "run_at", postgresql_where=text("is_active")),
+    )
+
+
 # ── Lazy imports для регистрации всех моделей в Alembic ───────
 def _import_all() -> None:
     from app.services.referral import Referral, UserBalance  # noqa
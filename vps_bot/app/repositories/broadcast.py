@@ -0,0 +1,67 @@
+"""
+Репозиторий запланированных рассылок (таблица broadcast_jobs).
+
+Изменяющие методы коммитят сами, а внутри unit_of_work
+(app.core.database) — только flush, commit делает вызывающий.
+"""
+from __future__ import annotations
+
+from datetime import datetime
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.database import commit_or_flush
+from app.models import BroadcastJob
+
+
+class BroadcastJobRepository:
+    def __init__(self, session: AsyncSession) -> None:
+        self.session = session
+
+    async def create(self, **kwargs) -> BroadcastJob:
+        job = BroadcastJob(**kwargs)
+        self.session.add(job)
+        await commit_or_flush(self.session)
+        return job
+
+    async def get_active(self) -> list[BroadcastJob]:
+        result = await self.session.execute(
+            select(BroadcastJob)
+            .where(BroadcastJob.is_active == True)  # noqa
+            .order_by(BroadcastJob.run_at)
+        )
+        return result.scalars().all()
+
+    async def lock_due(self, now: datetime, limit: int = 10) -> list[BroadcastJob]:
+        """
+        Наступившие задания под FOR UPDATE SKIP LOCKED: при нескольких
+        репликах каждое задание забирает ровно одна. После сбоя запуска
+        задание ждёт retry_at, а не run_at.
+        """
+        due_at = func.coalesce(BroadcastJob.retry_at, BroadcastJob.run_at)
+        result = await self.session.execute(
+            select(BroadcastJob)
+            .where(BroadcastJob.is_active == True)  # noqa
+            .where(due_at <= now)
+            .order_by(due_at)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        return result.scalars().all()
+
+    async def set(self, job_id: int, **values) -> None:
+        """Обновить поля задания (итог запуска: broadcast_id, failures, повтор)."""
+        await self.session.execute(
+            update(BroadcastJob).where(BroadcastJob.id == job_id).values(**values)
+        )
+        await commit_or_flush(self.session)
+
+    async def deactivate(self, job_id: int) -> bool:
+        result = await self.session.execute(
+            update(BroadcastJob)
+            .where(BroadcastJob.id == job_id)
+            .where(BroadcastJob.is_active == True)  # noqa
+            .values(is_active=False)
+        )
+        await commit_or_flush(self.session)
+        return result.rowcount > 0
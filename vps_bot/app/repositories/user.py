@@ -3,15 +3,30 @@
 
 UserRepository    — CRUD для таблицы users
 PaymentRepository — CRUD для таблицы payments
+
+Изменяющие методы коммитят сами, а внутри unit_of_work
+(app.core.database) — только flush, commit делает вызывающий.
 """
 from __future__ import annotations
 
 from datetime import datetime
-from sqlalchemy import select, func
+from typing import TYPE_CHECKING, NamedTuple
+from sqlalchemy import Boolean, exists, false, func, literal_column, or_, select, true, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.database import after_commit, commit_or_flush
 from app.models import User, Payment, PaymentStatus
 
+if TYPE_CHECKING:
+    from app.services.segments import Segment
+
+
+class UserState(NamedTuple):
+    """То, что нужно SecurityMiddleware: без загрузки ORM-объекта целиком."""
+    id: int
+    is_banned: bool
+
 
 class UserRepository:
     def __init__(self, session: AsyncSession) -> None:
@@ -24,34 +39,59 @@ class UserRepository:
         telegram_id: int,
         username: str | None,
         full_name: str | None,
-    ) -> tuple[User, bool]:
+    ) -> tuple[UserState, bool]:
         """
-        Найти или создать пользователя.
-        Возвращает (user, is_new).
-        Обновляет username/full_name при изменении.
+        Найти или создать пользователя одним запросом (upsert).
+        Возвращает (UserState, is_new).
+        Обновляет username/full_name только если они изменились;
+        заодно снимает unreachable_since — пользователь снова пишет боту.
+
+        INSERT ... ON CONFLICT DO UPDATE ... WHERE IS DISTINCT FROM
+        не возвращает строку, если профиль не менялся, — тогда её отдаёт
+        вторая ветка UNION ALL. Гонка двух апдейтов нового юзера
+        разрешается самим ON CONFLICT, без unique violation.
         """
-        result = await self.session.execute(
-            select(User).where(User.telegram_id == telegram_id)
+        ins = pg_insert(User).values(
+            telegram_id=telegram_id, username=username, full_name=full_name,
         )
-        user = result.scalar_one_or_none()
+        upsert = ins.on_conflict_do_update(
+            index_elements=[User.telegram_id],
+            set_={
+                "username": ins.excluded.username,
+                "full_name": ins.excluded.full_name,
+                "unreachable_since": None,
+            },
+            where=or_(
+                User.username.is_distinct_from(ins.excluded.username),
+                User.full_name.is_distinct_from(ins.excluded.full_name),
+                User.unreachable_since.isnot(None),
+            ),
+        ).returning(
+            User.id,
+            User.is_banned,
+            literal_column("xmax = 0", Boolean).label("is_new"),
+            true().label("written"),
+        ).cte("upsert")
+
+        stmt = select(upsert.c.id, upsert.c.is_banned, upsert.c.is_new, upsert.c.written).union_all(
+            select(User.id, User.is_banned, false(), false())
+            .where(User.telegram_id == telegram_id)
+            .where(~exists(select(upsert.c.id)))
+        )
+        row = (await self.session.execute(stmt)).first()
 
-        if user:
-            changed = False
-            if user.username != username:
-                user.username = username
-                changed = True
-            if user.full_name != full_name:
-                user.full_name = full_name
-                changed = True
-            if changed:
-                await self.session.commit()
-            return user, False
-
-        user = User(telegram_id=telegram_id, username=username, full_name=full_name)
-        self.session.add(user)
-        await self.session.commit()
-        await self.session.refresh(user)
-        return user, True
+        if row is None:
+            # Конфликт с параллельной транзакцией, закоммиченной после снимка
+            # нашего запроса: строка уже есть, просто читаем её.
+            result = await self.session.execute(
+                select(User.id, User.is_banned).where(User.telegram_id == telegram_id)
+            )
+            state = result.one()
+            return UserState(state.id, state.is_banned), False
+
+        if row.written:
+            await commit_or_flush(self.session)
+        return UserState(row.id, row.is_banned), row.is_new
 
     async def get_by_telegram_id(self, telegram_id: int) -> User | None:
         result = await self.session.execute(
@@ -71,12 +111,35 @@ class UserRepository:
     # ── Списки ────────────────────────────────────────────
 
     async def get_all_ids(self) -> list[int]:
-        """Все telegram_id активных (не забаненных) пользователей."""
+        """Все telegram_id активных (не забаненных и достижимых) пользователей."""
         result = await self.session.execute(
-            select(User.telegram_id).where(User.is_banned == False)  # noqa
+            select(User.telegram_id)
+            .where(User.is_banned == False)  # noqa
+            .where(User.unreachable_since.is_(None))
         )
         return [row[0] for row in result.all()]
 
+    async def get_recipients_after(
+        self,
+        after_id: int,
+        limit: int,
+        segment: Segment | None = None,
+    ) -> list[tuple[int, int]]:
+        """
+        Следующая пачка (id, telegram_id) активных пользователей по возрастанию id.
+        Keyset-пагинация: курсор — последний id, пачка не держит транзакцию.
+        Идёт по частичному индексу ix_users_reachable_id; условия сегмента —
+        EXISTS-подзапросы в том же запросе.
+        """
+        result = await self.session.execute(
+            select(User.id, User.telegram_id)
+            .where(User.id > after_id)
+            .where(*_recipient_conditions(segment))
+            .order_by(User.id)
+            .limit(limit)
+        )
+        return [(row.id, row.telegram_id) for row in result.all()]
+
     async def get_recent(self, limit: int = 10) -> list[User]:
         """Последние зарегистрированные пользователи."""
         result = await self.session.execute(
@@ -97,16 +160,65 @@ class UserRepository:
         result = await self.session.execute(select(func.count(User.id)))
         return result.scalar_one()
 
+    async def count_active(self, segment: Segment | None = None) -> int:
+        """Не забаненные и достижимые (и попавшие в сегмент) — получатели рассылки."""
+        result = await self.session.execute(
+            select(func.count(User.id)).where(*_recipient_conditions(segment))
+        )
+        return result.scalar_one()
+
     # ── Изменение ─────────────────────────────────────────
 
     async def set_banned(self, telegram_id: int, banned: bool) -> None:
+        """Бан/разбан + инвалидация кеша SecurityMiddleware на всех репликах."""
         result = await self.session.execute(
             select(User).where(User.telegram_id == telegram_id)
         )
         user = result.scalar_one_or_none()
         if user:
             user.is_banned = banned
-            await self.session.commit()
+            await commit_or_flush(self.session)
+            from app.services.user_cache import publish_invalidation
+            await after_commit(self.session, lambda: publish_invalidation(telegram_id))
+
+    async def set_language(self, telegram_id: int, lang: str) -> None:
+        await self.session.execute(
+            update(User).where(User.telegram_id == telegram_id).values(language=lang)
+        )
+        await commit_or_flush(self.session)
+
+    async def get_unreachable(self, telegram_ids: list[int]) -> set[int]:
+        """Кто из списка помечен недоступным — им не пишем."""
+        if not telegram_ids:
+            return set()
+        result = await self.session.execute(
+            select(User.telegram_id)
+            .where(User.telegram_id.in_(telegram_ids))
+            .where(User.unreachable_since.isnot(None))
+        )
+        return set(result.scalars().all())
+
+    async def mark_unreachable(self, telegram_ids: list[int]) -> int:
+        """Пометить пачку чатов недоступными (Forbidden / chat not found)."""
+        result = await self.session.execute(
+            update(User)
+            .where(User.telegram_id.in_(telegram_ids))
+            .where(User.unreachable_since.is_(None))
+            .values(unreachable_since=func.now())
+        )
+        await commit_or_flush(self.session)
+        return result.rowcount
+
+
+def _recipient_conditions(segment: Segment | None) -> list:
+    """WHERE получателей рассылки: одинаково для COUNT и выборки пачек."""
+    where = [
+        User.is_banned == False,  # noqa
+        User.unreachable_since.is_(None),
+    ]
+    if segment is not None:
+        where.extend(segment.conditions())
+    return where
 
 
 class PaymentRepository:
@@ -118,7 +230,7 @@ class PaymentRepository:
     async def create(self, **kwargs) -> Payment:
         payment = Payment(**kwargs)
         self.session.add(payment)
-        await self.session.commit()
+        await commit_or_flush(self.session)
         await self.session.refresh(payment)
         return payment
 
@@ -134,7 +246,7 @@ class PaymentRepository:
         payment = await self.session.get(Payment, payment_id)
         if payment:
             payment.status = status
-            await self.session.commit()
+            await commit_or_flush(self.session)
 
     # ── Агрегаты — общие ──────────────────────────────────
 
@@ -2,6 +2,9 @@
 Репозиторий для работы с VPS.
 
 VpsRepository — все операции с таблицей vps и ip_pool.
+
+Изменяющие методы коммитят сами, а внутри unit_of_work
+(app.core.database) — только flush, commit делает вызывающий.
 """
 from __future__ import annotations
 
@@ -10,7 +13,8 @@ from datetime import datetime
 from sqlalchemy import select, func, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.models import Vps, VpsStatus, IpPool
+from app.core.database import commit_or_flush
+from app.models import Vps, VpsStatus, IpPool, User
 
 logger = logging.getLogger(__name__)
 
@@ -30,10 +34,12 @@ class VpsRepository:
         password: str,
         tariff: str,
         expires_at: datetime,
+        node: str | None = None,
     ) -> Vps:
         vps = Vps(
             telegram_id=telegram_id,
             vmid=vmid,
+            node=node,
             hostname=hostname,
             ip=ip,
             password=password,
@@ -42,7 +48,7 @@ class VpsRepository:
             status=VpsStatus.ACTIVE,
         )
         self.session.add(vps)
-        await self.session.commit()
+        await commit_or_flush(self.session)
         await self.session.refresh(vps)
         return vps
 
@@ -78,7 +84,11 @@ class VpsRepository:
         return result.scalars().all()
 
     async def get_expiring(self, days: int) -> list[Vps]:
-        """VPS которые истекают ровно через `days` дней (±12ч)."""
+        """
+        VPS которые истекают ровно через `days` дней (±12ч).
+        Недоступные чаты (users.unreachable_since) пропускаем: напоминание
+        отмечается только после доставки, иначе слали бы его каждый прогон.
+        """
         from datetime import timedelta
         now = datetime.utcnow()
         start = now + timedelta(days=days) - timedelta(hours=12)
@@ -88,9 +98,11 @@ class VpsRepository:
 
         result = await self.session.execute(
             select(Vps)
+            .join(User, User.telegram_id == Vps.telegram_id)
             .where(Vps.status == VpsStatus.ACTIVE)
             .where(Vps.expires_at.between(start, end))
             .where(field == False)  # noqa
+            .where(User.unreachable_since.is_(None))
         )
         return result.scalars().all()
 
@@ -113,7 +125,7 @@ class VpsRepository:
             # Сбрасываем флаги напоминаний при продлении
             vps.reminded_3d = False
             vps.reminded_1d = False
-            await self.session.commit()
+            await commit_or_flush(self.session)
 
     async def mark_reminded(self, vps_id: int, days: int) -> None:
         vps = await self.session.get(Vps, vps_id)
@@ -122,13 +134,13 @@ class VpsRepository:
                 vps.reminded_3d = True
             elif days == 1:
                 vps.reminded_1d = True
-            await self.session.commit()
+            await commit_or_flush(self.session)
 
     async def mark_deleted(self, vps_id: int) -> None:
         vps = await self.session.get(Vps, vps_id)
         if vps:
             vps.status = VpsStatus.DELETED
-            await self.session.commit()
+            await commit_or_flush(self.session)
 
     # ── IP пул ────────────────────────────────────────────
 
@@ -147,7 +159,7 @@ class VpsRepository:
         if not ip_row:
             return None
         ip_row.in_use = True
-        await self.session.commit()
+        await commit_or_flush(self.session)
         return ip_row.ip
 
     async def release_ip(self, ip: str) -> None:
@@ -158,4 +170,4 @@ class VpsRepository:
         ip_row = result.scalar_one_or_none()
         if ip_row:
             ip_row.in_use = False
-            await self.session.commit()
+            await commit_or_flush(self.session)
@@ -3,15 +3,19 @@
 
 Проверки перед созданием VPS:
 1. Лимит VPS на пользователя (MAX_VPS_PER_USER)
-2. Повторные попытки оплаты в короткий срок (Redis TTL)
+2. Повторные попытки оплаты в короткий срок (Redis GCRA, бакет payments)
 3. Проверка что платёж не задублирован
 
 Все отказы логируются и отправляются в n8n.
 """
 from __future__ import annotations
 import logging
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.core.config import settings
+from app.core.database import AsyncSessionLocal
 from app.core.redis import get_redis
+from app.repositories.vps import VpsRepository
+from app.services.rate_limiter import rate_limiter
 
 logger = logging.getLogger(__name__)
 
@@ -21,13 +25,13 @@ class AntifrodError(Exception):
     pass
 
 
-async def check_vps_limit(telegram_id: int) -> None:
+async def check_vps_limit(telegram_id: int, session: AsyncSession | None = None) -> None:
     """Проверить что пользователь не превысил лимит VPS."""
-    from app.core.database import AsyncSessionLocal
-    from app.repositories.vps import VpsRepository
-
-    async with AsyncSessionLocal() as session:
+    if session is not None:
         vps_list = await VpsRepository(session).get_user_vps(telegram_id)
+    else:
+        async with AsyncSessionLocal() as session:
+            vps_list = await VpsRepository(session).get_user_vps(telegram_id)
 
     if len(vps_list) >= settings.MAX_VPS_PER_USER:
         logger.warning(f"Antifrod: user {telegram_id} reached VPS limit ({len(vps_list)})")
@@ -39,17 +43,12 @@ async def check_vps_limit(telegram_id: int) -> None:
 
 
 async def check_payment_cooldown(telegram_id: int) -> None:
-    """Антиспам: не более N платежей в минуту."""
-    redis = await get_redis()
-    key = f"pay_cd:{telegram_id}"
-    count = await redis.incr(key)
-    if count == 1:
-        await redis.expire(key, 60)
-
-    if count > settings.RATE_LIMIT_PAYMENTS:
+    """Антиспам: не более RATE_LIMIT_PAYMENTS платежей за окно (бакет payments)."""
+    rl = await rate_limiter.hit("payments", telegram_id)
+    if not rl.allowed:
         logger.warning(f"Antifrod: payment rate limit for user {telegram_id}")
         raise AntifrodError(
-            "⏳ Слишком много попыток оплаты.\n\nПодожди минуту и попробуй снова."
+            f"⏳ Слишком много попыток оплаты.\n\nПодожди {rl.retry_after:.0f} сек. и попробуй снова."
         )
 
 
@@ -66,7 +65,7 @@ async def check_duplicate_payment(external_id: str) -> None:
         )
 
 
-async def run_pre_payment_checks(telegram_id: int) -> None:
+async def run_pre_payment_checks(telegram_id: int, session: AsyncSession | None = None) -> None:
     """Все проверки перед созданием инвойса."""
     await check_payment_cooldown(telegram_id)
-    await check_vps_limit(telegram_id)
+    await check_vps_limit(telegram_id, session)
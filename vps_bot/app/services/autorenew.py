@@ -6,11 +6,18 @@ import logging
 from datetime import datetime, timedelta
 from aiogram import Bot
 from app.core.config import TARIFFS
-from app.core.database import AsyncSessionLocal
+from app.core.database import unit_of_work
+from app.services.delivery import Priority
+from app.services.user_notices import UserNotices
 
 logger = logging.getLogger(__name__)
 
 
+def autorenew_key(telegram_id: int) -> str:
+    """Redis-ключ флага автопродления ("1" — включено)."""
+    return f"autorenew:{telegram_id}"
+
+
 async def try_autorenew_all(bot: Bot) -> None:
     """Пробуем автопродлить все истекающие VPS у юзеров с включённым autorenew."""
     from app.repositories.vps import VpsRepository
@@ -23,7 +30,10 @@ async def try_autorenew_all(bot: Bot) -> None:
     threshold = now + timedelta(hours=24)
     redis = await get_redis()
 
-    async with AsyncSessionLocal() as session:
+    # Все продления — одна транзакция, каждое под своим SAVEPOINT:
+    # сбой на одном VPS откатывает только его. Уведомления — после commit.
+    renewed: UserNotices[tuple[str, float, datetime, float]] = UserNotices()
+    async with unit_of_work() as session:
         result = await session.execute(
             select(Vps)
             .where(Vps.status == VpsStatus.ACTIVE)
@@ -34,7 +44,7 @@ async def try_autorenew_all(bot: Bot) -> None:
 
         for vps in expiring:
             # Проверяем флаг автопродления
-            ar_enabled = await redis.get(f"autorenew:{vps.telegram_id}")
+            ar_enabled = await redis.get(autorenew_key(vps.telegram_id))
             if ar_enabled != "1":
                 continue
 
@@ -43,28 +53,48 @@ async def try_autorenew_all(bot: Bot) -> None:
             if price_rub == 0:
                 continue
 
-            ref_repo = ReferralRepository(session)
-            balance = await ref_repo.get_or_create_balance(vps.telegram_id)
+            try:
+                async with session.begin_nested():
+                    ref_repo = ReferralRepository(session)
+                    balance = await ref_repo.get_or_create_balance(vps.telegram_id)
 
-            if float(balance.balance_rub) < price_rub:
-                continue
+                    if float(balance.balance_rub) < price_rub:
+                        continue
 
-            # Списываем и продлеваем
-            balance.balance_rub = float(balance.balance_rub) - price_rub
-            new_exp = max(vps.expires_at, now) + timedelta(days=30)
-            await VpsRepository(session).extend(vps.id, new_exp)
-            await session.commit()
+                    # Списываем и продлеваем
+                    balance.balance_rub = float(balance.balance_rub) - price_rub
+                    new_exp = max(vps.expires_at, now) + timedelta(days=30)
+                    await VpsRepository(session).extend(vps.id, new_exp)
+            except Exception as e:
+                logger.error(f"Autorenew failed for VPS #{vps.id}: {e}")
+                continue
 
+            renewed.add(vps.telegram_id, (vps.ip, price_rub, new_exp, float(balance.balance_rub)))
             logger.info(f"Autorenew: VPS #{vps.id} ({vps.ip}) for user {vps.telegram_id}")
 
-            try:
-                await bot.send_message(
-                    vps.telegram_id,
-                    f"🔄 <b>Автопродление выполнено!</b>\n\n"
-                    f"🌐 VPS: <code>{vps.ip}</code>\n"
-                    f"💳 Списано с баланса: <b>{price_rub:.0f} ₽</b>\n"
-                    f"📅 Активен до: <b>{new_exp.strftime('%d.%m.%Y')}</b>\n\n"
-                    f"Остаток баланса: <b>{float(balance.balance_rub):.2f} ₽</b>",
-                )
-            except Exception:
-                pass
+    # Одно сообщение на пользователя по всем продлённым VPS
+    renewed.send(bot, _render_renewed, priority=Priority.REMINDER, wait=False)
+
+
+def _render_renewed(rows: list[tuple[str, float, datetime, float]]) -> str:
+    balance_left = rows[-1][3]  # после последнего списания
+    if len(rows) == 1:
+        ip, price_rub, new_exp, _ = rows[0]
+        return (
+            f"🔄 <b>Автопродление выполнено!</b>\n\n"
+            f"🌐 VPS: <code>{ip}</code>\n"
+            f"💳 Списано с баланса: <b>{price_rub:.0f} ₽</b>\n"
+            f"📅 Активен до: <b>{new_exp.strftime('%d.%m.%Y')}</b>\n\n"
+            f"Остаток баланса: <b>{balance_left:.2f} ₽</b>"
+        )
+    lines = [
+        f"• <code>{ip}</code> — до <b>{new_exp.strftime('%d.%m.%Y')}</b>"
+        for ip, _, new_exp, _ in rows
+    ]
+    total = sum(price_rub for _, price_rub, _, _ in rows)
+    return (
+        f"🔄 <b>Автопродление выполнено: {len(rows)} VPS</b>\n\n"
+        + "\n".join(lines)
+        + f"\n\n💳 Списано с баланса: <b>{total:.0f} ₽</b>\n"
+        f"Остаток баланса: <b>{balance_left:.2f} ₽</b>"
+    )
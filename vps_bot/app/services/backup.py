@@ -2,24 +2,34 @@
 Автоматический бекап PostgreSQL.
 
 Каждые сутки в AUTO_BACKUP_HOUR (UTC) делает pg_dump
-и отправляет .sql.gz файл всем администраторам в Telegram.
-Также сохраняет копию в data/backups/.
+и отправляет .sql.gz файл всем администраторам в Telegram (и в канал
+уведомлений, если задан). Также сохраняет копию в data/backups/.
+
+Вывод pg_dump сжимается потоком, в память дамп целиком не читается;
+сжатие идёт в пуле потоков (asyncio.to_thread), чтобы не блокировать
+event loop, и на уровне BACKUP_GZIP_LEVEL, а не максимальном 9.
+Файл загружается в Telegram один раз: остальным получателям уходит
+file_id первой успешной загрузки. Отправка идёт через очередь доставки
+(повторы при сетевых ошибках и flood control). Дамп больше
+BACKUP_PART_SIZE режется на части .part1, .part2 … — склеить: cat.
 """
 from __future__ import annotations
 import asyncio
 import gzip
 import logging
 import os
-import subprocess
-import tempfile
 from datetime import datetime
 from pathlib import Path
 from aiogram import Bot
-from aiogram.types import BufferedInputFile
+from aiogram.methods import SendDocument
+from aiogram.types import FSInputFile
 from app.core.config import settings
+from app.services.delivery import delivery, Priority
 
 logger = logging.getLogger(__name__)
 
+BACKUP_GZIP_LEVEL = 6   # zlib по умолчанию: почти тот же размер, в разы быстрее 9
+
 
 async def make_backup(bot: Bot) -> None:
     """Создать дамп и отправить администраторам."""
@@ -38,6 +48,7 @@ async def make_backup(bot: Bot) -> None:
         env = os.environ.copy()
         env["PGPASSWORD"] = settings.POSTGRES_PASSWORD
 
+        # Сжимаем на лету, stderr читаем параллельно (иначе pg_dump может встать)
         proc = await asyncio.create_subprocess_exec(
             "pg_dump",
             "-h", settings.POSTGRES_HOST,
@@ -49,22 +60,19 @@ async def make_backup(bot: Bot) -> None:
             stderr=asyncio.subprocess.PIPE,
             env=env,
         )
-        stdout, stderr = await proc.communicate()
+        stderr_task = asyncio.create_task(proc.stderr.read())
+        with gzip.open(backup_path, "wb", compresslevel=BACKUP_GZIP_LEVEL) as f:
+            while chunk := await proc.stdout.read(1 << 20):
+                await asyncio.to_thread(f.write, chunk)
+        stderr = await stderr_task
+        await proc.wait()
 
         if proc.returncode != 0:
             raise RuntimeError(f"pg_dump failed: {stderr.decode()}")
 
-        # Сжимаем
-        with gzip.open(backup_path, "wb") as f:
-            f.write(stdout)
-
         size_kb = backup_path.stat().st_size // 1024
         logger.info(f"Backup created: {backup_path} ({size_kb} KB)")
 
-        # Отправляем администраторам
-        with open(backup_path, "rb") as f:
-            file_data = f.read()
-
         caption = (
             f"🗄️ <b>Автобекап базы данных</b>\n\n"
             f"📅 {datetime.utcnow().strftime('%d.%m.%Y %H:%M')} UTC\n"
@@ -72,15 +80,18 @@ async def make_backup(bot: Bot) -> None:
             f"🗃️ База: {settings.POSTGRES_DB}"
         )
 
-        for admin_id in settings.ADMIN_IDS:
-            try:
-                await bot.send_document(
-                    admin_id,
-                    BufferedInputFile(file_data, filename=filename),
-                    caption=caption,
+        parts = await asyncio.to_thread(split_file, backup_path, settings.BACKUP_PART_SIZE)
+        try:
+            for number, part in enumerate(parts, 1):
+                part_caption = caption if len(parts) == 1 else (
+                    f"{caption}\n🧩 Часть {number}/{len(parts)} — склеить: "
+                    f"<code>cat {filename}.part* &gt; {filename}</code>"
                 )
-            except Exception as e:
-                logger.warning(f"Failed to send backup to admin {admin_id}: {e}")
+                await send_to_all(bot, _recipients(), part, part_caption)
+        finally:
+            for part in parts:
+                if part != backup_path:
+                    part.unlink(missing_ok=True)
 
         # Удаляем старые бекапы (оставляем последние 7)
         _cleanup_old_backups(backup_dir, keep=7)
@@ -88,10 +99,58 @@ async def make_backup(bot: Bot) -> None:
     except Exception as e:
         logger.error(f"Backup failed: {e}")
         for admin_id in settings.ADMIN_IDS:
-            try:
-                await bot.send_message(admin_id, f"❌ <b>Бекап не удался</b>\n<code>{e}</code>")
-            except Exception:
-                pass
+            delivery.send_message(
+                bot, admin_id, f"❌ <b>Бекап не удался</b>\n<code>{e}</code>", wait=False,
+            )
+
+
+def _recipients() -> list[tuple[int, dict]]:
+    """(chat_id, доп. параметры) — админы и канал уведомлений."""
+    recipients: list[tuple[int, dict]] = [(admin_id, {}) for admin_id in settings.ADMIN_IDS]
+    if settings.NOTIFY_CHANNEL_ID:
+        extra = {"message_thread_id": settings.NOTIFY_TOPIC_ID} if settings.NOTIFY_TOPIC_ID else {}
+        recipients.append((settings.NOTIFY_CHANNEL_ID, extra))
+    return recipients
+
+
+async def send_to_all(bot: Bot, recipients: list[tuple[int, dict]], path: Path, caption: str) -> int:
+    """
+    Загрузить файл один раз, остальным — по file_id. Пока загрузка не удалась
+    ни разу, следующий получатель снова пробует загрузить файл. Возвращает
+    число получателей, которым файл доставлен.
+    """
+    file_id: str | None = None
+    delivered = 0
+    for chat_id, extra in recipients:
+        document = file_id or FSInputFile(path, filename=path.name)
+        method = SendDocument(chat_id=chat_id, document=document, caption=caption, **extra)
+        try:
+            message = await delivery.send(bot, chat_id, method, priority=Priority.TRANSACTIONAL)
+        except Exception as e:
+            logger.warning(f"Failed to send backup {path.name} to {chat_id}: {e}")
+            continue
+        delivered += 1
+        if file_id is None and message.document:
+            file_id = message.document.file_id
+    return delivered
+
+
+def split_file(path: Path, part_size: int) -> list[Path]:
+    """Разрезать файл на части не больше part_size; маленький файл — как есть."""
+    size = path.stat().st_size
+    if size <= part_size:
+        return [path]
+    parts: list[Path] = []
+    with open(path, "rb") as src:
+        while src.tell() < size:
+            part = path.with_name(f"{path.name}.part{len(parts) + 1}")
+            with open(part, "wb") as dst:
+                written = 0
+                while written < part_size and (chunk := src.read(min(1 << 20, part_size - written))):
+                    dst.write(chunk)
+                    written += len(chunk)
+            parts.append(part)
+    return parts
 
 
 def _cleanup_old_backups(backup_dir: Path, keep: int = 7) -> None:
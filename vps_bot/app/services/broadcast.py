@@ -0,0 +1,390 @@
+"""
+Фоновые рассылки с checkpoint в Redis.
+
+Рассылка — не хендлер, а фоновая задача:
+  • получатели читаются пачками по BROADCAST_CHUNK в порядке users.id
+    (keyset: WHERE id > cursor ORDER BY id LIMIT n — курсор на стороне
+    сервера без долгой транзакции); сегмент (services/segments.py)
+    добавляет свои условия в тот же запрос;
+  • пачку отправляют BROADCAST_WORKERS воркеров через очередь доставки
+    (services/delivery.py, приоритет BROADCAST) — скорость ограничивает она;
+  • после каждой пачки курсор и счётчики sent/failed пишутся в Redis;
+  • окно отправки (window_seconds) растягивает рассылку: пачка уходит,
+    когда подошла её доля окна — started + window · done / total.
+
+Медиа (фото, видео, документы, альбомы) не перезаливаются: получателю
+уходит copy_message / copy_messages исходного сообщения админа — Telegram
+копирует по file_id на своей стороне, трафик как у текстовой рассылки.
+
+После рестарта resume_broadcasts() продолжает все running-рассылки с
+последнего checkpoint (доставка at-least-once: недосланная пачка может
+уйти повторно). Одну рассылку ведёт одна реплика — лок broadcast:<id>:lock.
+
+Redis:
+  broadcast:seq        — счётчик id
+  broadcast:<id>       — hash: status, text, cursor, sent, failed, total,
+                         chat_id, message_id (сообщение со статусом у админа),
+                         from_chat_id, message_ids (источник для copy),
+                         segment (Segment.encode(), пусто — все),
+                         started_at, deadline (epoch; deadline 0 — без окна)
+  broadcast:active     — set id незавершённых рассылок
+  broadcast:<id>:lock  — владелец рассылки (SET NX EX)
+"""
+from __future__ import annotations
+import asyncio
+import hashlib
+import logging
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass
+from aiogram import Bot
+from aiogram.methods import CopyMessage, CopyMessages, SendMessage, TelegramMethod
+from redis.exceptions import NoScriptError
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.core.redis import get_redis
+from app.repositories.user import UserRepository
+from app.services.delivery import delivery, Priority
+from app.services.segments import Segment
+
+logger = logging.getLogger(__name__)
+
+RUNNING = "running"
+PAUSED = "paused"
+CANCELLED = "cancelled"
+DONE = "done"
+
+_SEQ_KEY = "broadcast:seq"
+_ACTIVE_KEY = "broadcast:active"
+_LOCK_TTL = 120          # секунд; продлевается на каждом checkpoint
+_FINISHED_TTL = 7 * 86400
+_PACE_STEP = 5.0         # секунд; шаг ожидания в окне — реакция на паузу / отмену
+
+# Снять лок, только если он ещё наш: GET + DEL атомарно (EVALSHA,
+# после рестарта Redis — NOSCRIPT → SCRIPT LOAD, как у GCRA в rate_limiter)
+_RELEASE_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+_RELEASE_SHA = hashlib.sha1(_RELEASE_LUA.encode()).hexdigest()
+
+# Задачи рассылок этой реплики — держим ссылки, чтобы их не собрал GC
+_tasks: dict[int, asyncio.Task] = {}
+
+
+def _key(broadcast_id: int) -> str:
+    return f"broadcast:{broadcast_id}"
+
+
+def _lock_key(broadcast_id: int) -> str:
+    return f"broadcast:{broadcast_id}:lock"
+
+
+@dataclass
+class BroadcastState:
+    id: int
+    status: str
+    text: str
+    cursor: int
+    sent: int
+    failed: int
+    total: int
+    chat_id: int
+    message_id: int
+    from_chat_id: int = 0
+    message_ids: tuple[int, ...] = ()
+    segment: Segment = Segment()
+    started_at: float = 0.0
+    deadline: float = 0.0
+
+    @classmethod
+    def from_hash(cls, broadcast_id: int, h: dict[str, str]) -> BroadcastState:
+        return cls(
+            id=broadcast_id,
+            status=h.get("status", DONE),
+            text=h.get("text", ""),
+            cursor=int(h.get("cursor", 0)),
+            sent=int(h.get("sent", 0)),
+            failed=int(h.get("failed", 0)),
+            total=int(h.get("total", 0)),
+            chat_id=int(h.get("chat_id", 0)),
+            message_id=int(h.get("message_id", 0)),
+            from_chat_id=int(h.get("from_chat_id", 0)),
+            message_ids=tuple(int(m) for m in h.get("message_ids", "").split(",") if m),
+            segment=Segment.decode(h.get("segment")),
+            started_at=float(h.get("started_at", 0)),
+            deadline=float(h.get("deadline", 0)),
+        )
+
+    def pace_delay(self, now: float) -> float:
+        """Сколько ждать до следующей пачки, чтобы уложиться в окно равномерно."""
+        if not self.deadline or not self.total:
+            return 0.0
+        done = min(self.sent + self.failed, self.total)
+        due = self.started_at + (self.deadline - self.started_at) * done / self.total
+        return max(0.0, due - now)
+
+    def method_for(self, telegram_id: int) -> TelegramMethod:
+        """Вызов Bot API для одного получателя: текст или копия источника."""
+        if not self.message_ids:
+            return SendMessage(chat_id=telegram_id, text=f"📢 {self.text}")
+        if len(self.message_ids) == 1:
+            return CopyMessage(
+                chat_id=telegram_id, from_chat_id=self.from_chat_id, message_id=self.message_ids[0],
+            )
+        return CopyMessages(
+            chat_id=telegram_id, from_chat_id=self.from_chat_id, message_ids=list(self.message_ids),
+        )
+
+
+async def get_broadcast(broadcast_id: int) -> BroadcastState | None:
+    redis = await get_redis()
+    h = await redis.hgetall(_key(broadcast_id))
+    return BroadcastState.from_hash(broadcast_id, h) if h else None
+
+
+# ── Управление ────────────────────────────────────────────────
+
+async def start_broadcast(
+    bot: Bot,
+    text: str,
+    chat_id: int,
+    message_id: int,
+    copy_from: tuple[int, list[int]] | None = None,
+    segment: Segment | None = None,
+    window_seconds: int = 0,
+) -> int:
+    """
+    Создать рассылку и запустить её в фоне. Возвращает id.
+    copy_from=(from_chat_id, [message_id, ...]) — разослать копию
+    сообщения / альбома вместо текста; segment — только часть пользователей;
+    window_seconds — растянуть отправку на это время.
+    """
+    segment = segment or Segment()
+    async with AsyncSessionLocal() as session:
+        total = await UserRepository(session).count_active(segment)
+
+    redis = await get_redis()
+    now = time.time()
+    broadcast_id = await redis.incr(_SEQ_KEY)
+    await redis.hset(_key(broadcast_id), mapping={
+        "status": RUNNING,
+        "text": text,
+        "cursor": 0,
+        "sent": 0,
+        "failed": 0,
+        "total": total,
+        "chat_id": chat_id,
+        "message_id": message_id,
+        "from_chat_id": copy_from[0] if copy_from else 0,
+        "message_ids": ",".join(map(str, copy_from[1])) if copy_from else "",
+        "segment": segment.encode(),
+        "started_at": now,
+        "deadline": now + window_seconds if window_seconds > 0 else 0,
+    })
+    await redis.sadd(_ACTIVE_KEY, broadcast_id)
+    logger.info(f"📢 Broadcast #{broadcast_id} started: {total} recipients ({segment.describe()})")
+    _spawn(bot, broadcast_id)
+    return broadcast_id
+
+
+async def pause_broadcast(broadcast_id: int) -> bool:
+    """Пауза применяется на границе пачки."""
+    return await _set_status(broadcast_id, PAUSED, expect=RUNNING)
+
+
+async def resume_broadcast(bot: Bot, broadcast_id: int) -> bool:
+    if not await _set_status(broadcast_id, RUNNING, expect=PAUSED):
+        return False
+    _spawn(bot, broadcast_id)
+    return True
+
+
+async def cancel_broadcast(broadcast_id: int) -> bool:
+    state = await get_broadcast(broadcast_id)
+    if state is None or state.status not in (RUNNING, PAUSED):
+        return False
+    await _finish(broadcast_id, CANCELLED)
+    return True
+
+
+async def resume_broadcasts(bot: Bot) -> None:
+    """На старте: подхватить running-рассылки с последнего checkpoint."""
+    redis = await get_redis()
+    for raw_id in await redis.smembers(_ACTIVE_KEY):
+        state = await get_broadcast(int(raw_id))
+        if state is None:
+            await redis.srem(_ACTIVE_KEY, raw_id)
+        elif state.status == RUNNING:
+            logger.info(f"📢 Resuming broadcast #{state.id} from user id > {state.cursor}")
+            _spawn(bot, state.id)
+
+
+async def _set_status(broadcast_id: int, status: str, expect: str) -> bool:
+    state = await get_broadcast(broadcast_id)
+    if state is None or state.status != expect:
+        return False
+    redis = await get_redis()
+    await redis.hset(_key(broadcast_id), "status", status)
+    return True
+
+
+async def _finish(broadcast_id: int, status: str) -> None:
+    redis = await get_redis()
+    pipe = redis.pipeline(transaction=True)
+    pipe.hset(_key(broadcast_id), "status", status)
+    pipe.expire(_key(broadcast_id), _FINISHED_TTL)
+    pipe.srem(_ACTIVE_KEY, broadcast_id)
+    await pipe.execute()
+
+
+# ── Исполнение ────────────────────────────────────────────────
+
+def _spawn(bot: Bot, broadcast_id: int) -> None:
+    task = _tasks.get(broadcast_id)
+    if task is not None and not task.done():
+        return
+    _tasks[broadcast_id] = asyncio.create_task(
+        _run(bot, broadcast_id), name=f"broadcast:{broadcast_id}",
+    )
+
+
+async def _run(bot: Bot, broadcast_id: int) -> None:
+    redis = await get_redis()
+    owner = uuid.uuid4().hex
+    try:
+        # Лок держит другая реплика (или ещё не истёк после падения) — ждём
+        while not await redis.set(_lock_key(broadcast_id), owner, nx=True, ex=_LOCK_TTL):
+            state = await get_broadcast(broadcast_id)
+            if state is None or state.status != RUNNING:
+                return
+            await asyncio.sleep(_LOCK_TTL / 4)
+
+        while True:
+            state = await get_broadcast(broadcast_id)
+            if state is None or state.status != RUNNING:
+                break
+
+            async with AsyncSessionLocal() as session:
+                chunk = await UserRepository(session).get_recipients_after(
+                    state.cursor, settings.BROADCAST_CHUNK, state.segment,
+                )
+            if not chunk:
+                await _finish(broadcast_id, DONE)
+                logger.info(f"📢 Broadcast #{broadcast_id} done: {state.sent} sent, {state.failed} failed")
+                break
+
+            sent, failed = await _send_chunk(bot, state, [tid for _, tid in chunk])
+
+            # Checkpoint: курсор + счётчики + продление лока — одним MULTI
+            pipe = redis.pipeline(transaction=True)
+            pipe.hset(_key(broadcast_id), "cursor", chunk[-1][0])
+            pipe.hincrby(_key(broadcast_id), "sent", sent)
+            pipe.hincrby(_key(broadcast_id), "failed", failed)
+            pipe.expire(_lock_key(broadcast_id), _LOCK_TTL)
+            await pipe.execute()
+            await _render_progress(bot, broadcast_id)
+            await _pace(broadcast_id)
+
+        await _render_progress(bot, broadcast_id)
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        logger.exception(f"Broadcast #{broadcast_id} crashed: {e}")
+    finally:
+        _tasks.pop(broadcast_id, None)
+        await _release_lock(redis, broadcast_id, owner)
+
+
+async def _release_lock(redis, broadcast_id: int, owner: str) -> None:
+    """Снять свой лок; не вышло — он истечёт сам через _LOCK_TTL."""
+    try:
+        try:
+            await redis.evalsha(_RELEASE_SHA, 1, _lock_key(broadcast_id), owner)
+        except NoScriptError:
+            await redis.script_load(_RELEASE_LUA)
+            await redis.evalsha(_RELEASE_SHA, 1, _lock_key(broadcast_id), owner)
+    except Exception as e:
+        logger.warning(f"Broadcast #{broadcast_id}: lock release failed: {e}")
+
+
+async def _pace(broadcast_id: int) -> None:
+    """Ждать свою долю окна отправки; пауза и отмена прерывают ожидание."""
+    redis = await get_redis()
+    while True:
+        state = await get_broadcast(broadcast_id)
+        if state is None or state.status != RUNNING:
+            return
+        delay = state.pace_delay(time.time())
+        if delay <= 0:
+            return
+        await asyncio.sleep(min(delay, _PACE_STEP))
+        await redis.expire(_lock_key(broadcast_id), _LOCK_TTL)
+
+
+async def _send_chunk(bot: Bot, state: BroadcastState, telegram_ids: list[int]) -> tuple[int, int]:
+    """BROADCAST_WORKERS воркеров разбирают пачку; темп задаёт очередь доставки."""
+    pending = deque(telegram_ids)
+    sent = failed = 0
+
+    async def worker() -> None:
+        nonlocal sent, failed
+        while pending:
+            telegram_id = pending.popleft()
+            try:
+                await delivery.send(
+                    bot, telegram_id, state.method_for(telegram_id), priority=Priority.BROADCAST,
+                )
+                sent += 1
+            except Exception:
+                failed += 1
+
+    workers = min(settings.BROADCAST_WORKERS, len(pending))
+    await asyncio.gather(*(worker() for _ in range(workers)))
+    return sent, failed
+
+
+# ── Статус для админа ─────────────────────────────────────────
+
+_STATUS_TITLES = {
+    RUNNING: "📢 <b>Рассылка #{id}</b> — идёт",
+    PAUSED: "⏸ <b>Рассылка #{id}</b> — на паузе",
+    CANCELLED: "⏹ <b>Рассылка #{id}</b> — отменена",
+    DONE: "✅ <b>Рассылка #{id}</b> — завершена",
+}
+
+
+def format_progress(state: BroadcastState) -> str:
+    done = state.sent + state.failed
+    pct = min(100.0, done / state.total * 100) if state.total else 100.0
+    bar = "█" * int(pct / 10) + "░" * (10 - int(pct / 10))
+    window = ""
+    if state.deadline:
+        window = f"🕒 Растянута на {(state.deadline - state.started_at) / 60:.0f} мин\n"
+    return (
+        f"{_STATUS_TITLES.get(state.status, _STATUS_TITLES[DONE]).format(id=state.id)}\n"
+        f"🎯 {state.segment.describe()}\n{window}\n"
+        f"{bar} {pct:.0f}%\n"
+        f"Прогресс: {done}/{state.total}\n"
+        f"✅ Доставлено: {state.sent}  ❌ Ошибок: {state.failed}"
+    )
+
+
+async def _render_progress(bot: Bot, broadcast_id: int) -> None:
+    from app.utils.keyboards import adm_broadcast_ctl_kb
+
+    state = await get_broadcast(broadcast_id)
+    if state is None or not state.chat_id:
+        return
+    try:
+        await bot.edit_message_text(
+            format_progress(state),
+            chat_id=state.chat_id,
+            message_id=state.message_id,
+            reply_markup=adm_broadcast_ctl_kb(state.id, state.status),
+        )
+    except Exception:
+        pass
@@ -0,0 +1,229 @@
+"""
+Запланированные и повторяющиеся рассылки.
+
+Задание (таблица broadcast_jobs) хранит всё, что нужно для запуска:
+текст или источник copy_message, сегмент, время старта run_at (UTC),
+повтор repeat_hours (NULL — один раз) и окно отправки window_minutes.
+
+Запускает их не хендлер, а планировщик (core/scheduler.py): раз в минуту
+run_due_jobs() забирает наступившие задания под FOR UPDATE SKIP LOCKED
+(при нескольких репликах каждое берёт ровно одна), сдвигает run_at на
+следующий повтор или выключает задание и коммитит это — и только потом
+стартует обычную фоновую рассылку (services/broadcast.py). Так сбой
+commit не приводит к повторной отправке на следующем тике.
+
+Не стартовала (Redis, БД) — задание снова активно через _RETRY_DELAY
+(retry_at), а run_at возвращается на пропущенный слот, чтобы повтор не
+сдвигал расписание; после _MAX_FAILURES неудач подряд выключается.
+Пропущенные за время простоя повторы не догоняются — следующий запуск
+назначается в будущем по исходной сетке run_at.
+
+Параметры расписания в админке — Schedule (строка в FSM):
+    "in=3,every=24,window=120"  ⇄  Schedule(start_in_hours=3, repeat_hours=24, window_minutes=120)
+"""
+from __future__ import annotations
+import logging
+from dataclasses import dataclass, replace
+from datetime import datetime, timedelta
+from aiogram import Bot
+from app.core.database import AsyncSessionLocal, unit_of_work
+from app.models import BroadcastJob
+from app.repositories.broadcast import BroadcastJobRepository
+from app.services.broadcast import start_broadcast
+from app.services.delivery import delivery
+from app.services.segments import Segment, next_preset
+
+logger = logging.getLogger(__name__)
+
+# Пресеты для кнопок админки: переключаются по кругу
+START_PRESETS = (1, 3, 12, 24)            # часов до старта
+REPEAT_PRESETS = (None, 24, 168)          # раз в день / неделю
+WINDOW_PRESETS = (0, 30, 120, 360)        # минут на отправку
+
+_DUE_BATCH = 10
+_MAX_FAILURES = 3                          # неудачных запусков подряд — и задание выключается
+_RETRY_DELAY = timedelta(minutes=5)
+
+
+@dataclass(frozen=True)
+class Schedule:
+    start_in_hours: int = START_PRESETS[0]
+    repeat_hours: int | None = None
+    window_minutes: int = 0
+
+    def encode(self) -> str:
+        parts = [f"in={self.start_in_hours}"]
+        if self.repeat_hours:
+            parts.append(f"every={self.repeat_hours}")
+        if self.window_minutes:
+            parts.append(f"window={self.window_minutes}")
+        return ",".join(parts)
+
+    @classmethod
+    def decode(cls, raw: str | None) -> Schedule:
+        fields: dict = {}
+        for part in (raw or "").split(","):
+            name, _, value = part.partition("=")
+            if name == "in":
+                fields["start_in_hours"] = int(value)
+            elif name == "every":
+                fields["repeat_hours"] = int(value)
+            elif name == "window":
+                fields["window_minutes"] = int(value)
+        return cls(**fields)
+
+    def toggle(self, name: str) -> Schedule:
+        """Переключить параметр (кнопки админки)."""
+        if name == "in":
+            return replace(self, start_in_hours=next_preset(START_PRESETS, self.start_in_hours))
+        if name == "every":
+            return replace(self, repeat_hours=next_preset(REPEAT_PRESETS, self.repeat_hours))
+        if name == "window":
+            return replace(self, window_minutes=next_preset(WINDOW_PRESETS, self.window_minutes))
+        return self
+
+    def describe(self) -> str:
+        return (
+            f"старт через {self.start_in_hours} ч · "
+            f"{describe_repeat(self.repeat_hours)} · {describe_window(self.window_minutes)}"
+        )
+
+
+def describe_repeat(hours: int | None) -> str:
+    if not hours:
+        return "один раз"
+    if hours == 24:
+        return "каждый день"
+    if hours == 168:
+        return "каждую неделю"
+    return f"каждые {hours} ч"
+
+
+def describe_window(minutes: int) -> str:
+    return f"окно {minutes} мин" if minutes else "без окна"
+
+
+def next_run(run_at: datetime, repeat_hours: int | None, now: datetime) -> datetime | None:
+    """Следующий запуск повторяющегося задания (строго в будущем) или None."""
+    if not repeat_hours:
+        return None
+    step = timedelta(hours=repeat_hours)
+    missed = max(0, (now - run_at) // step)
+    return run_at + step * (missed + 1)
+
+
+# ── Управление ────────────────────────────────────────────────
+
+async def create_job(
+    created_by: int,
+    text: str,
+    schedule: Schedule,
+    copy_from: tuple[int, list[int]] | None = None,
+    segment: Segment | None = None,
+) -> BroadcastJob:
+    async with AsyncSessionLocal() as session:
+        job = await BroadcastJobRepository(session).create(
+            created_by=created_by,
+            body=text,
+            from_chat_id=copy_from[0] if copy_from else None,
+            message_ids=",".join(map(str, copy_from[1])) if copy_from else "",
+            segment=(segment or Segment()).encode(),
+            run_at=datetime.utcnow() + timedelta(hours=schedule.start_in_hours),
+            repeat_hours=schedule.repeat_hours,
+            window_minutes=schedule.window_minutes,
+        )
+    logger.info(f"🗓 Broadcast job #{job.id} scheduled at {job.run_at:%Y-%m-%d %H:%M} UTC")
+    return job
+
+
+async def list_jobs() -> list[BroadcastJob]:
+    async with AsyncSessionLocal() as session:
+        return await BroadcastJobRepository(session).get_active()
+
+
+async def cancel_job(job_id: int) -> bool:
+    async with AsyncSessionLocal() as session:
+        return await BroadcastJobRepository(session).deactivate(job_id)
+
+
+# ── Запуск (планировщик) ──────────────────────────────────────
+
+async def run_due_jobs(bot: Bot) -> int:
+    """Запустить наступившие задания. Вызывается из core/scheduler.py."""
+    now = datetime.utcnow()
+
+    # 1. Забираем задания: следующий запуск фиксируется ДО старта рассылки
+    #    (объекты после commit остаются читаемыми — expire_on_commit=False)
+    async with unit_of_work() as session:
+        claimed = await BroadcastJobRepository(session).lock_due(now, _DUE_BATCH)
+        slots = {job.id: job.run_at for job in claimed}
+        for job in claimed:
+            job.retry_at = None
+            upcoming = next_run(job.run_at, job.repeat_hours, now)
+            if upcoming is None:
+                job.is_active = False
+            else:
+                job.run_at = upcoming
+
+    # 2. Стартуем уже вне транзакции
+    started = 0
+    for job in claimed:
+        try:
+            broadcast_id = await _start(bot, job)
+        except Exception as e:
+            await _record_failure(job, e, now, slots[job.id])
+            continue
+        started += 1
+        try:
+            async with AsyncSessionLocal() as session:
+                await BroadcastJobRepository(session).set(job.id, last_broadcast_id=broadcast_id, failures=0)
+        except Exception as e:
+            logger.error(f"Broadcast job #{job.id}: started #{broadcast_id}, but not recorded: {e}")
+    return started
+
+
+async def _record_failure(job: BroadcastJob, error: Exception, now: datetime, slot: datetime) -> None:
+    """
+    Повторить через _RETRY_DELAY или выключить после _MAX_FAILURES неудач подряд.
+    slot — run_at, за которым задание забрали: следующий повтор после
+    удачного retry считается от него, а не от времени retry.
+    """
+    failures = (job.failures or 0) + 1
+    disable = failures >= _MAX_FAILURES
+    if disable:
+        logger.error(f"Broadcast job #{job.id} failed {failures} times, disabled: {error}")
+        values = {"failures": failures, "is_active": False}
+    else:
+        logger.error(f"Broadcast job #{job.id} failed to start ({failures}/{_MAX_FAILURES}): {error}")
+        values = {
+            "failures": failures, "is_active": True,
+            "run_at": slot, "retry_at": now + _RETRY_DELAY,
+        }
+    try:
+        async with AsyncSessionLocal() as session:
+            await BroadcastJobRepository(session).set(job.id, **values)
+    except Exception as e:
+        logger.error(f"Broadcast job #{job.id}: failure not recorded: {e}")
+
+
+async def _start(bot: Bot, job: BroadcastJob) -> int:
+    # Статус админу — через очередь доставки; не дошло (админ заблокировал
+    # бота и т.п.) — рассылка идёт без сообщения о прогрессе
+    try:
+        status_msg = await delivery.send_message(
+            bot, job.created_by, f"🗓 <b>Запланированная рассылка #{job.id} запускается...</b>",
+        )
+        status_chat, status_id = status_msg.chat.id, status_msg.message_id
+    except Exception as e:
+        logger.warning(f"Broadcast job #{job.id}: status message not delivered: {e}")
+        status_chat, status_id = 0, 0
+
+    message_ids = [int(m) for m in job.message_ids.split(",") if m]
+    broadcast_id = await start_broadcast(
+        bot, job.body, status_chat, status_id,
+        copy_from=(job.from_chat_id, message_ids) if message_ids else None,
+        segment=Segment.decode(job.segment),
+        window_seconds=job.window_minutes * 60,
+    )
+    logger.info(f"🗓 Broadcast job #{job.id} → broadcast #{broadcast_id}")
+    return broadcast_id
@@ -0,0 +1,266 @@
+"""
+Единая очередь исходящих сообщений в Telegram.
+
+Все рассылки, напоминания, уведомления и ошибки идут через один
+DeliveryService, который соблюдает лимиты Bot API:
+  • глобально   — DELIVERY_GLOBAL_RATE сообщений/сек (token bucket);
+  • на один чат — не чаще раза в DELIVERY_CHAT_INTERVAL сек.
+
+Приоритеты (меньше — раньше):
+  TRANSACTIONAL — ответы на оплату/создание VPS, ошибки, алерты админам
+  REMINDER      — плановые: напоминания, автопродление, удаление, канал
+  BROADCAST     — рассылки
+
+TelegramRetryAfter → глобальная пауза на retry_after и повтор того же
+сообщения; сетевые/5xx ошибки → повтор с backoff до DELIVERY_MAX_ATTEMPTS.
+Остальные ошибки (бот заблокирован, чат не найден, bad request) — сразу
+отдаются вызывающему; недоступные чаты пачкой помечаются в users
+(services/reachability.py) и выпадают из рассылок.
+
+Использование:
+    await delivery.send_message(bot, chat_id, text)              # ждём результат
+    delivery.send_message(bot, chat_id, text, wait=False,
+                          priority=Priority.REMINDER)             # fire-and-forget
+
+Метрики: delivery.sent / delivery.failed / delivery.retry_after /
+delivery.retried (counters), delivery/<priority> — ожидание в очереди.
+"""
+from __future__ import annotations
+import asyncio
+import heapq
+import itertools
+import logging
+from dataclasses import dataclass, field
+from enum import IntEnum
+from typing import Any
+from aiogram import Bot
+from aiogram.exceptions import (
+    TelegramForbiddenError,
+    TelegramNetworkError,
+    TelegramRetryAfter,
+    TelegramServerError,
+)
+from aiogram.methods import SendMessage, TelegramMethod
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.services.reachability import is_unreachable_error, unreachable
+
+logger = logging.getLogger(__name__)
+
+
+class Priority(IntEnum):
+    TRANSACTIONAL = 0
+    REMINDER = 1
+    BROADCAST = 2
+
+
+@dataclass(order=True)
+class _Job:
+    priority: int
+    seq: int
+    bot: Bot = field(compare=False)
+    chat_id: int = field(compare=False)
+    method: TelegramMethod = field(compare=False)
+    future: asyncio.Future | None = field(compare=False)
+    enqueued_at: float = field(compare=False)
+    attempts: int = field(default=0, compare=False)
+
+
+class DeliveryService:
+    """
+    Планировщик отправки: приоритетная куча готовых задач + куча
+    отложенных (чат ещё «остывает» или ждём backoff). Живёт в одном
+    event loop, цикл стартует лениво при первой отправке.
+    """
+
+    def __init__(
+        self,
+        global_rate: float,
+        chat_interval: float,
+        max_inflight: int = 30,
+        max_attempts: int = 5,
+    ) -> None:
+        self.global_rate = global_rate
+        self.chat_interval = chat_interval
+        self.max_attempts = max_attempts
+        self._max_inflight = max_inflight
+
+        self._ready: list[_Job] = []
+        self._delayed: list[tuple[float, int, _Job]] = []
+        self._chat_next: dict[int, float] = {}
+        self._seq = itertools.count()
+
+        self._tokens = global_rate
+        self._refilled_at = 0.0
+        self._paused_until = 0.0
+
+        self._wakeup: asyncio.Event | None = None
+        self._inflight: asyncio.Semaphore | None = None
+        self._task: asyncio.Task | None = None
+        self._sending: set[asyncio.Task] = set()  # держим ссылки, чтобы не собрал GC
+
+    def __len__(self) -> int:
+        return len(self._ready) + len(self._delayed)
+
+    # ── Публичный API ─────────────────────────────────────
+
+    def send(
+        self,
+        bot: Bot,
+        chat_id: int,
+        method: TelegramMethod,
+        priority: Priority = Priority.TRANSACTIONAL,
+        wait: bool = True,
+    ) -> asyncio.Future | None:
+        """
+        Поставить вызов Bot API в очередь. wait=True — вернуть future
+        с результатом (await), иначе ошибки только логируются.
+        """
+        self._ensure_started()
+        loop = asyncio.get_running_loop()
+        future = loop.create_future() if wait else None
+        job = _Job(priority, next(self._seq), bot, chat_id, method, future, loop.time())
+        heapq.heappush(self._ready, job)
+        self._wakeup.set()
+        return future
+
+    def send_message(
+        self,
+        bot: Bot,
+        chat_id: int,
+        text: str,
+        priority: Priority = Priority.TRANSACTIONAL,
+        wait: bool = True,
+        **kwargs: Any,
+    ) -> asyncio.Future | None:
+        method = SendMessage(chat_id=chat_id, text=text, **kwargs)
+        return self.send(bot, chat_id, method, priority, wait)
+
+    async def stop(self) -> None:
+        """Остановить воркер очереди (dp.shutdown) и дождаться его завершения."""
+        task, self._task = self._task, None
+        if task:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    # ── Планировщик ───────────────────────────────────────
+
+    def _ensure_started(self) -> None:
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._inflight = asyncio.Semaphore(self._max_inflight)
+            self._task = asyncio.create_task(self._run(), name="delivery")
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self._take_token()
+                job = await self._next_job()
+                await self._inflight.acquire()
+                task = asyncio.create_task(self._deliver(job))
+                self._sending.add(task)
+                task.add_done_callback(self._sending.discard)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.exception(f"Delivery loop error: {e}")
+
+    async def _take_token(self) -> None:
+        """Глобальный token bucket; во время RetryAfter-паузы — ждём."""
+        loop = asyncio.get_running_loop()
+        while True:
+            now = loop.time()
+            if now < self._paused_until:
+                await asyncio.sleep(self._paused_until - now)
+                continue
+            elapsed = now - self._refilled_at
+            self._tokens = min(self.global_rate, self._tokens + elapsed * self.global_rate)
+            self._refilled_at = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await asyncio.sleep((1 - self._tokens) / self.global_rate)
+
+    async def _next_job(self) -> _Job:
+        """Самая приоритетная задача, чей чат уже можно писать."""
+        loop = asyncio.get_running_loop()
+        while True:
+            now = loop.time()
+            while self._delayed and self._delayed[0][0] <= now:
+                heapq.heappush(self._ready, heapq.heappop(self._delayed)[2])
+
+            while self._ready:
+                job = heapq.heappop(self._ready)
+                not_before = self._chat_next.get(job.chat_id, 0.0)
+                if not_before > now:
+                    heapq.heappush(self._delayed, (not_before, job.seq, job))
+                    continue
+                self._chat_next[job.chat_id] = now + self.chat_interval
+                self._prune_chats(now)
+                return job
+
+            timeout = self._delayed[0][0] - now if self._delayed else None
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def _prune_chats(self, now: float) -> None:
+        if len(self._chat_next) > 10_000:
+            self._chat_next = {c: t for c, t in self._chat_next.items() if t > now}
+
+    def _retry_later(self, job: _Job, delay: float) -> None:
+        loop = asyncio.get_running_loop()
+        not_before = loop.time() + delay
+        self._chat_next[job.chat_id] = max(self._chat_next.get(job.chat_id, 0.0), not_before)
+        heapq.heappush(self._delayed, (not_before, job.seq, job))
+        self._wakeup.set()
+
+    async def _deliver(self, job: _Job) -> None:
+        loop = asyncio.get_running_loop()
+        prio = Priority(job.priority).name.lower()
+        if job.attempts == 0:
+            metrics.observe("delivery", prio, (loop.time() - job.enqueued_at) * 1000)
+        job.attempts += 1
+        try:
+            result = await job.bot(job.method)
+        except TelegramRetryAfter as e:
+            metrics.inc("delivery.retry_after")
+            logger.warning(f"Delivery: flood control, pause {e.retry_after}s (chat {job.chat_id})")
+            self._paused_until = max(self._paused_until, loop.time() + e.retry_after)
+            self._retry_later(job, e.retry_after)
+        except (TelegramNetworkError, TelegramServerError) as e:
+            if job.attempts < self.max_attempts:
+                metrics.inc("delivery.retried")
+                self._retry_later(job, min(2 ** job.attempts, 30))
+            else:
+                self._fail(job, e)
+        except Exception as e:
+            self._fail(job, e)
+        else:
+            metrics.inc("delivery.sent")
+            if job.future and not job.future.done():
+                job.future.set_result(result)
+        finally:
+            self._inflight.release()
+
+    def _fail(self, job: _Job, exc: Exception) -> None:
+        metrics.inc("delivery.failed")
+        if is_unreachable_error(exc):
+            unreachable.mark(job.chat_id)
+        if job.future:
+            if not job.future.done():
+                job.future.set_exception(exc)
+        elif isinstance(exc, TelegramForbiddenError):
+            logger.info(f"Delivery: user {job.chat_id} blocked the bot")
+        else:
+            logger.warning(f"Delivery to {job.chat_id} failed: {exc}")
+
+
+delivery = DeliveryService(
+    global_rate=settings.DELIVERY_GLOBAL_RATE,
+    chat_interval=settings.DELIVERY_CHAT_INTERVAL,
+    max_inflight=settings.DELIVERY_MAX_INFLIGHT,
+    max_attempts=settings.DELIVERY_MAX_ATTEMPTS,
+)
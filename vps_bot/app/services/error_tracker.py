@@ -0,0 +1,212 @@
+"""
+Агрегация необработанных ошибок по отпечаткам.
+
+Отпечаток (fingerprint) — тип исключения + верхние кадры стека
+(модуль:функция, без номеров строк — переживает мелкие правки кода).
+Один и тот же сбой (упал Postgres, недоступен Proxmox) из тысячи апдейтов
+даёт один отпечаток, а не тысячу сообщений админам.
+
+  • админам уходит одно оповещение на отпечаток за ERROR_ALERT_WINDOW
+    секунд (SET NX EX в Redis — одно на все реплики);
+  • раз в ERROR_DIGEST_MINUTES — дайджест: сколько раз что упало;
+  • /errors показывает топ отпечатков с примером traceback.
+
+Память (на реплику) — ERROR_TRACK_MAX отпечатков, вытесняются самые старые.
+Redis (общий для реплик):
+  errors:top          — zset отпечаток → число ошибок
+  errors:<fp>         — hash: type, message, sample, last_seen
+  errors:alert:<fp>   — маркер «оповещение уже было» (EX окно)
+Если Redis недоступен, работает только память.
+"""
+from __future__ import annotations
+import hashlib
+import html
+import logging
+import os
+import time
+import traceback
+from collections import OrderedDict
+from dataclasses import dataclass, replace
+from app.core.config import settings
+from app.core.redis import get_redis
+
+logger = logging.getLogger(__name__)
+
+_TOP_KEY = "errors:top"
+_FRAMES = 3                # кадров стека в отпечатке
+_SAMPLE_LEN = 3000         # символов traceback в примере
+
+
+def fingerprint(exc: BaseException) -> str:
+    """Короткий стабильный отпечаток: тип + верхние кадры (предпочтительно из app/)."""
+    frames = traceback.extract_tb(exc.__traceback__)
+    own = [f for f in frames if f"{os.sep}app{os.sep}" in f.filename] or frames
+    parts = [type(exc).__qualname__]
+    parts += [f"{os.path.basename(f.filename)}:{f.name}" for f in own[-_FRAMES:]]
+    return hashlib.blake2b("|".join(parts).encode(), digest_size=6).hexdigest()
+
+
+@dataclass
+class ErrorStat:
+    fingerprint: str
+    type: str
+    message: str
+    sample: str
+    count: int = 0           # всего
+    pending: int = 0         # с последнего дайджеста
+    last_seen: float = 0.0
+    last_alert: float = 0.0
+
+
+class ErrorTracker:
+    def __init__(self, alert_window: float, max_tracked: int) -> None:
+        self.alert_window = alert_window
+        self.max_tracked = max_tracked
+        self._stats: OrderedDict[str, ErrorStat] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._stats)
+
+    async def record(self, exc: BaseException) -> tuple[ErrorStat, bool]:
+        """Учесть ошибку. Возвращает (статистика, нужно ли оповестить админов)."""
+        fp = fingerprint(exc)
+        now = time.time()
+        stat = self._stats.get(fp)
+        if stat is None:
+            stat = ErrorStat(
+                fingerprint=fp,
+                type=type(exc).__name__,
+                message=str(exc)[:300],
+                sample="".join(traceback.format_exception(exc))[-_SAMPLE_LEN:],
+            )
+            self._stats[fp] = stat
+            while len(self._stats) > self.max_tracked:
+                self._stats.popitem(last=False)
+        self._stats.move_to_end(fp)
+        stat.count += 1
+        stat.pending += 1
+        stat.last_seen = now
+
+        alert = await self._store(stat, now)
+        if alert is None:  # Redis недоступен — решаем по памяти
+            alert = now - stat.last_alert >= self.alert_window
+        if alert:
+            stat.last_alert = now
+        return stat, alert
+
+    async def _store(self, stat: ErrorStat, now: float) -> bool | None:
+        try:
+            redis = await get_redis()
+            pipe = redis.pipeline(transaction=False)
+            pipe.zincrby(_TOP_KEY, 1, stat.fingerprint)
+            pipe.hset(f"errors:{stat.fingerprint}", mapping={
+                "type": stat.type,
+                "message": stat.message,
+                "sample": stat.sample,
+                "last_seen": now,
+            })
+            pipe.set(f"errors:alert:{stat.fingerprint}", 1, nx=True, ex=int(self.alert_window))
+            results = await pipe.execute()
+            return bool(results[-1])
+        except Exception as e:
+            logger.warning(f"Error tracker: Redis unavailable: {e}")
+            return None
+
+    def take_digest(self) -> list[ErrorStat]:
+        """Отпечатки с ошибками с прошлого дайджеста (по убыванию), счётчики обнуляются."""
+        due = sorted((s for s in self._stats.values() if s.pending), key=lambda s: -s.pending)
+        digest = [replace(s) for s in due]
+        for s in due:
+            s.pending = 0
+        return digest
+
+    async def top(self, limit: int) -> list[ErrorStat]:
+        """Топ отпечатков по всем репликам (Redis), без Redis — по памяти."""
+        try:
+            redis = await get_redis()
+            ranked = await redis.zrevrange(_TOP_KEY, 0, limit - 1, withscores=True)
+            stats = []
+            for fp, score in ranked:
+                h = await redis.hgetall(f"errors:{fp}")
+                stats.append(ErrorStat(
+                    fingerprint=fp,
+                    type=h.get("type", "?"),
+                    message=h.get("message", ""),
+                    sample=h.get("sample", ""),
+                    count=int(score),
+                    last_seen=float(h.get("last_seen", 0)),
+                ))
+            return stats
+        except Exception as e:
+            logger.warning(f"Error tracker: Redis unavailable: {e}")
+            return sorted(self._stats.values(), key=lambda s: -s.count)[:limit]
+
+    async def get(self, fp: str) -> ErrorStat | None:
+        try:
+            redis = await get_redis()
+            h = await redis.hgetall(f"errors:{fp}")
+            if not h:
+                return None
+            return ErrorStat(
+                fingerprint=fp,
+                type=h.get("type", "?"),
+                message=h.get("message", ""),
+                sample=h.get("sample", ""),
+                count=int(await redis.zscore(_TOP_KEY, fp) or 0),
+                last_seen=float(h.get("last_seen", 0)),
+            )
+        except Exception as e:
+            logger.warning(f"Error tracker: Redis unavailable: {e}")
+            return self._stats.get(fp)
+
+    async def reset(self) -> None:
+        self._stats.clear()
+        redis = await get_redis()
+        fps = await redis.zrange(_TOP_KEY, 0, -1)
+        await redis.delete(_TOP_KEY, *(f"errors:{fp}" for fp in fps))
+
+
+error_tracker = ErrorTracker(
+    alert_window=settings.ERROR_ALERT_WINDOW,
+    max_tracked=settings.ERROR_TRACK_MAX,
+)
+
+
+# ── Оповещения админам ────────────────────────────────────────
+
+def format_alert(stat: ErrorStat, user_id: int | None) -> str:
+    window = settings.ERROR_ALERT_WINDOW // 60
+    return (
+        f"🚨 <b>Unhandled Error</b> <code>{stat.fingerprint}</code>\n\n"
+        f"<b>Type:</b> {stat.type}\n"
+        f"<b>User:</b> {user_id}\n"
+        f"<b>Error:</b> {escape(stat.message)}\n\n"
+        f"<pre>{escape(stat.sample)[-1500:]}</pre>\n\n"
+        f"<i>Повторы за {window} мин — в дайджесте, подробнее: /errors {stat.fingerprint}</i>"
+    )
+
+
+def format_digest(stats: list[ErrorStat]) -> str:
+    lines = [f"📊 <b>Ошибки за {settings.ERROR_DIGEST_MINUTES} мин</b>\n"]
+    for s in stats[:settings.ERROR_TOP]:
+        lines.append(f"<code>{s.fingerprint}</code> ×{s.pending} — {s.type}: {escape(s.message[:80])}")
+    if len(stats) > settings.ERROR_TOP:
+        lines.append(f"… и ещё {len(stats) - settings.ERROR_TOP}")
+    return "\n".join(lines)
+
+
+async def send_digest(bot) -> None:
+    """Периодический дайджест (core/scheduler.py)."""
+    from app.services.delivery import delivery
+
+    stats = error_tracker.take_digest()
+    if not stats:
+        return
+    text = format_digest(stats)
+    for admin_id in settings.ADMIN_IDS:
+        delivery.send_message(bot, admin_id, text, wait=False)
+
+
+def escape(text: str) -> str:
+    """Текст для parse_mode=HTML (кавычки Telegram экранировать не требует)."""
+    return html.escape(text, quote=False)
@@ -2,12 +2,23 @@
 Уведомления администраторам о важных событиях.
 
 При каждой покупке/ошибке отправляем в NOTIFY_CHANNEL_ID (и топик если задан).
+
+Всплески (массовое удаление истёкших VPS, волна покупок) не превращаются
+в сотню постов: если за NOTIFY_BURST_WINDOW секунд событий больше
+NOTIFY_BURST_THRESHOLD, новые события копятся NOTIFY_DIGEST_DELAY секунд
+и уходят одним дайджестом на тип — количество, выручка, список IP.
+Когда поток стихает, снова идут обычные посты.
 """
 from __future__ import annotations
+import asyncio
 import logging
+import time
+from collections import defaultdict, deque
+from dataclasses import dataclass
 from datetime import datetime
 from aiogram import Bot
 from app.core.config import settings, TARIFFS
+from app.services.delivery import delivery, Priority
 
 logger = logging.getLogger(__name__)
 
@@ -33,7 +44,7 @@ async def notify_new_vps(
         f"💰 Оплачено: <b>{amount} {currency}</b>\n"
         f"🕐 Время: {datetime.utcnow().strftime('%d.%m.%Y %H:%M')} UTC"
     )
-    await _send(bot, text)
+    channel_digest.push(bot, _Event(NEW_VPS, text, ip, amount, currency))
 
 
 async def notify_vps_expired(
@@ -52,7 +63,7 @@ async def notify_vps_expired(
         f"📦 Тариф: {t.get('name', tariff_id)}\n"
         f"🌐 IP: <code>{ip}</code>"
     )
-    await _send(bot, text)
+    channel_digest.push(bot, _Event(EXPIRED, text, ip))
 
 
 async def notify_error(bot: Bot, description: str, detail: str = "") -> None:
@@ -64,17 +75,103 @@ async def notify_error(bot: Bot, description: str, detail: str = "") -> None:
         f"{description}\n"
         f"<pre>{detail[:500]}</pre>" if detail else f"🚨 <b>Ошибка</b>\n\n{description}"
     )
-    await _send(bot, text)
-
-
-async def _send(bot: Bot, text: str) -> None:
-    try:
-        kwargs: dict = {
-            "chat_id": settings.NOTIFY_CHANNEL_ID,
-            "text": text,
-        }
-        if settings.NOTIFY_TOPIC_ID:
-            kwargs["message_thread_id"] = settings.NOTIFY_TOPIC_ID
-        await bot.send_message(**kwargs)
-    except Exception as e:
-        logger.warning(f"Channel notification failed: {e}")
+    _send(bot, text)
+
+
+def _send(bot: Bot, text: str) -> None:
+    # Fire-and-forget: ошибки доставки логирует сама очередь
+    kwargs: dict = {}
+    if settings.NOTIFY_TOPIC_ID:
+        kwargs["message_thread_id"] = settings.NOTIFY_TOPIC_ID
+    delivery.send_message(
+        bot, settings.NOTIFY_CHANNEL_ID, text,
+        priority=Priority.REMINDER, wait=False, **kwargs,
+    )
+
+
+# ── Дайджест при всплесках ────────────────────────────────────
+
+NEW_VPS = "new_vps"
+EXPIRED = "expired"
+
+_DIGEST_IPS = 30  # IP в одном дайджесте, остальные — «и ещё N»
+
+
+@dataclass
+class _Event:
+    kind: str
+    text: str            # одиночный пост, если всплеска нет
+    ip: str
+    amount: float = 0.0
+    currency: str = ""
+
+
+class ChannelDigest:
+    """Переключает канал в режим дайджеста, пока поток событий выше порога."""
+
+    def __init__(self, threshold: int, window: float, delay: float) -> None:
+        self.threshold = threshold
+        self.window = window
+        self.delay = delay
+        self._recent: deque[float] = deque()
+        self._pending: list[_Event] = []
+        self._bot: Bot | None = None
+        self._task: asyncio.Task | None = None
+
+    def push(self, bot: Bot, event: _Event) -> None:
+        now = time.monotonic()
+        self._recent.append(now)
+        while self._recent and self._recent[0] <= now - self.window:
+            self._recent.popleft()
+
+        if not self._pending and len(self._recent) <= self.threshold:
+            _send(bot, event.text)
+            return
+
+        self._bot = bot
+        self._pending.append(event)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._flush_later(), name="notify_digest")
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(self.delay)
+        self.flush()
+
+    def flush(self) -> None:
+        events, self._pending = self._pending, []
+        if not events or self._bot is None:
+            return
+        by_kind: dict[str, list[_Event]] = defaultdict(list)
+        for event in events:
+            by_kind[event.kind].append(event)
+        for kind, group in by_kind.items():
+            _send(self._bot, group[0].text if len(group) == 1 else format_digest(kind, group))
+        logger.info(f"📰 Channel digest: {len(events)} events")
+
+
+def format_digest(kind: str, events: list[_Event]) -> str:
+    ips = ", ".join(f"<code>{e.ip}</code>" for e in events[:_DIGEST_IPS])
+    if len(events) > _DIGEST_IPS:
+        ips += f" … и ещё {len(events) - _DIGEST_IPS}"
+
+    if kind == NEW_VPS:
+        revenue: dict[str, float] = defaultdict(float)
+        for e in events:
+            revenue[e.currency] += e.amount
+        total = " + ".join(f"{amount:g} {currency}" for currency, amount in revenue.items())
+        return (
+            f"🎉 <b>Новых VPS: {len(events)}</b>\n\n"
+            f"💰 Выручка: <b>{total}</b>\n"
+            f"🌐 IP: {ips}"
+        )
+    return (
+        f"⏰ <b>Истекло и удалено VPS: {len(events)}</b>\n\n"
+        f"🌐 IP: {ips}"
+    )
+
+
+channel_digest = ChannelDigest(
+    threshold=settings.NOTIFY_BURST_THRESHOLD,
+    window=settings.NOTIFY_BURST_WINDOW,
+    delay=settings.NOTIFY_DIGEST_DELAY,
+)
@@ -0,0 +1,92 @@
+"""
+Выбор ноды Proxmox для нового VPS.
+
+Кандидаты — online-ноды кластера (/cluster/resources), если задан
+PROXMOX_NODES — только из этого списка. Нода подходит, если на ней
+хватает RAM (тариф + PROXMOX_MEM_RESERVE_MB), места в PROXMOX_STORAGE
+и загрузка CPU не выше PROXMOX_MAX_CPU_LOAD.
+
+Политики (PROXMOX_PLACEMENT):
+  spread  — самая свободная нода (доля свободной RAM минус загрузка CPU):
+            нагрузка размазывается, падение ноды задевает меньше клиентов;
+  binpack — самая заполненная из подходящих (меньше всего свободной RAM):
+            ноды заполняются по очереди, пустые можно выключить.
+"""
+from __future__ import annotations
+from dataclasses import dataclass
+
+SPREAD = "spread"
+BINPACK = "binpack"
+
+_MB = 1024 ** 2
+_GB = 1024 ** 3
+
+
+@dataclass(frozen=True)
+class NodeInfo:
+    name: str
+    online: bool
+    cpu_load: float        # 0..1
+    mem_total: int         # байт
+    mem_used: int
+    disk_total: int        # байт в PROXMOX_STORAGE (0 — хранилище не найдено)
+    disk_used: int
+
+    @property
+    def mem_free(self) -> int:
+        return self.mem_total - self.mem_used
+
+    @property
+    def disk_free(self) -> int:
+        return self.disk_total - self.disk_used
+
+
+def parse_cluster_resources(resources: list[dict], storage: str) -> list[NodeInfo]:
+    """Ноды и их хранилище storage из ответа /cluster/resources."""
+    disks = {
+        r["node"]: (int(r.get("maxdisk", 0)), int(r.get("disk", 0)))
+        for r in resources
+        if r.get("type") == "storage" and r.get("storage") == storage
+    }
+    return [
+        NodeInfo(
+            name=r["node"],
+            online=r.get("status") == "online",
+            cpu_load=float(r.get("cpu", 0)),
+            mem_total=int(r.get("maxmem", 0)),
+            mem_used=int(r.get("mem", 0)),
+            disk_total=disks.get(r["node"], (0, 0))[0],
+            disk_used=disks.get(r["node"], (0, 0))[1],
+        )
+        for r in resources
+        if r.get("type") == "node"
+    ]
+
+
+def fits(node: NodeInfo, tariff: dict, max_cpu_load: float, mem_reserve_mb: int) -> bool:
+    return (
+        node.online
+        and node.cpu_load <= max_cpu_load
+        and node.mem_free >= (tariff["ram"] + mem_reserve_mb) * _MB
+        and node.disk_free >= tariff["disk"] * _GB
+    )
+
+
+def choose_node(
+    nodes: list[NodeInfo],
+    tariff: dict,
+    policy: str = SPREAD,
+    allowed: list[str] | None = None,
+    max_cpu_load: float = 1.0,
+    mem_reserve_mb: int = 0,
+) -> NodeInfo | None:
+    """Нода для тарифа по политике или None, если места нет нигде."""
+    candidates = [
+        n for n in nodes
+        if (not allowed or n.name in allowed) and fits(n, tariff, max_cpu_load, mem_reserve_mb)
+    ]
+    if not candidates:
+        return None
+    if policy == BINPACK:
+        return min(candidates, key=lambda n: (n.mem_free, n.name))
+    return max(candidates, key=lambda n: (n.mem_free / n.mem_total - n.cpu_load, n.name))
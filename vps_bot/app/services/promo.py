@@ -28,7 +28,7 @@ from sqlalchemy import (
 )
 from sqlalchemy.orm import Mapped, mapped_column
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.core.database import Base
+from app.core.database import Base, commit_or_flush
 
 logger = logging.getLogger(__name__)
 
@@ -100,7 +100,7 @@ class PromoRepository:
             one_per_user=one_per_user,
         )
         self.session.add(promo)
-        await self.session.commit()
+        await commit_or_flush(self.session)
         await self.session.refresh(promo)
         return promo
 
@@ -173,14 +173,14 @@ class PromoRepository:
             .where(PromoCode.id == promo.id)
             .values(uses_count=PromoCode.uses_count + 1)
         )
-        await self.session.commit()
+        await commit_or_flush(self.session)
 
     async def deactivate(self, code: str) -> bool:
         promo = await self.get_by_code(code)
         if not promo:
             return False
         promo.is_active = False
-        await self.session.commit()
+        await commit_or_flush(self.session)
         return True
 
     async def list_all(self) -> list[PromoCode]:
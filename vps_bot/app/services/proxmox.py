@@ -1,10 +1,46 @@
+"""
+Клиент Proxmox VE API.
+
+Одна долгоживущая aiohttp-сессия на эндпоинт: пул соединений
+PROXMOX_POOL_SIZE с keep-alive (без TCP/TLS-рукопожатия на каждый вызов),
+кеш DNS, таймауты на операцию — короткий на чтение, длинный на запись.
+
+Circuit breaker: после PROXMOX_BREAKER_FAILURES сетевых ошибок / 5xx подряд
+вызовы сразу падают с ProxmoxUnavailable (карточка VPS и /status не висят
+на мёртвой ноде); через PROXMOX_BREAKER_RESET секунд пропускается один
+пробный запрос — успех закрывает breaker.
+
+Метрики: io.proxmox.<эндпоинт> — латентность (шаблон пути, vmid → {id}),
+счётчики proxmox.error.<эндпоинт> и proxmox.breaker_open.
+
+Создание и удаление контейнера — асинхронные задачи PVE: POST возвращает
+UPID, а wait_task() опрашивает /nodes/{node}/tasks/{upid}/status с
+растущим интервалом, пока задача не завершится. Новый VPS считается
+готовым, когда задача закончилась и на IP открылся 22 порт (wait_port).
+
+Чтения (GET) идут через _get: одинаковые одновременные запросы (тот же
+путь) склеиваются в один — остальные ждут его результат (single-flight),
+результат живёт PROXMOX_READ_CACHE_TTL секунд (статус ноды —
+PROXMOX_NODE_STATUS_TTL: его читают /status, старт, админка). Любая запись
+(POST / DELETE) сбрасывает кеш. /cluster/nextid не кешируется никогда.
+
+Кластер: ноды и их ресурсы берутся из /cluster/resources, новый VPS
+ставится на ноду по политике services/placement.py (spread / binpack).
+Нода хранится в vps.node и передаётся в вызовы контейнера (node=...);
+None — PROXMOX_NODE (VPS, созданные до мультинодовости).
+"""
 from __future__ import annotations
 import logging
+import re
 import secrets
 import string
 import asyncio
+import time
+from urllib.parse import quote
 import aiohttp
 from app.core.config import settings
+from app.core.metrics import metrics
+from app.services.placement import NodeInfo, choose_node, parse_cluster_resources
 
 logger = logging.getLogger(__name__)
 
@@ -14,6 +50,79 @@ def generate_password(length: int = 18) -> str:
     return "".join(secrets.choice(chars) for _ in range(length))
 
 
+class ProxmoxUnavailable(RuntimeError):
+    """Proxmox недоступен: breaker открыт, таймаут или ошибка сети."""
+
+
+class CircuitBreaker:
+    """closed → (N ошибок подряд) → open → (reset_after) → half-open → closed / open."""
+
+    def __init__(self, failures: int, reset_after: float) -> None:
+        self.failures = failures
+        self.reset_after = reset_after
+        self._errors = 0
+        self._opened_at: float | None = None
+        self._probing = False
+
+    @property
+    def is_open(self) -> bool:
+        return self._opened_at is not None
+
+    def allow(self) -> bool:
+        if self._opened_at is None:
+            return True
+        if self._probing or time.monotonic() - self._opened_at < self.reset_after:
+            return False
+        self._probing = True  # half-open: один пробный запрос
+        return True
+
+    def success(self) -> None:
+        if self._opened_at is not None:
+            logger.info("✅ Proxmox circuit breaker closed")
+        self._errors = 0
+        self._opened_at = None
+        self._probing = False
+
+    def release(self) -> None:
+        """Проба не дала ни успеха, ни ошибки (отмена и т.п.) — следующий запрос пробует снова."""
+        self._probing = False
+
+    def failure(self) -> None:
+        self._errors += 1
+        if self._probing or self._errors >= self.failures:
+            if self._opened_at is None:
+                logger.warning(f"⛔ Proxmox circuit breaker open after {self._errors} errors")
+            self._opened_at = time.monotonic()
+            self._probing = False
+
+
+_ID_RE = re.compile(r"/\d+(?=/|$)")
+_UPID_RE = re.compile(r"/tasks/[^/]+")
+_NODE_RE = re.compile(r"/nodes/[^/]+")
+
+_POLL_FIRST = 0.25    # секунд: первый опрос задачи / порта
+_POLL_MAX = 2.0       # секунд: потолок интервала
+
+
+async def wait_port(host: str, port: int = 22, timeout: float | None = None) -> bool:
+    """Ждать, пока host:port принимает TCP-соединения. False — не дождались."""
+    timeout = settings.PROXMOX_SSH_TIMEOUT if timeout is None else timeout
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    delay = _POLL_FIRST
+    while True:
+        try:
+            _, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout=2)
+            writer.close()
+            return True
+        except (OSError, asyncio.TimeoutError):
+            pass
+        if loop.time() + delay > deadline:
+            return False
+        await asyncio.sleep(delay)
+        delay = min(delay * 1.5, _POLL_MAX)
+
+
 class ProxmoxService:
     def __init__(self) -> None:
         self._base = settings.PROXMOX_HOST.rstrip("/")
@@ -24,21 +133,176 @@ class ProxmoxService:
                 f"!{settings.PROXMOX_TOKEN_NAME}={settings.PROXMOX_TOKEN_VALUE}"
             )
         }
+        self._session: aiohttp.ClientSession | None = None
+        self._inflight: dict[str, asyncio.Task] = {}
+        self._cache: dict[str, tuple[float, object]] = {}   # path → (истекает, data)
+        self.breaker = CircuitBreaker(settings.PROXMOX_BREAKER_FAILURES, settings.PROXMOX_BREAKER_RESET)
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=settings.PROXMOX_POOL_SIZE,
+                    ttl_dns_cache=300,
+                    keepalive_timeout=60,
+                    ssl=False,
+                ),
+                headers=self._headers,
+            )
+        return self._session
+
+    async def close(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    def _endpoint(self, method: str, path: str) -> str:
+        path = _UPID_RE.sub("/tasks/{upid}", _NODE_RE.sub("/nodes/{node}", path))
+        return f"{method} " + _ID_RE.sub("/{id}", path)
 
     async def _req(self, method: str, path: str, json: dict | None = None) -> dict:
+        endpoint = self._endpoint(method, path)
+        if not self.breaker.allow():
+            metrics.inc("proxmox.breaker_open")
+            raise ProxmoxUnavailable(f"Proxmox unavailable (circuit open): {method} {path}")
+
+        # Пробный запрос half-open: если он не дойдёт до success/failure
+        # (CancelledError, неожиданное исключение), снимаем флаг в finally —
+        # иначе breaker остался бы закрытым для Proxmox до рестарта
+        probe = self.breaker.is_open
+        try:
+            return await self._send(method, path, json, endpoint)
+        finally:
+            if probe:
+                self.breaker.release()
+
+    async def _send(self, method: str, path: str, json: dict | None, endpoint: str) -> dict:
         url = f"{self._base}/api2/json{path}"
-        async with aiohttp.ClientSession() as s:
-            async with s.request(method, url, headers=self._headers, json=json, ssl=False) as resp:
-                data = await resp.json()
-                if resp.status not in (200, 201):
-                    raise RuntimeError(f"Proxmox {method} {path} → {resp.status}: {data}")
-                return data.get("data", {})
+        timeout = aiohttp.ClientTimeout(
+            total=settings.PROXMOX_READ_TIMEOUT if method == "GET" else settings.PROXMOX_WRITE_TIMEOUT,
+            connect=settings.PROXMOX_CONNECT_TIMEOUT,
+        )
+        try:
+            with metrics.timed("proxmox", endpoint):
+                async with self._get_session().request(method, url, json=json, timeout=timeout) as resp:
+                    data = await resp.json(content_type=None)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            metrics.inc(f"proxmox.error.{endpoint}")
+            self.breaker.failure()
+            raise ProxmoxUnavailable(f"Proxmox {method} {path}: {type(e).__name__} {e}") from e
+        except ValueError as e:
+            # Не JSON (HTML-страница прокси / обрезанный ответ) — такой же сбой Proxmox
+            metrics.inc(f"proxmox.error.{endpoint}")
+            self.breaker.failure()
+            raise ProxmoxUnavailable(
+                f"Proxmox {method} {path} → {resp.status}: invalid JSON ({resp.content_type})"
+            ) from e
+
+        if resp.status >= 500:
+            metrics.inc(f"proxmox.error.{endpoint}")
+            self.breaker.failure()
+        else:
+            self.breaker.success()
+        if method != "GET":
+            self._cache.clear()
+        if resp.status not in (200, 201):
+            raise RuntimeError(f"Proxmox {method} {path} → {resp.status}: {data}")
+        return (data or {}).get("data", {})
+
+    async def _get(self, path: str, ttl: float | None = None, fresh: bool = False):
+        """
+        GET с single-flight и коротким кешем; ttl=0 — только single-flight.
+        fresh=True — мимо кеша (результат в кеш всё равно попадёт).
+        """
+        ttl = settings.PROXMOX_READ_CACHE_TTL if ttl is None else ttl
+        cached = None if fresh or ttl <= 0 else self._cache.get(path)
+        if cached is not None and cached[0] > time.monotonic():
+            metrics.inc("proxmox.cache_hit")
+            return cached[1]
+
+        task = self._inflight.get(path)
+        if task is None:
+            task = asyncio.ensure_future(self._req("GET", path))
+            self._inflight[path] = task
+            task.add_done_callback(lambda t: self._landed(path, t, ttl))
+        else:
+            metrics.inc("proxmox.coalesced")
+        # shield: отмена одного ожидающего не отменяет запрос для остальных
+        return await asyncio.shield(task)
+
+    def _landed(self, path: str, task: asyncio.Task, ttl: float) -> None:
+        self._inflight.pop(path, None)
+        if ttl <= 0 or task.cancelled() or task.exception() is not None:
+            return
+        now = time.monotonic()
+        if len(self._cache) > 1000:
+            self._cache = {p: v for p, v in self._cache.items() if v[0] > now}
+        self._cache[path] = (now + ttl, task.result())
+
+    async def wait_task(self, upid: str, timeout: float | None = None) -> None:
+        """Дождаться завершения задачи PVE; ошибка задачи → RuntimeError."""
+        timeout = settings.PROXMOX_TASK_TIMEOUT if timeout is None else timeout
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        delay = _POLL_FIRST
+        node = upid.split(":")[1] if upid.count(":") > 1 else self._node  # UPID:<node>:...
+        path = f"/nodes/{node}/tasks/{quote(upid, safe='')}/status"
+        while True:
+            data = await self._get(path, ttl=0)
+            if data.get("status") == "stopped":
+                if data.get("exitstatus") != "OK":
+                    raise RuntimeError(f"Proxmox task {upid} failed: {data.get('exitstatus')}")
+                logger.debug(f"Proxmox task {upid} done in {loop.time() - started:.1f}s")
+                return
+            if loop.time() - started + delay > timeout:
+                raise TimeoutError(f"Proxmox task {upid} still running after {timeout:.0f}s")
+            await asyncio.sleep(delay)
+            delay = min(delay * 1.5, _POLL_MAX)
+
+    # ── Кластер ───────────────────────────────────────────
+
+    async def cluster_nodes(self) -> list[NodeInfo]:
+        resources = await self._get("/cluster/resources")
+        return parse_cluster_resources(resources or [], settings.PROXMOX_STORAGE)
+
+    async def cluster_vms(self) -> list[dict]:
+        """Все контейнеры / ВМ кластера одним запросом (services/vm_status.py)."""
+        return await self._get("/cluster/resources?type=vm", ttl=0) or []
+
+    async def place(self, tariff: dict) -> str:
+        """Нода для нового VPS. Кластер не ответил — PROXMOX_NODE."""
+        try:
+            nodes = await self.cluster_nodes()
+        except Exception as e:
+            logger.warning(f"Proxmox node discovery failed, using {self._node}: {e}")
+            return self._node
+        node = choose_node(
+            nodes, tariff,
+            policy=settings.PROXMOX_PLACEMENT,
+            allowed=settings.PROXMOX_NODES,
+            max_cpu_load=settings.PROXMOX_MAX_CPU_LOAD,
+            mem_reserve_mb=settings.PROXMOX_MEM_RESERVE_MB,
+        )
+        if node is None:
+            raise RuntimeError("Нет свободных ресурсов ни на одной ноде Proxmox")
+        logger.info(
+            f"📍 Placement ({settings.PROXMOX_PLACEMENT}): {node.name} "
+            f"(free RAM {node.mem_free // 1024 ** 3} GB, CPU {node.cpu_load:.0%})"
+        )
+        return node.name
+
+    # ── Контейнеры ────────────────────────────────────────
 
     async def next_vmid(self) -> int:
+        # Мимо _get: два одновременных создания не должны получить один vmid
         data = await self._req("GET", "/cluster/nextid")
         return int(data)
 
-    async def create_lxc(self, vmid: int, hostname: str, ip: str, password: str, tariff: dict) -> None:
+    async def create_lxc(
+        self, vmid: int, hostname: str, ip: str, password: str, tariff: dict, node: str | None = None,
+    ) -> bool:
+        """Создать и запустить контейнер. True — SSH уже отвечает."""
+        node = node or self._node
         payload = {
             "vmid": vmid,
             "hostname": hostname,
@@ -53,30 +317,53 @@ class ProxmoxService:
             "features": "nesting=1",
             "nameserver": "8.8.8.8 1.1.1.1",
         }
-        await self._req("POST", f"/nodes/{self._node}/lxc", payload)
-        await asyncio.sleep(5)  # ждём пока контейнер поднимется
-        logger.info(f"✅ LXC {vmid} ({hostname} / {ip}) created")
+        t0 = time.monotonic()
+        upid = await self._req("POST", f"/nodes/{node}/lxc", payload)
+        await self.wait_task(upid)
+        ready = await wait_port(ip, 22)
+        if ready:
+            logger.info(
+                f"✅ LXC {vmid} ({hostname} / {ip}) created on {node}, SSH up in {time.monotonic() - t0:.1f}s"
+            )
+        else:
+            logger.warning(f"LXC {vmid} ({hostname} / {ip}) created, but SSH is not up yet")
+        return ready
 
-    async def delete_lxc(self, vmid: int) -> None:
+    async def delete_lxc(self, vmid: int, node: str | None = None) -> None:
+        node = node or self._node
         try:
-            await self._req("POST", f"/nodes/{self._node}/lxc/{vmid}/status/stop")
-            await asyncio.sleep(3)
+            upid = await self._req("POST", f"/nodes/{node}/lxc/{vmid}/status/stop")
+            await self.wait_task(upid)
         except Exception:
-            pass
-        await self._req("DELETE", f"/nodes/{self._node}/lxc/{vmid}")
+            pass  # уже остановлен
+        upid = await self._req("DELETE", f"/nodes/{node}/lxc/{vmid}")
+        await self.wait_task(upid)
         logger.info(f"🗑️ LXC {vmid} deleted")
 
-    async def reboot_lxc(self, vmid: int) -> None:
-        await self._req("POST", f"/nodes/{self._node}/lxc/{vmid}/status/reboot")
+    async def lxc_hostname(self, vmid: int, node: str | None = None) -> str | None:
+        """hostname контейнера из его конфига; None — такого vmid на ноде нет."""
+        try:
+            data = await self._get(f"/nodes/{node or self._node}/lxc/{vmid}/config", ttl=0)
+        except ProxmoxUnavailable:
+            raise
+        except RuntimeError as e:
+            if "does not exist" in str(e):
+                return None
+            raise
+        return (data or {}).get("hostname")
+
+    async def reboot_lxc(self, vmid: int, node: str | None = None) -> None:
+        await self._req("POST", f"/nodes/{node or self._node}/lxc/{vmid}/status/reboot")
 
-    async def start_lxc(self, vmid: int) -> None:
-        await self._req("POST", f"/nodes/{self._node}/lxc/{vmid}/status/start")
+    async def start_lxc(self, vmid: int, node: str | None = None) -> None:
+        await self._req("POST", f"/nodes/{node or self._node}/lxc/{vmid}/status/start")
 
-    async def stop_lxc(self, vmid: int) -> None:
-        await self._req("POST", f"/nodes/{self._node}/lxc/{vmid}/status/stop")
+    async def stop_lxc(self, vmid: int, node: str | None = None) -> None:
+        await self._req("POST", f"/nodes/{node or self._node}/lxc/{vmid}/status/stop")
 
-    async def status_lxc(self, vmid: int) -> dict:
-        data = await self._req("GET", f"/nodes/{self._node}/lxc/{vmid}/status/current")
+    async def status_lxc(self, vmid: int, node: str | None = None, fresh: bool = False) -> dict:
+        """fresh=True — мимо кеша чтений (кнопка «Обновить», проверка после reboot)."""
+        data = await self._get(f"/nodes/{node or self._node}/lxc/{vmid}/status/current", fresh=fresh)
         return {
             "running": data.get("status") == "running",
             "status": data.get("status", "unknown"),
@@ -86,8 +373,8 @@ class ProxmoxService:
             "uptime_sec": data.get("uptime", 0),
         }
 
-    async def node_status(self) -> dict:
-        data = await self._req("GET", f"/nodes/{self._node}/status")
+    async def node_status(self, node: str | None = None) -> dict:
+        data = await self._get(f"/nodes/{node or self._node}/status", ttl=settings.PROXMOX_NODE_STATUS_TTL)
         return {
             "cpu_pct": round(data.get("cpu", 0) * 100, 1),
             "mem_used_gb": data.get("memory", {}).get("used", 0) // 1024 ** 3,
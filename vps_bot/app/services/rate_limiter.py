@@ -0,0 +1,283 @@
+"""
+Атомарный rate limiter на Redis (GCRA в Lua-скрипте).
+
+Один вызов EVALSHA на проверку: скрипт сам читает время Redis,
+решает allow/deny, обновляет ключ и ставит TTL — ключ без TTL
+(как было с INCR + отдельный EXPIRE) больше невозможен.
+
+Бакеты именованные и настраиваются в .env:
+  messages   — RATE_LIMIT_MESSAGES   сообщений за RATE_LIMIT_WINDOW
+  callbacks  — RATE_LIMIT_CALLBACKS  нажатий кнопок
+  payments   — RATE_LIMIT_PAYMENTS   созданий счёта
+  pings      — RATE_LIMIT_PINGS      запусков ping
+
+Перед Redis стоит локальный token bucket (LocalLimiter) с теми же
+параметрами: явный флуд отсекается в памяти процесса без сетевого
+запроса. Если Redis недоступен — работаем только на локальном лимите
+(degraded mode), бот продолжает отвечать — FSM при этом тоже уходит
+в память (app.core.fsm.FallbackStorage), иначе апдейт упал бы раньше.
+
+Использование:
+    rl = await rate_limiter.hit("payments", telegram_id)
+    if not rl.allowed:
+        ...  # rl.retry_after — секунд до следующей попытки
+"""
+from __future__ import annotations
+import logging
+import math
+import time
+from typing import NamedTuple
+from redis.exceptions import ConnectionError as RedisConnectionError, NoScriptError, RedisError
+from app.core.config import settings
+from app.core.redis import get_redis
+
+logger = logging.getLogger(__name__)
+
+# GCRA: TAT (theoretical arrival time) в мс хранится в ключе.
+# ARGV[1] — интервал эмиссии (window / limit), мс
+# ARGV[2] — окно (допустимый burst = limit запросов), мс
+# Возвращает {allowed, retry_after_ms}
+GCRA_LUA = """
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) * 1000 + math.floor(tonumber(now_parts[2]) / 1000)
+local emission = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+
+local tat = tonumber(redis.call('GET', KEYS[1]))
+if not tat or tat < now then
+  tat = now
+end
+
+local new_tat = tat + emission
+local allow_at = new_tat - window
+if allow_at > now then
+  return {0, allow_at - now}
+end
+
+redis.call('SET', KEYS[1], new_tat, 'PX', new_tat - now)
+return {1, 0}
+"""
+
+
+class Bucket(NamedTuple):
+    limit: int      # запросов
+    window: float   # за сколько секунд
+
+
+class RateLimitResult(NamedTuple):
+    allowed: bool
+    retry_after: float  # секунд, 0 если allowed
+
+
+ALLOWED = RateLimitResult(True, 0.0)
+
+
+def _buckets() -> dict[str, Bucket]:
+    window = settings.RATE_LIMIT_WINDOW
+    return {
+        "messages": Bucket(settings.RATE_LIMIT_MESSAGES, window),
+        "callbacks": Bucket(settings.RATE_LIMIT_CALLBACKS, window),
+        "payments": Bucket(settings.RATE_LIMIT_PAYMENTS, window),
+        "pings": Bucket(settings.RATE_LIMIT_PINGS, window),
+    }
+
+
+# ── Локальный pre-filter ─────────────────────────────────
+
+class _TokenBucket:
+    __slots__ = ("tokens", "updated")
+
+    def __init__(self, tokens: float, updated: float) -> None:
+        self.tokens = tokens
+        self.updated = updated
+
+
+class LocalLimiter:
+    """
+    Token bucket в памяти процесса, по словарю на бакет: user_id → (tokens, updated).
+    Ёмкость = limit, пополнение limit/window токенов в секунду.
+
+    Память ограничена: раз в sweep_interval удаляются полностью пополненные
+    (простаивающие) записи, при переполнении вытесняются самые старые.
+    """
+
+    def __init__(
+        self,
+        buckets: dict[str, Bucket],
+        maxsize: int,
+        sweep_interval: float = 60.0,
+    ) -> None:
+        self._buckets = buckets
+        self._maxsize = maxsize
+        self._sweep_interval = sweep_interval
+        self._data: dict[str, dict[int | str, _TokenBucket]] = {name: {} for name in buckets}
+        self._next_sweep = time.monotonic() + sweep_interval
+
+    def __len__(self) -> int:
+        return sum(len(d) for d in self._data.values())
+
+    def hit(self, bucket: str, key: int | str) -> RateLimitResult:
+        now = time.monotonic()
+        if now >= self._next_sweep:
+            self.sweep(now)
+
+        b = self._buckets[bucket]
+        rate = b.limit / b.window
+        entries = self._data[bucket]
+        entry = entries.get(key)
+        if entry is None:
+            if len(entries) >= self._maxsize:
+                self.sweep(now)
+                while len(entries) >= self._maxsize:
+                    del entries[next(iter(entries))]
+            entry = entries[key] = _TokenBucket(float(b.limit), now)
+        else:
+            entry.tokens = min(b.limit, entry.tokens + (now - entry.updated) * rate)
+            entry.updated = now
+
+        if entry.tokens < 1.0:
+            return RateLimitResult(False, float(math.ceil((1.0 - entry.tokens) / rate)))
+        entry.tokens -= 1.0
+        return ALLOWED
+
+    def sweep(self, now: float | None = None) -> int:
+        """Удалить записи, которые успели пополниться до полной ёмкости."""
+        now = time.monotonic() if now is None else now
+        removed = 0
+        for name, entries in self._data.items():
+            b = self._buckets[name]
+            rate = b.limit / b.window
+            idle = [
+                key for key, e in entries.items()
+                if e.tokens + (now - e.updated) * rate >= b.limit
+            ]
+            for key in idle:
+                del entries[key]
+            removed += len(idle)
+        self._next_sweep = now + self._sweep_interval
+        return removed
+
+
+# ── Redis GCRA ───────────────────────────────────────────
+
+class RateLimiter:
+    def __init__(self, buckets: dict[str, Bucket], local_size: int = 100_000) -> None:
+        self._buckets = buckets
+        self._sha: str | None = None
+        self.local = LocalLimiter(buckets, maxsize=local_size)
+        self.degraded = False
+
+    def _args(self, bucket: str, key: int | str) -> tuple[str, int, int]:
+        b = self._buckets[bucket]
+        window_ms = int(b.window * 1000)
+        emission_ms = max(1, window_ms // max(1, b.limit))
+        return f"rl:{bucket}:{key}", emission_ms, window_ms
+
+    @staticmethod
+    def parse(reply: list) -> RateLimitResult:
+        allowed, retry_ms = int(reply[0]), int(reply[1])
+        if allowed:
+            return ALLOWED
+        return RateLimitResult(False, float(math.ceil(retry_ms / 1000)))
+
+    async def load(self) -> str:
+        """Загрузить скрипт в Redis (SCRIPT LOAD) и запомнить SHA."""
+        redis = await get_redis()
+        self._sha = await redis.script_load(GCRA_LUA)
+        return self._sha
+
+    async def hit(self, bucket: str, key: int | str) -> RateLimitResult:
+        """
+        Засчитать запрос. Сначала локальный bucket (без I/O), затем
+        один round trip к Redis (EVALSHA). Без Redis — только локальный лимит.
+        """
+        local = self.local.hit(bucket, key)
+        if not local.allowed:
+            return local
+
+        try:
+            reply = await self._evalsha(bucket, key)
+        except (RedisError, OSError) as e:
+            self._set_degraded(e)
+            return local
+
+        self._set_degraded(None)
+        return self.parse(reply)
+
+    async def hit_and_fetch(
+        self,
+        bucket: str | None,
+        key: int | str,
+        *fetch_keys: str,
+    ) -> tuple[RateLimitResult, list[str | None]]:
+        """
+        Проверка лимита + GET произвольных ключей одним pipeline (один round trip).
+        bucket=None — только GET (например, для админов).
+        Без Redis — локальный лимит и None вместо значений.
+        """
+        empty: list[str | None] = [None] * len(fetch_keys)
+        local = ALLOWED
+        if bucket is not None:
+            local = self.local.hit(bucket, key)
+            if not local.allowed:
+                return local, empty
+
+        try:
+            redis = await get_redis()
+            if redis is None:
+                raise RedisConnectionError("Redis не инициализирован")
+            if bucket is not None and self._sha is None:
+                await self.load()
+            async with redis.pipeline(transaction=False) as pipe:
+                if bucket is not None:
+                    redis_key, emission_ms, window_ms = self._args(bucket, key)
+                    pipe.evalsha(self._sha, 1, redis_key, emission_ms, window_ms)
+                for k in fetch_keys:
+                    pipe.get(k)
+                replies = await pipe.execute(raise_on_error=False)
+
+            if bucket is None:
+                self._set_degraded(None)
+                return ALLOWED, list(replies)
+
+            rl_reply, values = replies[0], list(replies[1:])
+            if isinstance(rl_reply, NoScriptError):
+                # Redis перезапустился и потерял кеш скриптов
+                self._sha = None
+                rl_reply = await self._evalsha(bucket, key)
+            elif isinstance(rl_reply, Exception):
+                raise rl_reply
+            for v in values:
+                if isinstance(v, Exception):
+                    raise v
+        except (RedisError, OSError) as e:
+            self._set_degraded(e)
+            return local, empty
+
+        self._set_degraded(None)
+        return self.parse(rl_reply), values
+
+    def _set_degraded(self, error: Exception | None) -> None:
+        """Логируем только смену состояния, а не каждый запрос."""
+        if error is not None and not self.degraded:
+            self.degraded = True
+            logger.warning(f"⚠️ Rate limiter: Redis недоступен ({error}) — только локальный лимит")
+        elif error is None and self.degraded:
+            self.degraded = False
+            logger.info("✅ Rate limiter: Redis снова доступен")
+
+    async def _evalsha(self, bucket: str, key: int | str) -> list:
+        redis = await get_redis()
+        if redis is None:
+            raise RedisConnectionError("Redis не инициализирован")
+        sha = self._sha or await self.load()
+        redis_key, emission_ms, window_ms = self._args(bucket, key)
+        try:
+            return await redis.evalsha(sha, 1, redis_key, emission_ms, window_ms)
+        except NoScriptError:
+            # Redis перезапустился и потерял кеш скриптов
+            sha = await self.load()
+            return await redis.evalsha(sha, 1, redis_key, emission_ms, window_ms)
+
+
+rate_limiter = RateLimiter(_buckets(), local_size=settings.RATE_LIMIT_LOCAL_SIZE)
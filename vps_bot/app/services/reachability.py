@@ -0,0 +1,96 @@
+"""
+Учёт недоступных чатов (бот заблокирован, чат не найден).
+
+Очередь доставки и обработчик ошибок сообщают сюда telegram_id,
+а в БД они пишутся пачками — одним UPDATE раз в UNREACHABLE_FLUSH_INTERVAL
+секунд или при накоплении UNREACHABLE_FLUSH_SIZE штук. Помеченные
+пользователи (users.unreachable_since) выпадают из рассылок.
+
+Флаг снимается upsert'ом в UserRepository.get_or_create, когда
+пользователь снова пишет боту. Чтобы этот upsert точно случился,
+после пометки запись сбрасывается из локального кеша SecurityMiddleware
+(на других репликах она доживает USER_CACHE_TTL).
+"""
+from __future__ import annotations
+import asyncio
+import logging
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError, TelegramNotFound
+from app.core.config import settings
+from app.core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+def is_unreachable_error(exc: BaseException) -> bool:
+    """Ошибка означает, что писать в этот чат бессмысленно."""
+    if isinstance(exc, (TelegramForbiddenError, TelegramNotFound)):
+        return True
+    return isinstance(exc, TelegramBadRequest) and "chat not found" in str(exc).lower()
+
+
+class UnreachableTracker:
+    """Буфер telegram_id → пакетный UPDATE. Живёт в одном event loop."""
+
+    def __init__(self, flush_size: int, flush_interval: float) -> None:
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self._pending: set[int] = set()
+        self._task: asyncio.Task | None = None
+        self._flushing: asyncio.Task | None = None
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def mark(self, telegram_id: int) -> None:
+        if telegram_id <= 0:  # группы и каналы — не пользователи
+            return
+        self._pending.add(telegram_id)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name="unreachable_flush")
+        if len(self._pending) >= self.flush_size and (self._flushing is None or self._flushing.done()):
+            self._flushing = asyncio.create_task(self.flush())
+
+    async def flush(self) -> int:
+        if not self._pending:
+            return 0
+        from app.core.database import unit_of_work
+        from app.repositories.user import UserRepository
+        from app.services.user_cache import user_cache
+
+        ids, self._pending = list(self._pending), set()
+        try:
+            async with unit_of_work() as session:
+                marked = await UserRepository(session).mark_unreachable(ids)
+        except Exception as e:
+            logger.warning(f"Unreachable flush failed ({len(ids)} ids): {e}")
+            self._pending.update(ids)
+            return 0
+
+        for telegram_id in ids:
+            user_cache.invalidate(telegram_id)
+        metrics.inc("delivery.unreachable", marked)
+        if marked:
+            logger.info(f"📵 Marked {marked} users unreachable")
+        return marked
+
+    async def stop(self) -> None:
+        """Остановка бота: остановить таймер и дописать накопленное."""
+        for task in (self._task, self._flushing):
+            if task is not None and not task.done():
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+        self._task = self._flushing = None
+        await self.flush()
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            if not self._pending:
+                return
+            await self.flush()
+
+
+unreachable = UnreachableTracker(
+    flush_size=settings.UNREACHABLE_FLUSH_SIZE,
+    flush_interval=settings.UNREACHABLE_FLUSH_INTERVAL,
+)
@@ -17,7 +17,7 @@ from datetime import datetime
 from sqlalchemy import BigInteger, Boolean, DateTime, ForeignKey, Integer, Numeric, func, select
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.core.database import Base
+from app.core.database import Base, commit_or_flush
 
 logger = logging.getLogger(__name__)
 
@@ -65,7 +65,7 @@ class ReferralRepository:
 
         ref = Referral(referrer_id=referrer_id, referred_id=referred_id)
         self.session.add(ref)
-        await self.session.commit()
+        await commit_or_flush(self.session)
         logger.info(f"Referral registered: {referrer_id} → {referred_id}")
         return True
 
@@ -86,7 +86,7 @@ class ReferralRepository:
             ref.bonus_amount = amount
             ref.bonus_currency = currency
             ref.paid_at = datetime.utcnow()
-            await self.session.commit()
+            await commit_or_flush(self.session)
 
     async def count_referrals(self, referrer_id: int) -> int:
         result = await self.session.execute(
@@ -110,7 +110,7 @@ class ReferralRepository:
         if not balance:
             balance = UserBalance(telegram_id=telegram_id)
             self.session.add(balance)
-            await self.session.commit()
+            await commit_or_flush(self.session)
             await self.session.refresh(balance)
         return balance
 
@@ -118,6 +118,6 @@ class ReferralRepository:
         balance = await self.get_or_create_balance(telegram_id)
         balance.balance_rub = float(balance.balance_rub) + rub
         balance.balance_usdt = float(balance.balance_usdt) + usdt
-        await self.session.commit()
+        await commit_or_flush(self.session)
         await self.session.refresh(balance)
         return balance
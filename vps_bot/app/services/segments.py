@@ -0,0 +1,166 @@
+"""
+Сегменты рассылок.
+
+Segment — набор условий, который компилируется в WHERE над users
+(EXISTS-подзапросы к vps / payments / user_balances). Одни и те же условия
+идут и в COUNT для предпросмотра, и в keyset-выборку получателей
+(UserRepository.count_active / get_recipients_after).
+
+Условия (AND):
+  active        — есть активный неистёкший VPS
+  exp=N         — VPS истекает в ближайшие N дней
+  unpaid        — ни одной оплаты
+  lang=en|ru    — язык интерфейса (users.language, NULL = ru)
+  crypto        — была оплата через CryptoBot
+  bal=X         — реферальный баланс больше X ₽
+
+Сегмент хранится строкой (FSM, hash рассылки в Redis):
+    "active,exp=7,lang=en"  ⇄  Segment(has_active_vps=True, expiring_days=7, lang="en")
+"""
+from __future__ import annotations
+from dataclasses import dataclass, replace
+from datetime import datetime, timedelta
+from sqlalchemy import ColumnElement, exists, or_, select
+from app.core.i18n import DEFAULT_LANG
+from app.models import Payment, PaymentProvider, PaymentStatus, User, Vps, VpsStatus
+
+# Пресеты для кнопок админки: переключаются по кругу (None — выключено)
+EXPIRING_PRESETS = (None, 3, 7, 14)
+BALANCE_PRESETS = (None, 0, 100, 500)
+LANG_PRESETS = (None, "ru", "en")
+
+
+@dataclass(frozen=True)
+class Segment:
+    has_active_vps: bool = False
+    expiring_days: int | None = None
+    never_paid: bool = False
+    lang: str | None = None
+    paid_crypto: bool = False
+    min_balance_rub: float | None = None
+
+    # ── Сериализация ──────────────────────────────────────
+
+    def encode(self) -> str:
+        parts = []
+        if self.has_active_vps:
+            parts.append("active")
+        if self.expiring_days is not None:
+            parts.append(f"exp={self.expiring_days}")
+        if self.never_paid:
+            parts.append("unpaid")
+        if self.lang:
+            parts.append(f"lang={self.lang}")
+        if self.paid_crypto:
+            parts.append("crypto")
+        if self.min_balance_rub is not None:
+            parts.append(f"bal={self.min_balance_rub:g}")
+        return ",".join(parts)
+
+    @classmethod
+    def decode(cls, raw: str | None) -> Segment:
+        fields: dict = {}
+        for part in (raw or "").split(","):
+            name, _, value = part.partition("=")
+            if name == "active":
+                fields["has_active_vps"] = True
+            elif name == "exp":
+                fields["expiring_days"] = int(value)
+            elif name == "unpaid":
+                fields["never_paid"] = True
+            elif name == "lang":
+                fields["lang"] = value
+            elif name == "crypto":
+                fields["paid_crypto"] = True
+            elif name == "bal":
+                fields["min_balance_rub"] = float(value)
+        return cls(**fields)
+
+    def toggle(self, name: str) -> Segment:
+        """Переключить условие (кнопки админки)."""
+        if name == "active":
+            return replace(self, has_active_vps=not self.has_active_vps)
+        if name == "exp":
+            return replace(self, expiring_days=next_preset(EXPIRING_PRESETS, self.expiring_days))
+        if name == "unpaid":
+            return replace(self, never_paid=not self.never_paid)
+        if name == "lang":
+            return replace(self, lang=next_preset(LANG_PRESETS, self.lang))
+        if name == "crypto":
+            return replace(self, paid_crypto=not self.paid_crypto)
+        if name == "bal":
+            return replace(self, min_balance_rub=next_preset(BALANCE_PRESETS, self.min_balance_rub))
+        return self
+
+    def describe(self) -> str:
+        parts = []
+        if self.has_active_vps:
+            parts.append("есть активный VPS")
+        if self.expiring_days is not None:
+            parts.append(f"VPS истекает ≤ {self.expiring_days} дн.")
+        if self.never_paid:
+            parts.append("ни разу не платил")
+        if self.lang:
+            parts.append(f"язык: {self.lang}")
+        if self.paid_crypto:
+            parts.append("платил криптой")
+        if self.min_balance_rub is not None:
+            parts.append(f"баланс > {self.min_balance_rub:g} ₽")
+        return " · ".join(parts) or "все пользователи"
+
+    # ── SQL ───────────────────────────────────────────────
+
+    def conditions(self, now: datetime | None = None) -> list[ColumnElement[bool]]:
+        """Условия WHERE над User (без базовых: бан / недоступность)."""
+        from app.services.referral import UserBalance
+
+        now = now or datetime.utcnow()
+        where: list[ColumnElement[bool]] = []
+
+        if self.has_active_vps:
+            where.append(exists(
+                select(Vps.id)
+                .where(Vps.telegram_id == User.telegram_id)
+                .where(Vps.status == VpsStatus.ACTIVE)
+                .where(Vps.expires_at > now)
+            ))
+        if self.expiring_days is not None:
+            where.append(exists(
+                select(Vps.id)
+                .where(Vps.telegram_id == User.telegram_id)
+                .where(Vps.status == VpsStatus.ACTIVE)
+                .where(Vps.expires_at > now)
+                .where(Vps.expires_at <= now + timedelta(days=self.expiring_days))
+            ))
+        if self.never_paid:
+            where.append(~exists(
+                select(Payment.id)
+                .where(Payment.telegram_id == User.telegram_id)
+                .where(Payment.status == PaymentStatus.PAID)
+            ))
+        if self.lang == DEFAULT_LANG:
+            where.append(or_(User.language == self.lang, User.language.is_(None)))
+        elif self.lang:
+            where.append(User.language == self.lang)
+        if self.paid_crypto:
+            where.append(exists(
+                select(Payment.id)
+                .where(Payment.telegram_id == User.telegram_id)
+                .where(Payment.status == PaymentStatus.PAID)
+                .where(Payment.provider == PaymentProvider.CRYPTOBOT)
+            ))
+        if self.min_balance_rub is not None:
+            where.append(exists(
+                select(UserBalance.telegram_id)
+                .where(UserBalance.telegram_id == User.telegram_id)
+                .where(UserBalance.balance_rub > self.min_balance_rub)
+            ))
+        return where
+
+
+def next_preset(presets: tuple, current):
+    """Следующее значение из пресетов по кругу (кнопки-переключатели админки)."""
+    try:
+        return presets[(presets.index(current) + 1) % len(presets)]
+    except ValueError:
+        return presets[0]
@@ -0,0 +1,125 @@
+"""
+In-process кеш пользователей для SecurityMiddleware.
+
+Хранит telegram_id → (is_banned, отпечаток username/full_name) с TTL
+и LRU-вытеснением, чтобы не ходить в Postgres на каждый апдейт.
+Если username или имя поменялись — запись считается промахом,
+middleware сходит в БД и обновит профиль.
+
+Инвалидация между репликами — через Redis pub/sub:
+  publish_invalidation(telegram_id) → канал USER_CACHE_CHANNEL
+  run_invalidation_listener()       → каждая реплика выбрасывает запись
+"""
+from __future__ import annotations
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import NamedTuple
+from app.core.config import settings
+from app.core.redis import get_redis
+
+logger = logging.getLogger(__name__)
+
+USER_CACHE_CHANNEL = "user_cache:invalidate"
+
+
+class _Entry(NamedTuple):
+    expires_at: float
+    username: str | None
+    full_name: str | None
+    is_banned: bool
+
+
+class UserCache:
+    """Ограниченный LRU-кеш с TTL. Не потокобезопасен — живёт в одном event loop."""
+
+    def __init__(self, maxsize: int, ttl: float) -> None:
+        self._maxsize = maxsize
+        self._ttl = ttl
+        self._data: OrderedDict[int, _Entry] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, telegram_id: int, username: str | None, full_name: str | None) -> bool | None:
+        """
+        Вернуть is_banned из кеша или None при промахе.
+        Промах: записи нет, она протухла или профиль изменился.
+        """
+        entry = self._data.get(telegram_id)
+        if entry is None:
+            return None
+        if entry.expires_at < time.monotonic():
+            del self._data[telegram_id]
+            return None
+        if entry.username != username or entry.full_name != full_name:
+            return None
+        self._data.move_to_end(telegram_id)
+        return entry.is_banned
+
+    def put(
+        self,
+        telegram_id: int,
+        username: str | None,
+        full_name: str | None,
+        is_banned: bool,
+    ) -> None:
+        self._data[telegram_id] = _Entry(
+            time.monotonic() + self._ttl, username, full_name, is_banned,
+        )
+        self._data.move_to_end(telegram_id)
+        while len(self._data) > self._maxsize:
+            self._data.popitem(last=False)
+
+    def invalidate(self, telegram_id: int) -> None:
+        self._data.pop(telegram_id, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+
+user_cache = UserCache(maxsize=settings.USER_CACHE_SIZE, ttl=settings.USER_CACHE_TTL)
+
+
+async def publish_invalidation(telegram_id: int) -> None:
+    """Сбросить запись локально и разослать инвалидацию всем репликам."""
+    user_cache.invalidate(telegram_id)
+    try:
+        redis = await get_redis()
+        await redis.publish(USER_CACHE_CHANNEL, str(telegram_id))
+    except Exception as e:
+        logger.warning(f"User cache invalidation publish failed for {telegram_id}: {e}")
+
+
+async def run_invalidation_listener() -> None:
+    """
+    Фоновая задача: слушает канал инвалидации и чистит локальный кеш.
+    При обрыве соединения кеш очищается целиком — пока подписки не было,
+    мы могли пропустить инвалидации.
+    """
+    delay = 1.0
+    while True:
+        try:
+            redis = await get_redis()
+            pubsub = redis.pubsub(ignore_subscribe_messages=True)
+            await pubsub.subscribe(USER_CACHE_CHANNEL)
+            user_cache.clear()
+            delay = 1.0
+            try:
+                async for msg in pubsub.listen():
+                    if msg.get("type") != "message":
+                        continue
+                    try:
+                        user_cache.invalidate(int(msg["data"]))
+                    except (TypeError, ValueError):
+                        logger.warning(f"Bad user cache invalidation payload: {msg['data']!r}")
+            finally:
+                await pubsub.aclose()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"User cache listener error: {e} — reconnect in {delay:.0f}s")
+            user_cache.clear()
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 30.0)
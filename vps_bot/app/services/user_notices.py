@@ -0,0 +1,53 @@
+"""
+Склейка уведомлений одному пользователю в пределах прогона задачи.
+
+У клиента с пятью VPS, истекающими в один день, напоминание, удаление и
+автопродление приходят одним сообщением со списком серверов, а не пятью.
+Задача планировщика копит события по telegram_id и в конце отправляет
+по одному сообщению на получателя через очередь доставки:
+
+    notices = UserNotices()
+    for vps in rows:
+        notices.add(vps.telegram_id, vps)
+    for telegram_id, items, sent in notices.send(bot, render, priority=Priority.REMINDER):
+        await sent   # future доставки (wait=True) — можно отметить все items
+"""
+from __future__ import annotations
+import asyncio
+from collections import defaultdict
+from typing import Callable, Generic, TypeVar
+from aiogram import Bot
+from app.core.metrics import metrics
+from app.services.delivery import delivery, Priority
+
+T = TypeVar("T")
+
+
+class UserNotices(Generic[T]):
+    def __init__(self) -> None:
+        self._items: dict[int, list[T]] = defaultdict(list)
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def add(self, telegram_id: int, item: T) -> None:
+        self._items[telegram_id].append(item)
+
+    def send(
+        self,
+        bot: Bot,
+        render: Callable[[list[T]], str],
+        priority: Priority = Priority.REMINDER,
+        wait: bool = True,
+    ) -> list[tuple[int, list[T], asyncio.Future | None]]:
+        """Одно сообщение на получателя; render получает все его события."""
+        items, self._items = self._items, defaultdict(list)
+        merged = sum(len(group) for group in items.values()) - len(items)
+        if merged:
+            metrics.inc("notices.coalesced", merged)
+        return [
+            (telegram_id, group, delivery.send_message(
+                bot, telegram_id, render(group), priority=priority, wait=wait,
+            ))
+            for telegram_id, group in items.items()
+        ]
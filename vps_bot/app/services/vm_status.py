@@ -0,0 +1,141 @@
+"""
+Снимок статусов всех контейнеров кластера.
+
+Вместо status_lxc(vmid) на каждый клик (HTTP-запрос к ноде) фоновая
+задача раз в PROXMOX_SNAPSHOT_INTERVAL секунд читает
+/cluster/resources?type=vm — один запрос на весь кластер — и держит
+в памяти vmid → статус. Карточки VPS и список «Мои серверы» читают
+отсюда с пометкой возраста данных.
+
+Снимок старше PROXMOX_SNAPSHOT_MAX_AGE (Proxmox не отвечает) или
+явное «🔄 Обновить» — прямой status_lxc, результат кладётся в снимок.
+
+    vm_snapshot.get(vmid)                  # VmStatus | None, без I/O
+    await vm_snapshot.status(vmid, node, fresh=True)   # мимо снимка
+"""
+from __future__ import annotations
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from app.core.config import settings
+from app.core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class VmStatus:
+    vmid: int
+    node: str
+    status: str
+    cpu_pct: float
+    mem_used_mb: int
+    mem_total_mb: int
+    uptime_sec: int
+    fetched_at: float      # time.monotonic()
+
+    @property
+    def running(self) -> bool:
+        return self.status == "running"
+
+    @property
+    def age(self) -> float:
+        return time.monotonic() - self.fetched_at
+
+    @classmethod
+    def from_resource(cls, r: dict, fetched_at: float) -> VmStatus:
+        return cls(
+            vmid=int(r["vmid"]),
+            node=r.get("node", ""),
+            status=r.get("status", "unknown"),
+            cpu_pct=round(r.get("cpu", 0) * 100, 1),
+            mem_used_mb=r.get("mem", 0) // 1024 // 1024,
+            mem_total_mb=r.get("maxmem", 0) // 1024 // 1024,
+            uptime_sec=r.get("uptime", 0),
+            fetched_at=fetched_at,
+        )
+
+
+class VmSnapshot:
+    def __init__(self, interval: float, max_age: float) -> None:
+        self.interval = interval
+        self.max_age = max_age
+        self._items: dict[int, VmStatus] = {}
+        self._failing = False
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def get(self, vmid: int) -> VmStatus | None:
+        """Статус из снимка (без I/O); None — нет данных или слишком старые."""
+        st = self._items.get(vmid)
+        if st is None or st.age > self.max_age:
+            return None
+        return st
+
+    async def status(self, vmid: int, node: str | None = None, fresh: bool = False) -> VmStatus:
+        """Из снимка, а если его нет / устарел / fresh=True — прямым запросом к ноде."""
+        if not fresh:
+            st = self.get(vmid)
+            if st is not None:
+                metrics.inc("vm_snapshot.hit")
+                return st
+        metrics.inc("vm_snapshot.miss")
+        from app.services.proxmox import proxmox_service
+
+        data = await proxmox_service.status_lxc(vmid, node=node, fresh=fresh)
+        st = VmStatus(
+            vmid=vmid,
+            node=node or settings.PROXMOX_NODE,
+            status=data["status"],
+            cpu_pct=data["cpu_pct"],
+            mem_used_mb=data["mem_used_mb"],
+            mem_total_mb=data["mem_total_mb"],
+            uptime_sec=data["uptime_sec"],
+            fetched_at=time.monotonic(),
+        )
+        self._items[vmid] = st
+        return st
+
+    async def refresh(self) -> int:
+        from app.services.proxmox import proxmox_service
+
+        resources = await proxmox_service.cluster_vms()
+        now = time.monotonic()
+        self._items = {
+            int(r["vmid"]): VmStatus.from_resource(r, now)
+            for r in resources
+            if r.get("vmid") is not None
+        }
+        return len(self._items)
+
+    async def run(self) -> None:
+        """Фоновое обновление; ошибки логируются один раз на серию."""
+        if not settings.PROXMOX_HOST:
+            return
+        while True:
+            try:
+                count = await self.refresh()
+                if self._failing:
+                    logger.info(f"✅ VM snapshot restored ({count} containers)")
+                self._failing = False
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if not self._failing:
+                    logger.warning(f"VM snapshot refresh failed: {e}")
+                self._failing = True
+            await asyncio.sleep(self.interval)
+
+
+def format_age(st: VmStatus) -> str:
+    """Пометка свежести для карточек."""
+    age = int(st.age)
+    return "только что" if age < 2 else f"{age} с назад"
+
+
+vm_snapshot = VmSnapshot(
+    interval=settings.PROXMOX_SNAPSHOT_INTERVAL,
+    max_age=settings.PROXMOX_SNAPSHOT_MAX_AGE,
+)
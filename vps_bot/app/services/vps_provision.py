@@ -3,13 +3,25 @@ VPS Provisioning Service.
 
 Создаёт или продлевает VPS после подтверждения оплаты.
 Включает антифрод, реферальные бонусы и уведомления в канал.
+
+Запись в БД — одной транзакцией (unit_of_work): продление + платёж,
+либо VPS + платёж + реферальный бонус (под SAVEPOINT). IP из пула
+резервируется отдельно, до создания контейнера.
+
+Если создание сорвалось после отправки задачи в Proxmox (таймаут задачи,
+ошибка записи в БД), контейнер с этим IP может существовать или ещё
+появиться. Тогда он сначала удаляется и только потом IP возвращается
+в пул; не удалось удалить — IP остаётся занятым (карантин), админам
+уходит vmid/нода для ручной проверки.
 """
 from __future__ import annotations
 import logging
 from datetime import datetime, timedelta
 from aiogram import Bot
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.core.config import settings, TARIFFS
-from app.core.database import AsyncSessionLocal
+from app.core.database import AsyncSessionLocal, unit_of_work
 from app.repositories.vps import VpsRepository
 from app.repositories.user import PaymentRepository
 from app.models import PaymentStatus
@@ -17,6 +29,7 @@ from app.services.proxmox import proxmox_service, generate_password
 from app.services.n8n import n8n_notify
 from app.services.notify import notify_new_vps
 from app.services.antifrod import check_duplicate_payment
+from app.services.delivery import delivery
 
 logger = logging.getLogger(__name__)
 
@@ -38,6 +51,9 @@ async def provision_vps(
         logger.info(f"Duplicate payment processing blocked: {payment_external_id}")
         return
 
+    ip: str | None = None
+    container: tuple[int, str, str] | None = None   # (vmid, node, hostname) — задача в PVE отправлена
+    created_vps_id: int | None = None               # VPS и платёж закоммичены — откатывать нечего
     async with AsyncSessionLocal() as session:
         vps_repo = VpsRepository(session)
         pay_repo = PaymentRepository(session)
@@ -45,17 +61,18 @@ async def provision_vps(
         try:
             # ── Продление ────────────────────────────────────
             if renew_vps_id:
-                vps = await vps_repo.get_by_id(renew_vps_id)
-                if not vps or vps.telegram_id != telegram_id:
-                    raise ValueError("VPS не найден или не принадлежит пользователю")
+                async with unit_of_work(session):
+                    vps = await vps_repo.get_by_id(renew_vps_id)
+                    if not vps or vps.telegram_id != telegram_id:
+                        raise ValueError("VPS не найден или не принадлежит пользователю")
 
-                base = max(vps.expires_at, datetime.utcnow())
-                new_exp = base + timedelta(days=30)
-                await vps_repo.extend(renew_vps_id, new_exp)
+                    base = max(vps.expires_at, datetime.utcnow())
+                    new_exp = base + timedelta(days=30)
+                    await vps_repo.extend(renew_vps_id, new_exp)
 
-                payment = await pay_repo.get_by_external_id(payment_external_id)
-                if payment:
-                    await pay_repo.set_status(payment.id, PaymentStatus.PAID)
+                    payment = await pay_repo.get_by_external_id(payment_external_id)
+                    if payment:
+                        await pay_repo.set_status(payment.id, PaymentStatus.PAID)
 
                 await n8n_notify("vps.renewed", {
                     "telegram_id": telegram_id,
@@ -64,7 +81,8 @@ async def provision_vps(
                     "expires_at": new_exp.isoformat(),
                 })
 
-                await bot.send_message(
+                await delivery.send_message(
+                    bot,
                     telegram_id,
                     f"✅ <b>Сервер продлён на 30 дней!</b>\n\n"
                     f"🌐 IP: <code>{vps.ip}</code>\n"
@@ -74,7 +92,9 @@ async def provision_vps(
                 return
 
             # ── Создание нового VPS ──────────────────────────
-            # Берём свободный IP
+            # Берём свободный IP — отдельная короткая транзакция:
+            # держать блокировку строки пула всё время создания
+            # контейнера в Proxmox незачем.
             ip = await vps_repo.acquire_ip()
             if not ip:
                 raise RuntimeError(
@@ -82,43 +102,54 @@ async def provision_vps(
                     f"Обратись в поддержку: {settings.SUPPORT_USERNAME}"
                 )
 
+            node = await proxmox_service.place(tariff)
             vmid = await proxmox_service.next_vmid()
             hostname = f"vps-{telegram_id}-{vmid}"
             password = generate_password()
             expires_at = datetime.utcnow() + timedelta(days=30)
 
-            # Создаём LXC контейнер в Proxmox
-            await proxmox_service.create_lxc(vmid, hostname, ip, password, tariff)
-
-            # Сохраняем в БД
-            vps = await vps_repo.create(
-                telegram_id=telegram_id,
-                vmid=vmid,
-                hostname=hostname,
-                ip=ip,
-                password=password,
-                tariff=tariff_id,
-                expires_at=expires_at,
-            )
+            # Создаём LXC контейнер в Proxmox: ждём задачу PVE и открытый SSH.
+            # Помечаем до запроса: POST мог дойти до PVE, даже если ответа мы не дождались
+            container = (vmid, node, hostname)
+            ssh_ready = await proxmox_service.create_lxc(vmid, hostname, ip, password, tariff, node=node)
+
+            # VPS + статус платежа + реферальный бонус — одна транзакция
+            referral_notice = None
+            async with unit_of_work(session):
+                vps = await vps_repo.create(
+                    telegram_id=telegram_id,
+                    vmid=vmid,
+                    node=node,
+                    hostname=hostname,
+                    ip=ip,
+                    password=password,
+                    tariff=tariff_id,
+                    expires_at=expires_at,
+                )
 
-            # Помечаем платёж как оплаченный
-            payment = await pay_repo.get_by_external_id(payment_external_id)
-            if payment:
-                await pay_repo.set_status(payment.id, PaymentStatus.PAID)
-                currency = payment.currency
-                amount = float(payment.amount)
-            else:
-                currency = "?"
-                amount = 0
+                # Помечаем платёж как оплаченный
+                payment = await pay_repo.get_by_external_id(payment_external_id)
+                if payment:
+                    await pay_repo.set_status(payment.id, PaymentStatus.PAID)
+                    currency = payment.currency
+                    amount = float(payment.amount)
+                else:
+                    currency = "?"
+                    amount = 0
+
+                # ── Реферальный бонус ─────────────────────────
+                if settings.REFERRAL_ENABLED:
+                    referral_notice = await _pay_referral_bonus(session, telegram_id, currency)
 
-            # ── Реферальный бонус ─────────────────────────
-            if settings.REFERRAL_ENABLED:
-                await _pay_referral_bonus(bot, telegram_id, currency, amount)
+                from app.repositories.user import UserRepository
+                user = await UserRepository(session).get_by_telegram_id(telegram_id)
+
+            # Дальше только уведомления: контейнер и IP принадлежат оплаченному VPS
+            created_vps_id = vps.id
 
             # ── Уведомления ───────────────────────────────
-            from app.repositories.user import UserRepository
-            async with AsyncSessionLocal() as s2:
-                user = await UserRepository(s2).get_by_telegram_id(telegram_id)
+            if referral_notice:
+                await _notify_referrer(bot, *referral_notice)
 
             await n8n_notify("vps.created", {
                 "telegram_id": telegram_id,
@@ -137,7 +168,8 @@ async def provision_vps(
             )
 
             # ── Сообщение пользователю ────────────────────
-            await bot.send_message(
+            await delivery.send_message(
+                bot,
                 telegram_id,
                 f"🎉 <b>Твой сервер готов!</b>\n\n"
                 f"📦 Тариф: <b>{tariff['name']}</b>\n"
@@ -146,35 +178,43 @@ async def provision_vps(
                 f"👤 Логин: <code>root</code>\n"
                 f"🔑 Пароль: <code>{password}</code>\n"
                 f"━━━━━━━━━━━━━━━━━\n\n"
-                f"🔌 SSH: <code>ssh root@{ip}</code>\n\n"
-                f"📅 Активен до: <b>{expires_at.strftime('%d.%m.%Y')}</b>\n\n"
+                f"🔌 SSH: <code>ssh root@{ip}</code>\n"
+                + ("" if ssh_ready else "⏳ <i>Сервер ещё загружается — SSH заработает через минуту.</i>\n")
+                + f"\n📅 Активен до: <b>{expires_at.strftime('%d.%m.%Y')}</b>\n\n"
                 f"📖 Управляй сервером: /start → Мои серверы",
             )
 
             logger.info(f"VPS #{vps.id} ({ip}) created for user {telegram_id}")
 
         except Exception as exc:
+            if created_vps_id is not None:
+                # VPS создан и оплачен, не дошло уведомление — ничего не удаляем
+                logger.exception(f"VPS #{created_vps_id} created for {telegram_id}, but notifications failed: {exc}")
+                from app.services.notify import notify_error
+                await notify_error(bot, f"VPS #{created_vps_id} created, notifications failed", str(exc))
+                return
+
             logger.exception(f"provision_vps FAILED for {telegram_id}: {exc}")
 
-            # Освобождаем IP если он был взят но VPS не создан
-            try:
-                if 'ip' in locals() and ip:
-                    async with AsyncSessionLocal() as s:
-                        await VpsRepository(s).release_ip(ip)
-            except Exception:
-                pass
+            # Контейнер мог создаться (или ещё создаётся) — IP отдаём, только когда его нет
+            quarantine = None
+            if ip and container:
+                quarantine = await _discard_container(*container)
 
-            # Помечаем платёж как ошибочный
+            # Освобождаем IP (если был взят) и помечаем платёж ошибочным — одной транзакцией
             try:
-                async with AsyncSessionLocal() as s:
+                async with unit_of_work() as s:
+                    if ip and not quarantine:
+                        await VpsRepository(s).release_ip(ip)
                     p = await PaymentRepository(s).get_by_external_id(payment_external_id)
                     if p and p.status.value == "pending":
                         await PaymentRepository(s).set_status(p.id, PaymentStatus.FAILED)
-            except Exception:
-                pass
+            except Exception as e:
+                logger.exception(f"provision_vps cleanup failed for {telegram_id} (ip={ip}): {e}")
 
             # Сообщаем пользователю
-            await bot.send_message(
+            await delivery.send_message(
+                bot,
                 telegram_id,
                 f"❌ <b>Ошибка при создании сервера</b>\n\n"
                 f"Деньги не списаны зря — обратись в поддержку и мы всё исправим.\n"
@@ -184,54 +224,79 @@ async def provision_vps(
 
             # Уведомляем администраторов
             from app.services.notify import notify_error
-            await notify_error(bot, f"provision_vps failed for {telegram_id}", str(exc))
+            details = str(exc)
+            if quarantine:
+                details += f"\n\nIP {ip} оставлен занятым: {quarantine}"
+            await notify_error(bot, f"provision_vps failed for {telegram_id}", details)
+
+
+async def _discard_container(vmid: int, node: str, hostname: str) -> str | None:
+    """
+    Удалить контейнер несостоявшегося VPS. None — контейнера нет, IP можно
+    вернуть в пул; иначе — причина, по которой IP нужно придержать.
+    Чужой контейнер (vmid занят другим hostname) не трогаем.
+    """
+    try:
+        found = await proxmox_service.lxc_hostname(vmid, node=node)
+        if found is None:
+            return None
+        if found != hostname:
+            logger.warning(f"LXC {vmid} on {node} belongs to {found}, not {hostname} — not deleting")
+            return None
+        await proxmox_service.delete_lxc(vmid, node=node)
+        return None
+    except Exception as e:
+        logger.error(f"Failed to remove LXC {vmid} on {node} after provisioning error: {e}")
+        return f"контейнер {vmid} на {node} не удалён ({type(e).__name__}: {e}) — проверь вручную"
 
 
 async def _pay_referral_bonus(
-    bot: Bot,
+    session: AsyncSession,
     telegram_id: int,
     currency: str,
-    amount: float,
-) -> None:
-    """Начислить бонус рефереру при первой покупке реферала."""
-    try:
-        async with AsyncSessionLocal() as session:
-            from app.services.referral import ReferralRepository
-            repo = ReferralRepository(session)
-
-            referrer_id = await repo.get_referrer(telegram_id)
-            if not referrer_id:
-                return
+) -> tuple[int, str] | None:
+    """
+    Начислить бонус рефереру при первой покупке реферала — в транзакции
+    вызывающего, под SAVEPOINT: сбой бонуса не откатывает создание VPS.
+    Возвращает (referrer_id, bonus_str) для уведомления после commit.
+    """
+    from app.services.referral import Referral, ReferralRepository
+    repo = ReferralRepository(session)
 
+    try:
+        async with session.begin_nested():
             ref_result = await session.execute(
-                __import__('sqlalchemy', fromlist=['select']).select(
-                    __import__('app.services.referral', fromlist=['Referral']).Referral
-                ).where(
-                    __import__('app.services.referral', fromlist=['Referral']).Referral.referred_id == telegram_id
-                )
+                select(Referral).where(Referral.referred_id == telegram_id)
             )
             ref = ref_result.scalar_one_or_none()
             if not ref or ref.bonus_paid:
-                return
+                return None
 
             # Выдаём бонус
             is_usdt = currency == "USDT"
             bonus_rub = settings.REFERRAL_BONUS_RUB if not is_usdt else 0
             bonus_usdt = settings.REFERRAL_BONUS_USDT if is_usdt else 0
 
-            await repo.add_balance(referrer_id, rub=bonus_rub, usdt=bonus_usdt)
+            await repo.add_balance(ref.referrer_id, rub=bonus_rub, usdt=bonus_usdt)
             await repo.mark_bonus_paid(telegram_id, bonus_usdt if is_usdt else bonus_rub, currency)
+    except Exception as e:
+        logger.error(f"Referral bonus failed: {e}")
+        return None
+
+    bonus_str = f"{bonus_usdt} USDT" if is_usdt else f"{bonus_rub:.0f} ₽"
+    logger.info(f"Referral bonus paid: {bonus_str} to {ref.referrer_id}")
+    return ref.referrer_id, bonus_str
 
-        # Уведомляем реферера
-        bonus_str = f"{bonus_usdt} USDT" if is_usdt else f"{bonus_rub:.0f} ₽"
-        await bot.send_message(
+
+async def _notify_referrer(bot: Bot, referrer_id: int, bonus_str: str) -> None:
+    try:
+        await delivery.send_message(
+            bot,
             referrer_id,
             f"🎉 <b>Реферальный бонус!</b>\n\n"
             f"Твой реферал купил VPS!\n"
             f"На твой бонусный баланс начислено: <b>{bonus_str}</b>\n\n"
             f"Проверь баланс: /ref",
         )
-        logger.info(f"Referral bonus paid: {bonus_str} to {referrer_id}")
-
     except Exception as e:
-        logger.error(f"Referral bonus failed: {e}")
+        logger.warning(f"Referral bonus notification failed for {referrer_id}: {e}")
@@ -13,13 +13,26 @@ Callback-data префиксы:
   check:*      — проверка оплаты
   ping:*       — пинг VPS
   autorenew_*  — автопродление
+
+Кеш клавиатур:
+  @cached_kb — клавиатура собирается один раз на набор аргументов
+  (lang, tariff_id, ...) и дальше отдаётся готовым объектом.
+  Объект общий для всех вызовов — НЕ мутировать, строить новую.
+  Клавиатуры с id конкретной сущности (VPS, рассылки, callback
+  подтверждения) не кешируем: каждая нужна один раз и только
+  вытесняет из LRU статичные меню.
 """
 from __future__ import annotations
+from functools import lru_cache
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
-from app.core.config import TARIFFS
+from app.core.config import settings, TARIFFS
+from app.core.i18n import t
 from app.models import Vps
 from datetime import datetime
 
+KB_CACHE_SIZE = 1024
+cached_kb = lru_cache(maxsize=KB_CACHE_SIZE)
+
 
 # ── Хелперы ───────────────────────────────────────────────────
 
@@ -42,6 +55,7 @@ def back_btn(target: str = "main_menu", label: str = "◀️ Назад") -> Inl
     return btn(label, target)
 
 
+@cached_kb
 def back_kb(target: str = "main_menu", label: str = "◀️ Назад") -> InlineKeyboardMarkup:
     """Клавиатура только с кнопкой «Назад»."""
     return kb([back_btn(target, label)])
@@ -51,17 +65,23 @@ def back_kb(target: str = "main_menu", label: str = "◀️ Назад") -> Inli
 # КЛИЕНТСКИЕ КЛАВИАТУРЫ
 # ═══════════════════════════════════════════════════════════════
 
-def main_menu_kb(referral_enabled: bool = True) -> InlineKeyboardMarkup:
+@cached_kb
+def main_menu_kb(lang: str) -> InlineKeyboardMarkup:
     rows = [
-        [btn("📦 Тарифы и цены", "tariffs")],
-        [btn("🖥️ Мои серверы", "my_vps")],
+        [btn(t("btn_tariffs", lang), "tariffs")],
+        [btn(t("btn_my_vps", lang), "my_vps")],
     ]
-    if referral_enabled:
-        rows.append([btn("👥 Реферальная программа", "referral")])
-    rows.append([btn("💬 Поддержка", "support")])
+    if settings.REFERRAL_ENABLED:
+        rows.append([btn(t("btn_referral", lang), "referral")])
+    rows.append([btn(t("btn_support", lang), "support")])
+    rows.append([
+        btn(t("btn_language", lang), "language"),
+        btn("🔄 Автопродление", "autorenew_settings"),
+    ])
     return InlineKeyboardMarkup(inline_keyboard=rows)
 
 
+@cached_kb
 def tariffs_kb() -> InlineKeyboardMarkup:
     rows = [
         [btn(f"{t['emoji']} {t['name']} — {t['price_rub']} ₽ / {t['price_usdt']} USDT", f"tariff:{tid}")]
@@ -71,6 +91,7 @@ def tariffs_kb() -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(inline_keyboard=rows)
 
 
+@cached_kb
 def tariff_detail_kb(tariff_id: str) -> InlineKeyboardMarkup:
     return kb(
         [btn("🛒 Купить сейчас", f"buy:{tariff_id}")],
@@ -132,6 +153,7 @@ def vps_detail_kb(vps_id: int, tariff_id: str, autorenew: bool = False) -> Inlin
 #   adm:ippool → IP пул
 # ═══════════════════════════════════════════════════════════════
 
+@cached_kb
 def adm_home_kb() -> InlineKeyboardMarkup:
     """Главное меню админ-панели."""
     return kb(
@@ -144,6 +166,7 @@ def adm_home_kb() -> InlineKeyboardMarkup:
     )
 
 
+@cached_kb
 def adm_stats_kb() -> InlineKeyboardMarkup:
     return kb(
         [btn("📈 Выручка 7д",  "adm:stats:7d"),
@@ -153,6 +176,7 @@ def adm_stats_kb() -> InlineKeyboardMarkup:
     )
 
 
+@cached_kb
 def adm_users_kb(page: int = 0, has_next: bool = False) -> InlineKeyboardMarkup:
     """Меню раздела пользователей."""
     rows = [
@@ -197,6 +221,7 @@ def adm_user_vps_kb(vps_list: list, telegram_id: int) -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(inline_keyboard=rows)
 
 
+@cached_kb
 def adm_vps_kb(page: int = 0, has_next: bool = False) -> InlineKeyboardMarkup:
     """Меню раздела серверов."""
     rows = [
@@ -227,6 +252,64 @@ def adm_vps_card_kb(vps_id: int, telegram_id: int) -> InlineKeyboardMarkup:
     )
 
 
+def adm_broadcast_ctl_kb(broadcast_id: int, status: str) -> InlineKeyboardMarkup:
+    """Управление фоновой рассылкой: пауза / продолжить / отмена."""
+    if status == "running":
+        return kb(
+            [btn("⏸ Пауза",    f"adm:bc:pause:{broadcast_id}"),
+             btn("⏹ Отменить", f"adm:bc:cancel:{broadcast_id}")],
+        )
+    if status == "paused":
+        return kb(
+            [btn("▶️ Продолжить", f"adm:bc:resume:{broadcast_id}"),
+             btn("⏹ Отменить",    f"adm:bc:cancel:{broadcast_id}")],
+        )
+    return kb([back_btn("adm:home")])
+
+
+@cached_kb
+def adm_segment_kb(segment) -> InlineKeyboardMarkup:
+    """Выбор сегмента рассылки: кнопки переключают условия (services/segments.py)."""
+    def mark(on: bool) -> str:
+        return "✅" if on else "▫️"
+
+    exp = f"≤ {segment.expiring_days} дн." if segment.expiring_days is not None else "—"
+    lang = segment.lang or "—"
+    bal = f"> {segment.min_balance_rub:g} ₽" if segment.min_balance_rub is not None else "—"
+    return kb(
+        [btn(f"{mark(segment.has_active_vps)} Есть активный VPS", "adm:bcseg:active")],
+        [btn(f"{mark(segment.expiring_days is not None)} Истекает: {exp}", "adm:bcseg:exp")],
+        [btn(f"{mark(segment.never_paid)} Ни разу не платил", "adm:bcseg:unpaid"),
+         btn(f"{mark(segment.paid_crypto)} Платил криптой", "adm:bcseg:crypto")],
+        [btn(f"{mark(segment.lang is not None)} Язык: {lang}", "adm:bcseg:lang"),
+         btn(f"{mark(segment.min_balance_rub is not None)} Баланс: {bal}", "adm:bcseg:bal")],
+        [btn("✅ Готово", "adm:broadcast:segdone")],
+    )
+
+
+def adm_schedule_kb(schedule) -> InlineKeyboardMarkup:
+    """Расписание рассылки: кнопки переключают пресеты (services/broadcast_jobs.py)."""
+    from app.services.broadcast_jobs import describe_repeat, describe_window
+
+    return kb(
+        [btn(f"⏰ Старт через {schedule.start_in_hours} ч", "adm:bcsched:in")],
+        [btn(f"🔁 {describe_repeat(schedule.repeat_hours).capitalize()}", "adm:bcsched:every")],
+        [btn(f"🕒 {describe_window(schedule.window_minutes).capitalize()}", "adm:bcsched:window")],
+        [btn("✅ Запланировать", "adm:broadcast:schedconfirm")],
+        [btn("❌ Отменить",      "adm:broadcast:cancel")],
+    )
+
+
+def adm_broadcast_jobs_kb(jobs) -> InlineKeyboardMarkup:
+    """Список запланированных рассылок с кнопками отмены."""
+    rows = [
+        [btn(f"🗑 #{job.id} · {job.run_at:%d.%m %H:%M}", f"adm:bcjob:cancel:{job.id}")]
+        for job in jobs
+    ]
+    return kb(*rows, [back_btn("adm:broadcast")])
+
+
+@cached_kb
 def adm_settings_kb() -> InlineKeyboardMarkup:
     """Меню настроек."""
     return kb(
@@ -0,0 +1,84 @@
+"""
+Рендер экранов через edit_text без холостых вызовов Bot API.
+
+Для каждого (chat_id, message_id) в Redis лежит короткоживущий штамп
+последнего отрисованного экрана: edit_date сообщения + хеш (text,
+reply_markup). Если из callback пришло то же сообщение (edit_date не
+менялся — значит, его никто не правил в обход рендера) и содержимое то же,
+edit_text не отправляется (render.skipped), хендлер просто отвечает на
+callback как обычно.
+
+Если Redis недоступен — обычный edit_text, "message is not modified"
+гасится здесь же (render.not_modified).
+
+Использование:
+    await edit_or_skip(call.message, text, reply_markup=kb)
+    await call.answer()
+"""
+from __future__ import annotations
+import hashlib
+import logging
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import InlineKeyboardMarkup, Message
+from redis.exceptions import RedisError
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.core.redis import get_redis
+
+logger = logging.getLogger(__name__)
+
+
+def render_key(chat_id: int, message_id: int) -> str:
+    return f"render:{chat_id}:{message_id}"
+
+
+def render_hash(text: str, reply_markup: InlineKeyboardMarkup | None = None) -> str:
+    h = hashlib.blake2b(text.encode(), digest_size=16)
+    if reply_markup is not None:
+        h.update(b"\x00")
+        h.update(reply_markup.model_dump_json(exclude_none=True).encode())
+    return h.hexdigest()
+
+
+def _stamp(message: Message, digest: str) -> str:
+    edited = message.edit_date or message.date
+    return f"{int(edited.timestamp())}:{digest}"
+
+
+async def edit_or_skip(
+    message: Message,
+    text: str,
+    reply_markup: InlineKeyboardMarkup | None = None,
+    **kwargs,
+) -> bool:
+    """
+    edit_text, если экран отличается от последнего отрисованного.
+    Возвращает True, если сообщение было отредактировано.
+    """
+    key = render_key(message.chat.id, message.message_id)
+    digest = render_hash(text, reply_markup)
+
+    redis = await get_redis()
+    if redis is not None:
+        try:
+            if await redis.get(key) == _stamp(message, digest):
+                metrics.inc("render.skipped")
+                return False
+        except (RedisError, OSError) as e:
+            logger.debug(f"render stamp unavailable: {e}")
+            redis = None
+
+    try:
+        edited = await message.edit_text(text, reply_markup=reply_markup, **kwargs)
+    except TelegramBadRequest as e:
+        if "message is not modified" not in str(e).lower():
+            raise
+        metrics.inc("render.not_modified")
+        return False
+
+    if redis is not None and isinstance(edited, Message):
+        try:
+            await redis.set(key, _stamp(edited, digest), ex=settings.RENDER_HASH_TTL)
+        except (RedisError, OSError):
+            pass
+    return True
@@ -11,6 +11,12 @@ from app.core.webhook import start_webhook
 from app.core.scheduler import start_scheduler
 from app.core.startup import run_startup_checks
 from app.core.errors import setup_error_handlers
+from app.services.user_cache import run_invalidation_listener
+from app.services.delivery import delivery
+from app.services.reachability import unreachable
+from app.services.broadcast import resume_broadcasts
+from app.services.proxmox import proxmox_service
+from app.services.vm_status import vm_snapshot
 
 
 async def main() -> None:
@@ -25,9 +31,28 @@ async def main() -> None:
 
     await init_db()
     await init_redis()
+
+    # Фоновые задачи — держим ссылки, чтобы их не собрал GC
+    background_tasks = [
+        asyncio.create_task(run_invalidation_listener()),
+        asyncio.create_task(vm_snapshot.run()),
+    ]
+
     await run_startup_checks()
     setup_error_handlers(dp, bot)
+
+    async def stop_background() -> None:
+        # До proxmox_service.close: иначе vm_snapshot.run() откроет новую сессию
+        for task in background_tasks:
+            task.cancel()
+        await asyncio.gather(*background_tasks, return_exceptions=True)
+        await delivery.stop()
+        await unreachable.stop()
+
+    dp.shutdown.register(stop_background)
+    dp.shutdown.register(proxmox_service.close)  # пул соединений к Proxmox
     await start_scheduler(bot)
+    await resume_broadcasts(bot)
 
     if settings.BOT_RUN_MODE == "webhook":
         await start_webhook(bot, dp)
@@ -0,0 +1,31 @@
+"""add users.unreachable_since
+
+Revision ID: 0005_unreachable
+Revises: 0004_promo
+Create Date: 2025-01-05 00:00:00.000000
+"""
+from typing import Union
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = "0005_unreachable"
+down_revision: Union[str, None] = "0004_promo"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("users", sa.Column("unreachable_since", sa.DateTime(), nullable=True))
+    # Частичный индекс под выборку получателей рассылки:
+    # WHERE id > :cursor AND NOT is_banned AND unreachable_since IS NULL ORDER BY id
+    op.create_index(
+        "ix_users_reachable_id",
+        "users",
+        ["id"],
+        postgresql_where=sa.text("is_banned = false AND unreachable_since IS NULL"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_users_reachable_id", table_name="users")
+    op.drop_column("users", "unreachable_since")
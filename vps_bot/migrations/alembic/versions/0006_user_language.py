@@ -0,0 +1,24 @@
+"""add users.language
+
+Revision ID: 0006_user_language
+Revises: 0005_unreachable
+Create Date: 2025-01-06 00:00:00.000000
+"""
+from typing import Union
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = "0006_user_language"
+down_revision: Union[str, None] = "0005_unreachable"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # NULL — язык по умолчанию (ru). Основное хранилище для хендлеров —
+    # Redis (lang:<id>), колонка нужна для сегментов рассылок.
+    op.add_column("users", sa.Column("language", sa.String(8), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("users", "language")
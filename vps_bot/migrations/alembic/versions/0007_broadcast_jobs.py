@@ -0,0 +1,40 @@
+"""add broadcast_jobs
+
+Revision ID: 0007_broadcast_jobs
+Revises: 0006_user_language
+Create Date: 2025-01-07 00:00:00.000000
+"""
+from typing import Union
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = "0007_broadcast_jobs"
+down_revision: Union[str, None] = "0006_user_language"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "broadcast_jobs",
+        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column("created_by", sa.BigInteger(), nullable=False),
+        sa.Column("body", sa.Text(), nullable=False, server_default=""),
+        sa.Column("from_chat_id", sa.BigInteger(), nullable=True),
+        sa.Column("message_ids", sa.String(256), nullable=False, server_default=""),
+        sa.Column("segment", sa.String(256), nullable=False, server_default=""),
+        sa.Column("run_at", sa.DateTime(), nullable=False),
+        sa.Column("repeat_hours", sa.Integer(), nullable=True),
+        sa.Column("window_minutes", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("is_active", sa.Boolean(), nullable=False, server_default="true"),
+        sa.Column("last_broadcast_id", sa.Integer(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False, server_default=sa.func.now()),
+    )
+    op.create_index(
+        "ix_broadcast_jobs_due", "broadcast_jobs", ["run_at"],
+        postgresql_where=sa.text("is_active"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("broadcast_jobs")
@@ -0,0 +1,23 @@
+"""add vps.node
+
+Revision ID: 0008_vps_node
+Revises: 0007_broadcast_jobs
+Create Date: 2025-01-08 00:00:00.000000
+"""
+from typing import Union
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = "0008_vps_node"
+down_revision: Union[str, None] = "0007_broadcast_jobs"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # NULL — VPS создан до мультинодовости, живёт на PROXMOX_NODE
+    op.add_column("vps", sa.Column("node", sa.String(64), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("vps", "node")
@@ -0,0 +1,25 @@
+"""add broadcast_jobs.failures
+
+Revision ID: 0009_broadcast_job_failures
+Revises: 0008_vps_node
+Create Date: 2025-01-09 00:00:00.000000
+"""
+from typing import Union
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = "0009_broadcast_job_failures"
+down_revision: Union[str, None] = "0008_vps_node"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "broadcast_jobs",
+        sa.Column("failures", sa.Integer(), nullable=False, server_default="0"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("broadcast_jobs", "failures")
@@ -0,0 +1,22 @@
+"""add broadcast_jobs.retry_at
+
+Revision ID: 0010_broadcast_job_retry
+Revises: 0009_broadcast_job_failures
+Create Date: 2025-01-10 00:00:00.000000
+"""
+from typing import Union
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = "0010_broadcast_job_retry"
+down_revision: Union[str, None] = "0009_broadcast_job_failures"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("broadcast_jobs", sa.Column("retry_at", sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("broadcast_jobs", "retry_at")
@@ -0,0 +1,80 @@
+"""
+Тесты для бекапа: загрузка один раз + file_id, нарезка на части.
+"""
+import pytest
+from types import SimpleNamespace
+from unittest.mock import patch
+from aiogram.types import FSInputFile
+from app.services import backup
+
+
+def test_split_file_into_numbered_parts(tmp_path):
+    path = tmp_path / "dump.sql.gz"
+    path.write_bytes(bytes(range(256)) * 10)  # 2560 байт
+
+    assert backup.split_file(path, 4096) == [path]
+
+    parts = backup.split_file(path, 1000)
+    assert [p.name for p in parts] == ["dump.sql.gz.part1", "dump.sql.gz.part2", "dump.sql.gz.part3"]
+    assert [p.stat().st_size for p in parts] == [1000, 1000, 560]
+    assert b"".join(p.read_bytes() for p in parts) == path.read_bytes()
+
+
+@pytest.mark.asyncio
+async def test_uploads_once_then_reuses_file_id(tmp_path):
+    path = tmp_path / "dump.sql.gz"
+    path.write_bytes(b"data")
+    documents = []
+
+    async def send(bot, chat_id, method, priority=None):
+        documents.append((chat_id, method.document))
+        if chat_id == 1:
+            raise RuntimeError("admin blocked the bot")
+        return SimpleNamespace(document=SimpleNamespace(file_id="FILE"))
+
+    with patch.object(backup.delivery, "send", send):
+        delivered = await backup.send_to_all(None, [(1, {}), (2, {}), (3, {}), (-100, {})], path, "cap")
+
+    assert delivered == 3
+    # Первая загрузка не удалась — второй получатель снова грузит файл
+    assert [isinstance(d, FSInputFile) for _, d in documents] == [True, True, False, False]
+    assert [d for _, d in documents[2:]] == ["FILE", "FILE"]
+
+
+@pytest.mark.asyncio
+async def test_dump_is_compressed_off_the_event_loop(tmp_path, monkeypatch):
+    import asyncio
+    import gzip
+    import threading
+    from unittest.mock import AsyncMock, MagicMock
+
+    dump = b"INSERT INTO users VALUES (1);\n" * 100_000
+    stdout = asyncio.StreamReader()
+    stdout.feed_data(dump)
+    stdout.feed_eof()
+    stderr = asyncio.StreamReader()
+    stderr.feed_eof()
+    proc = SimpleNamespace(stdout=stdout, stderr=stderr, returncode=0, wait=AsyncMock(return_value=0))
+
+    writers = set()
+    real_open = gzip.open
+
+    def tracking_open(*args, **kwargs):
+        f = real_open(*args, **kwargs)
+        write = f.write
+        f.write = lambda data: writers.add(threading.get_ident()) or write(data)
+        return f
+
+    monkeypatch.chdir(tmp_path)
+    send = AsyncMock(return_value=1)
+    with patch.object(backup.settings, "AUTO_BACKUP_ENABLED", True), \
+         patch.object(backup.asyncio, "create_subprocess_exec", AsyncMock(return_value=proc)), \
+         patch.object(backup.gzip, "open", tracking_open), \
+         patch.object(backup, "send_to_all", send), \
+         patch.object(backup, "delivery", MagicMock()):
+        await backup.make_backup(MagicMock())
+
+    assert writers and threading.get_ident() not in writers
+    (path,) = (tmp_path / "data" / "backups").glob("*.sql.gz")
+    assert gzip.decompress(path.read_bytes()) == dump
+    send.assert_awaited_once()
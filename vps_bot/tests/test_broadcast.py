@@ -0,0 +1,208 @@
+"""
+Тесты для фоновых рассылок: пачки, checkpoint, продолжение.
+"""
+import pytest
+from contextlib import asynccontextmanager
+from unittest.mock import AsyncMock, MagicMock, patch
+from app.services import broadcast as bc
+
+
+class FakeRedis:
+    """Минимум команд, которые использует services/broadcast.py."""
+
+    def __init__(self):
+        self.kv: dict = {}
+
+    async def hset(self, key, field=None, value=None, mapping=None):
+        h = self.kv.setdefault(key, {})
+        if mapping:
+            h.update({k: str(v) for k, v in mapping.items()})
+        if field is not None:
+            h[field] = str(value)
+
+    async def hgetall(self, key):
+        return dict(self.kv.get(key, {}))
+
+    async def hincrby(self, key, field, amount):
+        h = self.kv.setdefault(key, {})
+        h[field] = str(int(h.get(field, 0)) + amount)
+
+    async def incr(self, key):
+        self.kv[key] = int(self.kv.get(key, 0)) + 1
+        return self.kv[key]
+
+    async def sadd(self, key, member):
+        self.kv.setdefault(key, set()).add(str(member))
+
+    async def srem(self, key, member):
+        self.kv.get(key, set()).discard(str(member))
+
+    async def smembers(self, key):
+        return set(self.kv.get(key, set()))
+
+    async def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.kv:
+            return None
+        self.kv[key] = value
+        return True
+
+    async def get(self, key):
+        return self.kv.get(key)
+
+    async def delete(self, key):
+        self.kv.pop(key, None)
+
+    async def expire(self, key, ttl):
+        pass
+
+    async def evalsha(self, sha, numkeys, key, owner):
+        assert sha == bc._RELEASE_SHA                # только compare-and-delete лока
+        if self.kv.get(key) == owner:
+            self.kv.pop(key)
+            return 1
+        return 0
+
+    def pipeline(self, transaction=True):
+        redis, calls = self, []
+
+        class Pipe:
+            def __getattr__(self, name):
+                return lambda *a, **kw: calls.append(getattr(redis, name)(*a, **kw))
+
+            async def execute(self):
+                return [await c for c in calls]
+
+        return Pipe()
+
+
+class FakeUserRepository:
+    users = [(i, 1000 + i) for i in range(1, 8)]
+
+    def __init__(self, session):
+        pass
+
+    async def count_active(self, segment=None):
+        return len(self.users)
+
+    async def get_recipients_after(self, after_id, limit, segment=None):
+        return [u for u in self.users if u[0] > after_id][:limit]
+
+
+@asynccontextmanager
+async def _session():
+    yield MagicMock()
+
+
+@pytest.fixture
+def env():
+    redis = FakeRedis()
+    sent: list[int] = []
+
+    async def send(bot, chat_id, method, priority=None):
+        if chat_id == 1003:
+            raise RuntimeError("blocked")
+        sent.append(chat_id)
+
+    delivery = MagicMock()
+    delivery.send = send
+    with patch.object(bc, "get_redis", AsyncMock(return_value=redis)), \
+         patch.object(bc, "AsyncSessionLocal", _session), \
+         patch.object(bc, "UserRepository", FakeUserRepository), \
+         patch.object(bc, "delivery", delivery), \
+         patch.object(bc, "_render_progress", AsyncMock()), \
+         patch.object(bc.settings, "BROADCAST_CHUNK", 3):
+        yield redis, sent
+
+
+@pytest.mark.asyncio
+async def test_broadcast_runs_in_chunks_and_finishes(env):
+    redis, sent = env
+    bid = await bc.start_broadcast(MagicMock(), "hi", 1, 2)
+    await bc._tasks[bid]
+
+    state = await bc.get_broadcast(bid)
+    assert state.status == bc.DONE
+    assert (state.sent, state.failed, state.cursor) == (6, 1, 7)
+    assert sorted(sent) == [1001, 1002, 1004, 1005, 1006, 1007]
+    assert await redis.smembers("broadcast:active") == set()
+
+
+@pytest.mark.asyncio
+async def test_broadcast_resumes_from_checkpoint(env):
+    redis, sent = env
+    await redis.hset("broadcast:5", mapping={
+        "status": bc.RUNNING, "text": "hi", "cursor": 4,
+        "sent": 3, "failed": 1, "total": 7, "chat_id": 1, "message_id": 2,
+    })
+    await redis.sadd("broadcast:active", 5)
+
+    await bc.resume_broadcasts(MagicMock())
+    await bc._tasks[5]
+
+    state = await bc.get_broadcast(5)
+    assert sorted(sent) == [1005, 1006, 1007]  # с курсора, без повторов
+    assert (state.status, state.sent, state.failed) == (bc.DONE, 6, 1)
+
+
+@pytest.mark.asyncio
+async def test_paused_broadcast_stops_at_chunk_boundary(env):
+    redis, sent = env
+    bid = await bc.start_broadcast(MagicMock(), "hi", 1, 2)
+    assert await bc.pause_broadcast(bid)
+    await bc._tasks[bid]
+
+    assert sent == []
+    assert (await bc.get_broadcast(bid)).status == bc.PAUSED
+    assert not await bc.pause_broadcast(bid)
+
+
+def test_media_broadcast_copies_source_message():
+    state = bc.BroadcastState.from_hash(1, {"from_chat_id": "42", "message_ids": "7"})
+    method = state.method_for(1001)
+    assert type(method).__name__ == "CopyMessage"
+    assert (method.from_chat_id, method.message_id) == (42, 7)
+
+    album = bc.BroadcastState.from_hash(1, {"from_chat_id": "42", "message_ids": "7,8,9"})
+    assert album.method_for(1001).message_ids == [7, 8, 9]
+
+    text = bc.BroadcastState.from_hash(1, {"text": "hi"})
+    assert text.method_for(1001).text == "📢 hi"
+
+
+def test_send_window_spreads_chunks_evenly():
+    state = bc.BroadcastState.from_hash(1, {
+        "total": "100", "sent": "20", "failed": "5", "started_at": "1000", "deadline": "1400",
+    })
+    # 25% отправлено → следующая пачка не раньше 25% окна
+    assert state.pace_delay(1050) == 50
+    assert state.pace_delay(1200) == 0
+
+    no_window = bc.BroadcastState.from_hash(1, {"total": "100"})
+    assert no_window.pace_delay(0) == 0
+
+
+@pytest.mark.asyncio
+async def test_lock_released_only_by_owner(env):
+    """Лок истёк и его взяла другая реплика — при завершении мы его не снимаем."""
+    redis, sent = env
+    bid = await bc.start_broadcast(MagicMock(), "hi", 1, 2)
+    await bc._tasks[bid]
+    assert bc._lock_key(bid) not in redis.kv                 # свой лок снят
+
+    async def steal(bot, broadcast_id):
+        redis.kv[bc._lock_key(broadcast_id)] = "other-replica"
+
+    with patch.object(bc, "_render_progress", steal):
+        bid = await bc.start_broadcast(MagicMock(), "hi", 1, 2)
+        await bc._tasks[bid]
+    assert redis.kv[bc._lock_key(bid)] == "other-replica"
+
+
+@pytest.mark.asyncio
+async def test_lock_release_error_is_not_fatal(env):
+    """Redis упал на снятии лока — задача всё равно убирается из _tasks."""
+    redis, sent = env
+    redis.evalsha = AsyncMock(side_effect=ConnectionError("redis down"))
+    bid = await bc.start_broadcast(MagicMock(), "hi", 1, 2)
+    await bc._tasks[bid]
+    assert bid not in bc._tasks
@@ -0,0 +1,153 @@
+"""
+Тесты для запланированных рассылок: расписание, повторы, запуск планировщиком.
+"""
+import asyncio
+import pytest
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+from app.services import broadcast_jobs as bj
+from app.services.broadcast_jobs import Schedule, next_run
+
+
+def test_schedule_roundtrip_and_toggle():
+    schedule = Schedule(start_in_hours=3, repeat_hours=24, window_minutes=120)
+    assert schedule.encode() == "in=3,every=24,window=120"
+    assert Schedule.decode(schedule.encode()) == schedule
+    assert Schedule.decode(None) == Schedule()
+
+    assert schedule.toggle("every").repeat_hours == 168
+    assert schedule.toggle("every").toggle("every").repeat_hours is None
+    assert schedule.toggle("window").window_minutes == 360
+    assert schedule.toggle("in").start_in_hours == 12
+
+
+def test_next_run_skips_missed_slots():
+    run_at = datetime(2025, 1, 1, 10, 0)
+    assert next_run(run_at, None, run_at) is None
+    assert next_run(run_at, 24, run_at) == run_at + timedelta(days=1)
+    # Бот лежал трое суток — следующий запуск в будущем, без догоняния
+    now = run_at + timedelta(days=3, hours=1)
+    assert next_run(run_at, 24, now) == run_at + timedelta(days=4)
+
+
+@pytest.mark.asyncio
+async def test_run_due_jobs_starts_and_reschedules():
+    now = datetime.utcnow()
+    once = SimpleNamespace(
+        id=1, created_by=10, body="hi", from_chat_id=None, message_ids="", segment="",
+        run_at=now - timedelta(minutes=1), repeat_hours=None, window_minutes=0,
+        is_active=True, last_broadcast_id=None,
+    )
+    daily = SimpleNamespace(
+        id=2, created_by=10, body="", from_chat_id=10, message_ids="5,6", segment="active",
+        run_at=now - timedelta(minutes=1), repeat_hours=24, window_minutes=30,
+        is_active=True, last_broadcast_id=None,
+    )
+    repo = MagicMock()
+    repo.lock_due = AsyncMock(return_value=[once, daily])
+    repo.set = AsyncMock()
+    events = []
+
+    @asynccontextmanager
+    async def uow():
+        yield MagicMock()
+        events.append("commit")
+
+    status = asyncio.get_running_loop().create_future()
+    status.set_result(SimpleNamespace(chat=SimpleNamespace(id=10), message_id=99))
+    ids = iter([7, 8])
+    start = AsyncMock(side_effect=lambda *a, **kw: events.append("start") or next(ids))
+    with patch.object(bj, "unit_of_work", uow), \
+         patch.object(bj, "AsyncSessionLocal", MagicMock()), \
+         patch.object(bj, "BroadcastJobRepository", MagicMock(return_value=repo)), \
+         patch.object(bj, "delivery", MagicMock(send_message=MagicMock(return_value=status))), \
+         patch.object(bj, "start_broadcast", start):
+        assert await bj.run_due_jobs(MagicMock()) == 2
+
+    # Следующий запуск закоммичен до старта рассылок
+    assert events == ["commit", "start", "start"]
+    assert not once.is_active
+    assert daily.is_active and daily.run_at > now
+    assert [c.kwargs["last_broadcast_id"] for c in repo.set.await_args_list] == [7, 8]
+    kwargs = start.await_args_list[1].kwargs
+    assert kwargs["copy_from"] == (10, [5, 6])
+    assert kwargs["window_seconds"] == 1800
+    assert kwargs["segment"].has_active_vps
+
+
+@pytest.mark.asyncio
+async def test_failed_start_retries_then_disables():
+    now = datetime.utcnow()
+    job = SimpleNamespace(
+        id=3, created_by=10, body="hi", from_chat_id=None, message_ids="", segment="",
+        run_at=now - timedelta(minutes=1), repeat_hours=None, window_minutes=0,
+        is_active=True, last_broadcast_id=None, failures=0,
+    )
+    repo = MagicMock()
+    repo.lock_due = AsyncMock(return_value=[job])
+    repo.set = AsyncMock()
+
+    @asynccontextmanager
+    async def uow():
+        yield MagicMock()
+
+    # Админ заблокировал бота — статус не доставлен, но рассылка всё равно стартует
+    blocked = asyncio.get_running_loop().create_future()
+    blocked.set_exception(RuntimeError("Forbidden: bot was blocked by the user"))
+    start = AsyncMock(side_effect=RuntimeError("redis down"))
+    with patch.object(bj, "unit_of_work", uow), \
+         patch.object(bj, "AsyncSessionLocal", MagicMock()), \
+         patch.object(bj, "BroadcastJobRepository", MagicMock(return_value=repo)), \
+         patch.object(bj, "delivery", MagicMock(send_message=MagicMock(return_value=blocked))), \
+         patch.object(bj, "start_broadcast", start):
+        assert await bj.run_due_jobs(MagicMock()) == 0
+        assert start.await_args.args[2:4] == (0, 0)
+        retry = repo.set.await_args.kwargs
+        assert retry["failures"] == 1 and retry["is_active"] and retry["retry_at"] > now
+        assert retry["run_at"] == job.run_at
+
+        job.failures = bj._MAX_FAILURES - 1
+        await bj.run_due_jobs(MagicMock())
+        assert repo.set.await_args.kwargs == {"failures": bj._MAX_FAILURES, "is_active": False}
+
+
+@pytest.mark.asyncio
+async def test_failed_start_keeps_recurring_cadence():
+    now = datetime.utcnow()
+    slot = now - timedelta(minutes=1)
+    job = SimpleNamespace(
+        id=4, created_by=10, body="hi", from_chat_id=None, message_ids="", segment="",
+        run_at=slot, retry_at=None, repeat_hours=24, window_minutes=0,
+        is_active=True, last_broadcast_id=None, failures=0,
+    )
+    repo = MagicMock()
+    repo.lock_due = AsyncMock(return_value=[job])
+
+    async def persist(job_id, **values):
+        for name, value in values.items():
+            setattr(job, name, value)
+    repo.set = AsyncMock(side_effect=persist)
+
+    @asynccontextmanager
+    async def uow():
+        yield MagicMock()
+
+    status = asyncio.get_running_loop().create_future()
+    status.set_result(SimpleNamespace(chat=SimpleNamespace(id=10), message_id=99))
+    start = AsyncMock(side_effect=[RuntimeError("redis down"), 7])
+    with patch.object(bj, "unit_of_work", uow), \
+         patch.object(bj, "AsyncSessionLocal", MagicMock()), \
+         patch.object(bj, "BroadcastJobRepository", MagicMock(return_value=repo)), \
+         patch.object(bj, "delivery", MagicMock(send_message=MagicMock(return_value=status))), \
+         patch.object(bj, "start_broadcast", start):
+        assert await bj.run_due_jobs(MagicMock()) == 0
+        # Повтор ждёт retry_at, а слот расписания остаётся прежним
+        assert job.run_at == slot and job.retry_at > now
+
+        assert await bj.run_due_jobs(MagicMock()) == 1
+
+    # Удачный повтор — следующий запуск по исходной сетке, а не от времени retry
+    assert job.run_at == slot + timedelta(days=1)
+    assert job.retry_at is None and job.failures == 0
@@ -0,0 +1,154 @@
+"""
+Тесты для DbSessionMiddleware (session-per-update) и unit_of_work.
+"""
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from app.middlewares.db import DbSessionMiddleware
+
+
+def _session(in_transaction: bool = True) -> AsyncMock:
+    session = AsyncMock()
+    session.__aenter__ = AsyncMock(return_value=session)
+    session.__aexit__ = AsyncMock(return_value=False)
+    session.in_transaction = MagicMock(return_value=in_transaction)
+    session.info = {}
+    return session
+
+
+@pytest.mark.asyncio
+async def test_one_session_and_single_commit():
+    session = _session()
+    seen = []
+
+    async def handler(event, data):
+        seen.append(data["session"])
+        return "ok"
+
+    with patch("app.middlewares.db.AsyncSessionLocal", return_value=session) as factory:
+        result = await DbSessionMiddleware()(handler, MagicMock(), {})
+
+    assert result == "ok"
+    assert seen == [session]
+    assert session.info == {}
+    factory.assert_called_once()
+    session.commit.assert_awaited_once()
+    session.rollback.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_rollback_on_error():
+    session = _session()
+
+    async def handler(event, data):
+        raise RuntimeError("boom")
+
+    with patch("app.middlewares.db.AsyncSessionLocal", return_value=session):
+        with pytest.raises(RuntimeError):
+            await DbSessionMiddleware()(handler, MagicMock(), {})
+
+    session.rollback.assert_awaited_once()
+    session.commit.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_no_commit_without_transaction():
+    """Апдейт без обращений к БД — ни commit, ни соединения из пула."""
+    session = _session(in_transaction=False)
+
+    with patch("app.middlewares.db.AsyncSessionLocal", return_value=session):
+        await DbSessionMiddleware()(AsyncMock(return_value=None), MagicMock(), {})
+
+    session.commit.assert_not_awaited()
+
+
+# ── unit_of_work ──────────────────────────────────────────────
+
+@pytest.mark.asyncio
+async def test_repositories_flush_inside_unit_of_work():
+    """Внутри unit_of_work репозитории только flush-ат, commit — один на выходе."""
+    from app.core.database import unit_of_work
+    from app.repositories.vps import VpsRepository
+
+    session = _session()
+    session.get = AsyncMock(return_value=MagicMock())
+
+    async with unit_of_work(session):
+        repo = VpsRepository(session)
+        await repo.mark_reminded(1, 3)
+        await repo.mark_deleted(1)
+        session.commit.assert_not_awaited()
+
+    assert session.flush.await_count == 2
+    session.commit.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_after_commit_callback_runs_only_on_success():
+    from app.core.database import after_commit, unit_of_work
+
+    calls = []
+
+    async def callback():
+        calls.append(1)
+
+    session = _session()
+    with pytest.raises(RuntimeError):
+        async with unit_of_work(session):
+            await after_commit(session, callback)
+            raise RuntimeError("boom")
+    assert calls == []
+
+    async with unit_of_work(session):
+        await after_commit(session, callback)
+    assert calls == [1]
+
+
+@pytest.mark.asyncio
+async def test_registration_committed_before_cache_and_n8n():
+    """Upsert SecurityMiddleware фиксируется сразу — до кеша, n8n и хендлера."""
+    from app.middlewares.security import SecurityMiddleware
+
+    session = _session()
+    order = []
+    session.commit = AsyncMock(side_effect=lambda: order.append("commit"))
+    db_user = MagicMock(is_banned=False)
+    user = MagicMock(id=42, is_bot=False, username="u", full_name="U")
+
+    async def handler(event, data):
+        order.append("handler")
+        raise RuntimeError("boom")
+
+    with patch("app.middlewares.security.UserRepository") as repo_cls, \
+         patch("app.middlewares.security.user_cache") as cache, \
+         patch("app.services.n8n.n8n_notify", AsyncMock(side_effect=lambda *a: order.append("n8n"))):
+        repo_cls.return_value.get_or_create = AsyncMock(return_value=(db_user, True))
+        cache.get.return_value = None
+        cache.put.side_effect = lambda *a: order.append("cache")
+        with pytest.raises(RuntimeError):
+            await SecurityMiddleware()(handler, MagicMock(), {"event_from_user": user, "session": session})
+
+    assert order == ["commit", "cache", "n8n", "handler"]
+
+
+@pytest.mark.asyncio
+async def test_payment_committed_around_invoice_http_call():
+    """Счёт в CryptoBot создаётся без открытой транзакции, платёж коммитится до показа ссылки."""
+    from app.handlers.payments import cryptobot
+
+    session = _session()
+    order = []
+    session.commit = AsyncMock(side_effect=lambda: order.append("commit"))
+    call = MagicMock(data="pay:crypto:start", from_user=MagicMock(id=1))
+    call.answer = AsyncMock()
+    call.message.edit_text = AsyncMock(side_effect=lambda *a, **kw: order.append("show"))
+    invoice = AsyncMock(side_effect=lambda *a: order.append("http") or {"invoice_id": "1", "pay_url": "u"})
+
+    with patch.object(cryptobot.settings, "CRYPTOBOT_ENABLED", True), \
+         patch.object(cryptobot, "TARIFFS", {"start": {"name": "S", "price_usdt": 5}}), \
+         patch("app.services.antifrod.run_pre_payment_checks", AsyncMock()), \
+         patch.object(cryptobot, "_create_invoice", invoice), \
+         patch.object(cryptobot, "PaymentRepository") as repo_cls:
+        repo_cls.return_value.create = AsyncMock(side_effect=lambda **kw: order.append("insert"))
+        await cryptobot.cb_pay_crypto(call, AsyncMock(), session)
+
+    assert order == ["commit", "http", "insert", "commit", "show"]
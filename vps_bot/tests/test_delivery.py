@@ -0,0 +1,68 @@
+"""
+Тесты для очереди исходящих сообщений.
+"""
+import asyncio
+import pytest
+from aiogram.exceptions import TelegramForbiddenError, TelegramRetryAfter
+from aiogram.methods import SendMessage
+from app.services.delivery import DeliveryService, Priority
+
+
+class FakeBot:
+    def __init__(self, errors=None):
+        self.sent: list[tuple[float, int, str]] = []
+        self.errors = list(errors or [])
+
+    async def __call__(self, method):
+        if self.errors:
+            raise self.errors.pop(0)
+        self.sent.append((asyncio.get_running_loop().time(), method.chat_id, method.text))
+        return True
+
+
+@pytest.mark.asyncio
+async def test_priority_order_and_per_chat_spacing():
+    svc = DeliveryService(global_rate=1000, chat_interval=0.05)
+    bot = FakeBot()
+
+    first = svc.send_message(bot, 1, "busy")
+    await first
+    futures = [
+        svc.send_message(bot, 2, "broadcast", priority=Priority.BROADCAST),
+        svc.send_message(bot, 3, "reminder", priority=Priority.REMINDER),
+        svc.send_message(bot, 1, "again"),  # чат 1 ещё «остывает»
+    ]
+    await asyncio.gather(*futures)
+    await svc.stop()
+
+    texts = [t for _, _, t in bot.sent]
+    assert texts[:3] == ["busy", "reminder", "broadcast"]
+    (t1, _, _), (t2, _, _) = [s for s in bot.sent if s[1] == 1]
+    assert t2 - t1 >= 0.05 * 0.9
+
+
+@pytest.mark.asyncio
+async def test_retry_after_is_honoured():
+    method = SendMessage(chat_id=1, text="x")
+    bot = FakeBot(errors=[TelegramRetryAfter(method=method, message="flood", retry_after=0.05)])
+    svc = DeliveryService(global_rate=1000, chat_interval=0.0)
+
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    assert await svc.send_message(bot, 1, "x") is True
+    await svc.stop()
+
+    assert len(bot.sent) == 1
+    assert bot.sent[0][0] - started >= 0.05 * 0.9
+
+
+@pytest.mark.asyncio
+async def test_permanent_error_is_returned_to_caller():
+    method = SendMessage(chat_id=1, text="x")
+    bot = FakeBot(errors=[TelegramForbiddenError(method=method, message="blocked")])
+    svc = DeliveryService(global_rate=1000, chat_interval=0.0)
+
+    with pytest.raises(TelegramForbiddenError):
+        await svc.send_message(bot, 1, "x")
+    await svc.stop()
+    assert bot.sent == []
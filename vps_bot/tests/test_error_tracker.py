@@ -0,0 +1,92 @@
+"""
+Тесты для агрегации ошибок: отпечатки, одно оповещение на окно, дайджест.
+"""
+import pytest
+from unittest.mock import AsyncMock, patch
+from app.services import error_tracker as et
+from app.services.error_tracker import ErrorTracker, fingerprint
+
+
+def _raise(exc_type, msg):
+    try:
+        raise exc_type(msg)
+    except Exception as e:
+        return e
+
+
+def test_fingerprint_ignores_message_but_not_type():
+    a = _raise(ValueError, "user 1")
+    b = _raise(ValueError, "user 2")
+    c = _raise(KeyError, "user 1")
+    assert fingerprint(a) == fingerprint(b)
+    assert fingerprint(a) != fingerprint(c)
+
+
+class FakeRedis:
+    def __init__(self):
+        self.alerts: set = set()
+
+    def pipeline(self, transaction=True):
+        redis, calls = self, []
+
+        class Pipe:
+            def __getattr__(self, name):
+                return lambda *a, **kw: calls.append((name, a, kw))
+
+            async def execute(self):
+                results = []
+                for name, a, kw in calls:
+                    if name == "set":
+                        fresh = a[0] not in redis.alerts
+                        redis.alerts.add(a[0])
+                        results.append(True if fresh else None)
+                    else:
+                        results.append(1)
+                return results
+
+        return Pipe()
+
+
+@pytest.mark.asyncio
+async def test_one_alert_per_fingerprint_window():
+    tracker = ErrorTracker(alert_window=600, max_tracked=10)
+    with patch.object(et, "get_redis", AsyncMock(return_value=FakeRedis())):
+        alerts = [(await tracker.record(_raise(ValueError, f"db down {i}")))[1] for i in range(50)]
+        _, other = await tracker.record(_raise(KeyError, "x"))
+
+    assert alerts.count(True) == 1 and alerts[0]
+    assert other
+
+    digest = tracker.take_digest()
+    assert [(s.type, s.pending) for s in digest] == [("ValueError", 50), ("KeyError", 1)]
+    assert tracker.take_digest() == []
+
+
+@pytest.mark.asyncio
+async def test_falls_back_to_memory_without_redis():
+    tracker = ErrorTracker(alert_window=600, max_tracked=1)
+    with patch.object(et, "get_redis", AsyncMock(side_effect=ConnectionError("down"))):
+        stat, first = await tracker.record(_raise(ValueError, "a"))
+        _, second = await tracker.record(_raise(ValueError, "b"))
+        await tracker.record(_raise(KeyError, "c"))
+        top = await tracker.top(10)
+
+    assert (first, second, stat.count) == (True, False, 2)
+    assert len(tracker) == 1  # вытеснен самый старый отпечаток
+    assert [s.type for s in top] == ["KeyError"]
+
+
+def test_error_detail_fits_telegram_limit():
+    """Traceback с «<module>»-кадрами после экранирования всё равно укладывается в 4096."""
+    from app.handlers.admin.errors import format_error_detail
+    from app.services.error_tracker import ErrorStat
+
+    frame = '  File "app/x.py", line 1, in <module>\n'
+    stat = ErrorStat(
+        fingerprint="abc", type="ValueError", message="<b>" * 100,
+        sample=frame * 200 + "ValueError: <boom>", count=3,
+    )
+    text = format_error_detail(stat)
+    assert len(text) <= 4096
+    assert text.endswith("ValueError: &lt;boom&gt;</pre>")     # хвост traceback сохранён
+    assert "&lt;b&gt;" in text
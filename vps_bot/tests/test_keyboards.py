@@ -0,0 +1,30 @@
+"""
+Тесты для скомпилированного каталога i18n и кеша клавиатур.
+"""
+from app.core.i18n import compile_catalog, t
+from app.utils.keyboards import adm_confirm_kb, main_menu_kb, tariffs_kb
+
+
+def test_catalog_falls_back_to_default_lang():
+    catalog = compile_catalog({
+        "hello": {"ru": "Привет, {name}", "en": "Hello, {name}"},
+        "only_ru": {"ru": "Только по-русски"},
+    })
+
+    assert catalog["en"]["hello"] == "Hello, {name}"
+    assert catalog["en"]["only_ru"] == "Только по-русски"
+    assert t("no_such_key", "en") == "[no_such_key]"
+    assert t("btn_tariffs", "xx") == t("btn_tariffs", "ru")
+
+
+def test_static_keyboards_are_built_once():
+    assert main_menu_kb("ru") is main_menu_kb("ru")
+    assert main_menu_kb("ru") is not main_menu_kb("en")
+    assert main_menu_kb("en").inline_keyboard[0][0].text == t("btn_tariffs", "en")
+    assert tariffs_kb() is tariffs_kb()
+
+
+def test_per_entity_keyboards_are_not_cached():
+    # Подтверждения строятся под конкретный VPS/пользователя — в LRU им не место
+    assert not hasattr(adm_confirm_kb, "cache_info")
+    assert adm_confirm_kb("adm:vps:delete:1", "adm:vps") is not adm_confirm_kb("adm:vps:delete:1", "adm:vps")
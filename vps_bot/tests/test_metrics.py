@@ -0,0 +1,59 @@
+"""
+Тесты для метрик латентности.
+"""
+import pytest
+from app.core.metrics import Histogram, Metrics
+
+
+def test_histogram_quantiles_within_bucket_error():
+    h = Histogram()
+    for ms in range(1, 1001):
+        h.record(float(ms))
+
+    assert h.count == 1000
+    assert h.quantile(0.5) == pytest.approx(500, rel=0.05)
+    assert h.quantile(0.99) == pytest.approx(990, rel=0.05)
+    assert h.quantile(1.0) == 1000
+
+
+def test_update_breakdown_collects_io():
+    m = Metrics()
+    with m.track_update("callback_query"):
+        m.observe_io("db", 5.0)
+        m.observe_io("db", 7.0)
+        m.observe_io("redis", 1.0)
+    m.observe_io("db", 100.0)  # вне апдейта — только в io.db
+
+    hists = {(k, n): h for k, n, h in m.snapshot()}
+    assert hists[("update", "db")].total == pytest.approx(12.0)
+    assert hists[("update", "redis")].total == pytest.approx(1.0)
+    assert hists[("update", "telegram")].total == 0
+    assert hists[("io", "db")].count == 3
+
+
+def test_prometheus_format():
+    m = Metrics()
+    m.observe("handler", "start.cmd_start", 12.0)
+    m.inc("render.skipped")
+
+    text = m.prometheus()
+    assert 'bot_latency_ms{kind="handler",name="start.cmd_start",quantile="0.95"}' in text
+    assert 'bot_latency_ms_count{kind="handler",name="start.cmd_start"} 1' in text
+    assert 'bot_events_total{name="render.skipped"} 1' in text
+
+
+def test_perf_text_fits_telegram_limit():
+    from unittest.mock import patch
+    from app.handlers.admin import perf
+
+    m = Metrics()
+    for i in range(300):
+        m.observe_io(f"proxmox./nodes/pve-{i}/lxc/status", 3.0)
+        m.inc(f"proxmox.error./nodes/pve-{i}/lxc/{i}/status/current", i)
+
+    with patch.object(perf, "metrics", m):
+        text = perf.format_perf_text()
+
+    assert len(text) <= 4096
+    assert "proxmox.error./nodes/pve-299/lxc/299/status/current: 299" in text
+    assert "ещё 285" in text
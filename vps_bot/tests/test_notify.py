@@ -0,0 +1,41 @@
+"""
+Тесты для уведомлений в канал: одиночные посты и дайджест при всплеске.
+"""
+import pytest
+from unittest.mock import MagicMock, patch
+from app.services import notify
+from app.services.notify import ChannelDigest
+
+
+@pytest.fixture
+def sent():
+    posts: list[str] = []
+    with patch.object(notify, "_send", lambda bot, text: posts.append(text)), \
+         patch.object(notify.settings, "NOTIFY_CHANNEL_ID", -100):
+        yield posts
+
+
+@pytest.mark.asyncio
+async def test_quiet_events_are_posted_one_by_one(sent):
+    with patch.object(notify, "channel_digest", ChannelDigest(threshold=3, window=60, delay=0)):
+        await notify.notify_vps_expired(MagicMock(), 1, "10.0.0.1", "basic")
+        await notify.notify_vps_expired(MagicMock(), 2, "10.0.0.2", "basic")
+    assert len(sent) == 2
+    assert "10.0.0.2" in sent[1]
+
+
+@pytest.mark.asyncio
+async def test_burst_is_coalesced_into_digest(sent):
+    digest = ChannelDigest(threshold=2, window=60, delay=0)
+    with patch.object(notify, "channel_digest", digest):
+        for i in range(200):
+            await notify.notify_vps_expired(MagicMock(), i, f"10.0.{i // 250}.{i % 250}", "basic")
+        await notify.notify_new_vps(MagicMock(), 1, "u", "basic", "10.1.0.1", 100, "RUB")
+        await notify.notify_new_vps(MagicMock(), 2, "v", "basic", "10.1.0.2", 2.5, "USDT")
+        await digest._task
+
+    assert len(sent) == 2 + 2  # два обычных поста, затем по дайджесту на тип
+    assert "Истекло и удалено VPS: 198" in sent[2]
+    assert "и ещё 168" in sent[2]
+    assert "Новых VPS: 2" in sent[3]
+    assert "100 RUB + 2.5 USDT" in sent[3]
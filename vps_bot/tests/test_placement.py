@@ -0,0 +1,58 @@
+"""
+Тесты для выбора ноды Proxmox: разбор /cluster/resources, spread / binpack.
+"""
+from app.services.placement import BINPACK, SPREAD, choose_node, parse_cluster_resources
+
+GB = 1024 ** 3
+TARIFF = {"ram": 2048, "disk": 40}
+
+RESOURCES = [
+    {"type": "node", "node": "pve1", "status": "online", "cpu": 0.10, "maxmem": 64 * GB, "mem": 16 * GB},
+    {"type": "node", "node": "pve2", "status": "online", "cpu": 0.20, "maxmem": 64 * GB, "mem": 48 * GB},
+    {"type": "node", "node": "pve3", "status": "offline", "cpu": 0, "maxmem": 64 * GB, "mem": 0},
+    {"type": "node", "node": "pve4", "status": "online", "cpu": 0.95, "maxmem": 64 * GB, "mem": 1 * GB},
+    {"type": "storage", "node": "pve1", "storage": "local-lvm", "maxdisk": 1000 * GB, "disk": 100 * GB},
+    {"type": "storage", "node": "pve2", "storage": "local-lvm", "maxdisk": 1000 * GB, "disk": 100 * GB},
+    {"type": "storage", "node": "pve4", "storage": "local-lvm", "maxdisk": 1000 * GB, "disk": 0},
+    {"type": "storage", "node": "pve1", "storage": "local", "maxdisk": 10 * GB, "disk": 0},
+    {"type": "lxc", "node": "pve1", "vmid": 100},
+]
+
+
+def test_parse_cluster_resources():
+    nodes = {n.name: n for n in parse_cluster_resources(RESOURCES, "local-lvm")}
+    assert set(nodes) == {"pve1", "pve2", "pve3", "pve4"}
+    assert nodes["pve1"].mem_free == 48 * GB
+    assert nodes["pve1"].disk_free == 900 * GB
+    assert nodes["pve3"].disk_total == 0 and not nodes["pve3"].online
+
+
+def test_spread_and_binpack_policies():
+    nodes = parse_cluster_resources(RESOURCES, "local-lvm")
+    kw = dict(max_cpu_load=0.85, mem_reserve_mb=1024)
+    # pve3 offline, pve4 перегружен по CPU
+    assert choose_node(nodes, TARIFF, SPREAD, **kw).name == "pve1"
+    assert choose_node(nodes, TARIFF, BINPACK, **kw).name == "pve2"
+    assert choose_node(nodes, TARIFF, SPREAD, allowed=["pve2"], **kw).name == "pve2"
+
+
+def test_no_node_fits():
+    nodes = parse_cluster_resources(RESOURCES, "local-lvm")
+    assert choose_node(nodes, {"ram": 64 * 1024, "disk": 10}, SPREAD) is None
+    assert choose_node(nodes, {"ram": 1024, "disk": 5000}, SPREAD) is None
+
+
+def test_settings_parse_comma_lists(monkeypatch):
+    """PROXMOX_NODES / PROXMOX_IP_POOL / ADMIN_IDS в .env — через запятую, как в примере."""
+    from app.core.config import Settings
+
+    monkeypatch.setenv("PROXMOX_NODES", "pve1, pve2")
+    monkeypatch.setenv("PROXMOX_IP_POOL", "5.9.1.10,5.9.1.11")
+    monkeypatch.setenv("ADMIN_IDS", "123456789")
+    s = Settings()
+    assert s.PROXMOX_NODES == ["pve1", "pve2"]
+    assert s.PROXMOX_IP_POOL == ["5.9.1.10", "5.9.1.11"]
+    assert s.ADMIN_IDS == [123456789]
+
+    monkeypatch.setenv("ADMIN_IDS", "1,2")
+    assert Settings().ADMIN_IDS == [1, 2]
@@ -46,6 +46,7 @@ async def test_proxmox_status_parses_response():
         mock_settings.PROXMOX_USER = "root@pam"
         mock_settings.PROXMOX_TOKEN_NAME = "bot"
         mock_settings.PROXMOX_TOKEN_VALUE = "test-token"
+        mock_settings.PROXMOX_NODE_STATUS_TTL = 10.0
 
         mock_resp = AsyncMock()
         mock_resp.status = 200
@@ -67,3 +68,228 @@ async def test_proxmox_status_parses_response():
         assert result["cpu_pct"] == pytest.approx(42.0, abs=0.1)
         assert result["mem_total_gb"] == 32
         assert result["mem_used_gb"] == 8
+
+
+def test_circuit_breaker_opens_and_probes():
+    """После N ошибок breaker открыт; через reset_after — один пробный запрос."""
+    from app.services.proxmox import CircuitBreaker
+
+    breaker = CircuitBreaker(failures=3, reset_after=0.0)
+    for _ in range(3):
+        assert breaker.allow()
+        breaker.failure()
+    assert breaker.is_open
+
+    assert breaker.allow()          # half-open: пробный запрос
+    assert not breaker.allow()      # второй — ждёт результата пробы
+    breaker.failure()
+    assert breaker.is_open
+
+    assert breaker.allow()
+    breaker.success()
+    assert not breaker.is_open and breaker.allow()
+
+
+@pytest.mark.asyncio
+async def test_proxmox_fails_fast_when_breaker_open():
+    """Таймауты открывают breaker, дальше — ProxmoxUnavailable без запроса."""
+    import asyncio
+    from app.services.proxmox import ProxmoxService, ProxmoxUnavailable, CircuitBreaker
+
+    svc = ProxmoxService()
+    svc.breaker = CircuitBreaker(failures=2, reset_after=60)
+    session = MagicMock(closed=False)
+    session.request = MagicMock(return_value=MagicMock(
+        __aenter__=AsyncMock(side_effect=asyncio.TimeoutError()),
+        __aexit__=AsyncMock(return_value=False),
+    ))
+    svc._session = session
+
+    for _ in range(2):
+        with pytest.raises(ProxmoxUnavailable):
+            await svc.status_lxc(101)
+    with pytest.raises(ProxmoxUnavailable, match="circuit open"):
+        await svc.status_lxc(101)
+    assert session.request.call_count == 2
+    assert svc._endpoint("GET", "/nodes/pve/lxc/101/status/current") == \
+        "GET /nodes/{node}/lxc/{id}/status/current"
+
+
+@pytest.mark.asyncio
+async def test_wait_task_polls_until_stopped():
+    """wait_task() опрашивает статус задачи, пока PVE не вернёт stopped."""
+    from app.services.proxmox import ProxmoxService
+
+    svc = ProxmoxService()
+    svc._req = AsyncMock(side_effect=[
+        {"status": "running"},
+        {"status": "running"},
+        {"status": "stopped", "exitstatus": "OK"},
+    ])
+    with patch("app.services.proxmox.asyncio.sleep", AsyncMock()) as sleep:
+        await svc.wait_task("UPID:pve:0001:vzcreate:101:root@pam:")
+
+    assert svc._req.await_count == 3
+    assert [c.args[0] for c in sleep.await_args_list] == [0.25, 0.375]
+    assert "UPID%3Apve" in svc._req.await_args.args[1]
+    assert svc._endpoint("GET", svc._req.await_args.args[1]) == "GET /nodes/{node}/tasks/{upid}/status"
+
+    svc._req = AsyncMock(return_value={"status": "stopped", "exitstatus": "command failed"})
+    with pytest.raises(RuntimeError, match="command failed"):
+        await svc.wait_task("UPID:x")
+
+
+@pytest.mark.asyncio
+async def test_wait_port_detects_open_port():
+    """wait_port() — True для слушающего порта, False по таймауту."""
+    import asyncio
+    from app.services.proxmox import wait_port
+
+    server = await asyncio.start_server(lambda r, w: w.close(), "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    async with server:
+        assert await wait_port("127.0.0.1", port, timeout=1)
+    assert not await wait_port("127.0.0.1", port, timeout=0.1)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_reads_share_one_request():
+    """Одновременные одинаковые GET склеиваются в один запрос, затем — кеш."""
+    import asyncio
+    from app.services.proxmox import ProxmoxService
+
+    svc = ProxmoxService()
+
+    async def slow_req(method, path, json=None):
+        await asyncio.sleep(0.01)
+        if path == "/cluster/nextid":
+            return "105"
+        return {"cpu": 0.5, "memory": {"used": 1024**3, "total": 4 * 1024**3}}
+
+    svc._req = AsyncMock(side_effect=slow_req)
+    results = await asyncio.gather(*(svc.node_status() for _ in range(5)))
+
+    assert svc._req.await_count == 1
+    assert all(r == results[0] for r in results)
+    assert not svc._inflight
+
+    await svc.node_status()                     # в пределах TTL — из кеша
+    assert svc._req.await_count == 1
+    await svc.next_vmid()                       # nextid мимо кеша всегда
+    await svc.next_vmid()
+    assert svc._req.await_count == 3
+
+
+@pytest.mark.asyncio
+async def test_read_cache_skips_errors_and_ttl_zero():
+    """Ошибка не кешируется; ttl=0 — только склейка, без кеша."""
+    from app.services.proxmox import ProxmoxService
+
+    svc = ProxmoxService()
+    svc._req = AsyncMock(side_effect=[RuntimeError("boom"), {"status": "running"}, {"status": "stopped"}])
+
+    with pytest.raises(RuntimeError):
+        await svc._get("/nodes/pve/lxc/101/status/current")
+    assert await svc._get("/nodes/pve/lxc/101/status/current") == {"status": "running"}
+    assert await svc._get("/nodes/pve/lxc/101/status/current") == {"status": "running"}
+
+    svc._req = AsyncMock(return_value={"status": "stopped"})
+    await svc._get("/cluster/resources?type=vm", ttl=0)
+    await svc._get("/cluster/resources?type=vm", ttl=0)
+    assert svc._req.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_write_invalidates_read_cache():
+    """После POST (reboot и т.п.) статус читается заново."""
+    from app.services.proxmox import ProxmoxService
+
+    svc = ProxmoxService()
+    resp = MagicMock(status=200)
+    resp.json = AsyncMock(return_value={"data": {"status": "running"}})
+    session = MagicMock(closed=False)
+    session.request = MagicMock(return_value=MagicMock(
+        __aenter__=AsyncMock(return_value=resp),
+        __aexit__=AsyncMock(return_value=False),
+    ))
+    svc._session = session
+
+    await svc._get("/nodes/pve/lxc/101/status/current")
+    await svc._get("/nodes/pve/lxc/101/status/current")
+    assert session.request.call_count == 1
+
+    await svc._req("POST", "/nodes/pve/lxc/101/status/reboot")
+    await svc._get("/nodes/pve/lxc/101/status/current")
+    assert session.request.call_count == 3
+
+    await svc.status_lxc(101, node="pve", fresh=True)        # «Обновить» — мимо кеша
+    assert session.request.call_count == 4
+
+
+@pytest.mark.asyncio
+async def test_lxc_hostname_none_when_missing():
+    from app.services.proxmox import ProxmoxService
+
+    svc = ProxmoxService()
+    svc._req = AsyncMock(return_value={"hostname": "vps-1-101"})
+    assert await svc.lxc_hostname(101) == "vps-1-101"
+    svc._req = AsyncMock(side_effect=RuntimeError(
+        "Proxmox GET /nodes/pve/lxc/101/config → 500: Configuration file 'nodes/pve/lxc/101.conf' does not exist"
+    ))
+    assert await svc.lxc_hostname(101) is None
+
+
+@pytest.mark.asyncio
+async def test_non_json_response_counts_as_failure():
+    """HTML вместо JSON — ProxmoxUnavailable и отказ в breaker, а не голый JSONDecodeError."""
+    import json
+    from app.services.proxmox import ProxmoxService, ProxmoxUnavailable, CircuitBreaker
+
+    svc = ProxmoxService()
+    svc.breaker = CircuitBreaker(failures=1, reset_after=60)
+    resp = MagicMock(status=502, content_type="text/html")
+    resp.json = AsyncMock(side_effect=json.JSONDecodeError("Expecting value", "<html>", 0))
+    session = MagicMock(closed=False)
+    session.request = MagicMock(return_value=MagicMock(
+        __aenter__=AsyncMock(return_value=resp),
+        __aexit__=AsyncMock(return_value=False),
+    ))
+    svc._session = session
+
+    with pytest.raises(ProxmoxUnavailable, match="invalid JSON"):
+        await svc.node_status()
+    with pytest.raises(ProxmoxUnavailable, match="circuit open"):
+        await svc.node_status()
+
+
+@pytest.mark.asyncio
+async def test_cancelled_probe_does_not_lock_breaker():
+    """Отменённая пробная попытка half-open не оставляет breaker закрытым навсегда."""
+    import asyncio
+    from app.services.proxmox import ProxmoxService, CircuitBreaker
+
+    svc = ProxmoxService()
+    svc.breaker = CircuitBreaker(failures=1, reset_after=0.0)
+    svc.breaker.failure()
+    assert svc.breaker.is_open
+
+    started = asyncio.Event()
+
+    async def hang(*args, **kwargs):
+        started.set()
+        await asyncio.sleep(3600)
+
+    session = MagicMock(closed=False)
+    session.request = MagicMock(return_value=MagicMock(
+        __aenter__=AsyncMock(side_effect=hang),
+        __aexit__=AsyncMock(return_value=False),
+    ))
+    svc._session = session
+
+    probe = asyncio.ensure_future(svc._req("GET", "/nodes/pve/status"))
+    await started.wait()
+    assert not svc.breaker.allow()          # проба в полёте — остальные ждут
+    probe.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await probe
+    assert svc.breaker.allow()              # следующий запрос снова пробует
@@ -0,0 +1,172 @@
+"""
+Тесты для Redis rate limiter (GCRA).
+"""
+import time
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from redis.exceptions import NoScriptError
+from app.services.rate_limiter import RateLimiter, LocalLimiter, Bucket
+
+
+def _limiter() -> RateLimiter:
+    return RateLimiter({"messages": Bucket(limit=30, window=60)})
+
+
+@pytest.mark.asyncio
+async def test_hit_is_single_evalsha():
+    """Проверка — один EVALSHA с ключом бакета и параметрами GCRA."""
+    mock_redis = AsyncMock()
+    mock_redis.script_load = AsyncMock(return_value="sha1")
+    mock_redis.evalsha = AsyncMock(return_value=[1, 0])
+
+    limiter = _limiter()
+    with patch("app.services.rate_limiter.get_redis", return_value=mock_redis):
+        await limiter.hit("messages", 1)
+        rl = await limiter.hit("messages", 1)
+
+    assert rl.allowed
+    mock_redis.script_load.assert_awaited_once()
+    mock_redis.evalsha.assert_awaited_with("sha1", 1, "rl:messages:1", 2000, 60000)
+
+
+@pytest.mark.asyncio
+async def test_denied_returns_retry_after_seconds():
+    mock_redis = AsyncMock()
+    mock_redis.script_load = AsyncMock(return_value="sha1")
+    mock_redis.evalsha = AsyncMock(return_value=[0, 1500])
+
+    with patch("app.services.rate_limiter.get_redis", return_value=mock_redis):
+        rl = await _limiter().hit("messages", 1)
+
+    assert not rl.allowed
+    assert rl.retry_after == 2
+
+
+@pytest.mark.asyncio
+async def test_reloads_script_after_redis_restart():
+    mock_redis = AsyncMock()
+    mock_redis.script_load = AsyncMock(side_effect=["sha1", "sha2"])
+    mock_redis.evalsha = AsyncMock(side_effect=[NoScriptError("NOSCRIPT"), [1, 0]])
+
+    with patch("app.services.rate_limiter.get_redis", return_value=mock_redis):
+        rl = await _limiter().hit("messages", 1)
+
+    assert rl.allowed
+    assert mock_redis.script_load.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_local_prefilter_sheds_flood_without_redis_call():
+    mock_redis = AsyncMock()
+    mock_redis.script_load = AsyncMock(return_value="sha1")
+    mock_redis.evalsha = AsyncMock(return_value=[1, 0])
+
+    limiter = RateLimiter({"messages": Bucket(limit=3, window=60)})
+    with patch("app.services.rate_limiter.get_redis", return_value=mock_redis):
+        results = [await limiter.hit("messages", 1) for _ in range(5)]
+
+    assert [r.allowed for r in results] == [True, True, True, False, False]
+    assert results[-1].retry_after > 0
+    assert mock_redis.evalsha.await_count == 3
+
+
+@pytest.mark.asyncio
+async def test_degraded_mode_when_redis_is_down():
+    limiter = RateLimiter({"messages": Bucket(limit=2, window=60)})
+    with patch("app.services.rate_limiter.get_redis", return_value=None):
+        results = [await limiter.hit("messages", 1) for _ in range(3)]
+
+    assert [r.allowed for r in results] == [True, True, False]
+    assert limiter.degraded
+
+
+def test_local_limiter_sweeps_idle_entries():
+    local = LocalLimiter({"messages": Bucket(limit=2, window=1)}, maxsize=10)
+    local.hit("messages", 1)
+    local.hit("messages", 2)
+    assert len(local) == 2
+    assert local.sweep(now=time.monotonic() + 5) == 2
+    assert len(local) == 0
+
+
+def test_local_limiter_is_bounded():
+    local = LocalLimiter({"messages": Bucket(limit=2, window=60)}, maxsize=3)
+    for uid in range(10):
+        local.hit("messages", uid)
+    assert len(local) == 3
+
+
+def _mock_pipeline(replies: list) -> MagicMock:
+    pipe = MagicMock()
+    pipe.execute = AsyncMock(return_value=replies)
+    pipe.__aenter__ = AsyncMock(return_value=pipe)
+    pipe.__aexit__ = AsyncMock(return_value=None)
+    return pipe
+
+
+@pytest.mark.asyncio
+async def test_hit_and_fetch_single_pipeline():
+    """Лимит + язык + автопродление — один pipeline, без отдельных GET."""
+    pipe = _mock_pipeline([[1, 0], "en", "1"])
+    mock_redis = MagicMock()
+    mock_redis.script_load = AsyncMock(return_value="sha1")
+    mock_redis.pipeline = MagicMock(return_value=pipe)
+
+    limiter = _limiter()
+    with patch("app.services.rate_limiter.get_redis", AsyncMock(return_value=mock_redis)):
+        rl, values = await limiter.hit_and_fetch("messages", 1, "lang:1", "autorenew:1")
+
+    assert rl.allowed
+    assert values == ["en", "1"]
+    pipe.evalsha.assert_called_once_with("sha1", 1, "rl:messages:1", 2000, 60000)
+    assert pipe.get.call_count == 2
+    pipe.execute.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_hit_and_fetch_without_redis_falls_back():
+    limiter = _limiter()
+    with patch("app.services.rate_limiter.get_redis", AsyncMock(return_value=None)):
+        rl, values = await limiter.hit_and_fetch("messages", 1, "lang:1", "autorenew:1")
+
+    assert rl.allowed
+    assert values == [None, None]
+    assert limiter.degraded
+
+
+@pytest.mark.asyncio
+async def test_dispatcher_survives_redis_outage():
+    """Redis лежит: апдейт проходит через настоящий Dispatcher (FSM + лимитер) до хендлера."""
+    from datetime import datetime
+    from aiogram import Bot, Dispatcher, Router
+    from aiogram.fsm.context import FSMContext
+    from aiogram.fsm.storage.redis import RedisStorage
+    from aiogram.types import Chat, Message, Update, User
+    from redis.asyncio import Redis
+    from app.core.fsm import FallbackStorage
+    from app.middlewares.context import UpdateContextMiddleware
+
+    dead_url = "redis://127.0.0.1:1/0"
+    storage = FallbackStorage(RedisStorage.from_url(dead_url))
+    dp = Dispatcher(storage=storage)
+    dp.update.outer_middleware(UpdateContextMiddleware())
+    router = Router()
+    seen = []
+
+    @router.message()
+    async def handler(message: Message, state: FSMContext, lang: str) -> None:
+        await state.set_state("waiting")
+        seen.append((await state.get_state(), lang))
+
+    dp.include_router(router)
+    update = Update(update_id=1, message=Message(
+        message_id=1, date=datetime.now(), text="hi",
+        chat=Chat(id=7, type="private"),
+        from_user=User(id=7, is_bot=False, first_name="u"),
+    ))
+    dead = Redis.from_url(dead_url, decode_responses=True)
+    with patch("app.services.rate_limiter.get_redis", AsyncMock(return_value=dead)):
+        await dp.feed_update(Bot("1:a"), update)
+
+    assert seen == [("waiting", "ru")]
+    assert storage.degraded
@@ -0,0 +1,66 @@
+"""
+Тесты для учёта недоступных чатов.
+"""
+import pytest
+from contextlib import asynccontextmanager
+from unittest.mock import AsyncMock, MagicMock, patch
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError
+from aiogram.methods import SendMessage
+from app.services.reachability import UnreachableTracker, is_unreachable_error
+
+_method = SendMessage(chat_id=1, text="x")
+
+
+def test_unreachable_errors_detected():
+    assert is_unreachable_error(TelegramForbiddenError(method=_method, message="bot was blocked by the user"))
+    assert is_unreachable_error(TelegramBadRequest(method=_method, message="Bad Request: chat not found"))
+    assert not is_unreachable_error(TelegramBadRequest(method=_method, message="message is too long"))
+    assert not is_unreachable_error(RuntimeError("boom"))
+
+
+@pytest.mark.asyncio
+async def test_marks_are_flushed_in_one_update():
+    repo = MagicMock()
+    repo.mark_unreachable = AsyncMock(return_value=2)
+
+    @asynccontextmanager
+    async def uow():
+        yield MagicMock()
+
+    tracker = UnreachableTracker(flush_size=100, flush_interval=60)
+    tracker.mark(1)
+    tracker.mark(2)
+    tracker.mark(2)
+    tracker.mark(-100123)  # канал — не пользователь
+
+    with patch("app.core.database.unit_of_work", uow), \
+         patch("app.repositories.user.UserRepository", return_value=repo):
+        assert await tracker.flush() == 2
+
+    repo.mark_unreachable.assert_awaited_once()
+    assert sorted(repo.mark_unreachable.await_args.args[0]) == [1, 2]
+    assert len(tracker) == 0
+    tracker._task.cancel()
+
+
+@pytest.mark.asyncio
+async def test_stop_cancels_timer_and_flushes_pending():
+    """Остановка бота: таймер отменён, накопленные id дописаны в БД."""
+    repo = MagicMock()
+    repo.mark_unreachable = AsyncMock(return_value=1)
+
+    @asynccontextmanager
+    async def uow():
+        yield MagicMock()
+
+    tracker = UnreachableTracker(flush_size=100, flush_interval=60)
+    tracker.mark(5)
+    timer = tracker._task
+
+    with patch("app.core.database.unit_of_work", uow), \
+         patch("app.repositories.user.UserRepository", return_value=repo):
+        await tracker.stop()
+
+    assert timer.cancelled()
+    repo.mark_unreachable.assert_awaited_once_with([5])
+    assert len(tracker) == 0
@@ -0,0 +1,67 @@
+"""
+Тесты для рендера без холостых edit_text.
+"""
+import pytest
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+from app.core.metrics import metrics
+from app.utils.keyboards import back_kb
+from app.utils.render import edit_or_skip
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def set(self, key, value, ex=None):
+        self.data[key] = value
+
+
+def _message(edit_ts: int):
+    msg = SimpleNamespace(
+        chat=SimpleNamespace(id=1),
+        message_id=10,
+        date=datetime.fromtimestamp(1000, timezone.utc),
+        edit_date=datetime.fromtimestamp(edit_ts, timezone.utc),
+    )
+    msg.edit_text = AsyncMock()
+    return msg
+
+
+@pytest.mark.asyncio
+async def test_identical_render_is_skipped():
+    redis = FakeRedis()
+    metrics.reset()
+    first = _message(2000)
+    first.edit_text.return_value = _message(2001)
+
+    with patch("app.utils.render.get_redis", AsyncMock(return_value=redis)), \
+         patch("app.utils.render.Message", SimpleNamespace):
+        assert await edit_or_skip(first, "menu", reply_markup=back_kb()) is True
+        # Тот же экран, сообщение с тех пор не правили — вызова API нет
+        again = _message(2001)
+        assert await edit_or_skip(again, "menu", reply_markup=back_kb()) is False
+        again.edit_text.assert_not_awaited()
+        # Другая клавиатура — редактируем
+        assert await edit_or_skip(again, "menu", reply_markup=back_kb("adm:home")) is True
+
+    assert metrics.counters["render.skipped"] == 1
+
+
+@pytest.mark.asyncio
+async def test_render_not_skipped_after_foreign_edit():
+    """Сообщение правили в обход рендера (edit_date другой) — редактируем."""
+    redis = FakeRedis()
+    first = _message(2000)
+    first.edit_text.return_value = _message(2001)
+
+    with patch("app.utils.render.get_redis", AsyncMock(return_value=redis)), \
+         patch("app.utils.render.Message", SimpleNamespace):
+        await edit_or_skip(first, "menu")
+        foreign = _message(2005)
+        assert await edit_or_skip(foreign, "menu") is True
+        foreign.edit_text.assert_awaited_once()
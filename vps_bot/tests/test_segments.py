@@ -0,0 +1,61 @@
+"""
+Тесты для сегментов рассылок.
+"""
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.dialects import postgresql
+from app.models import User
+from app.services.segments import Segment
+
+
+def test_segment_roundtrip_and_toggle():
+    seg = Segment(has_active_vps=True, expiring_days=7, lang="en", min_balance_rub=100)
+    assert Segment.decode(seg.encode()) == seg
+    assert Segment.decode("") == Segment()
+
+    assert Segment().toggle("exp").expiring_days == 3
+    assert seg.toggle("exp").expiring_days == 14
+    assert seg.toggle("lang").lang is None  # en → выкл
+    assert seg.toggle("active").has_active_vps is False
+
+
+def test_segment_compiles_to_single_query():
+    seg = Segment(has_active_vps=True, never_paid=True, paid_crypto=True, lang="ru", min_balance_rub=0)
+    stmt = select(func.count(User.id)).where(*seg.conditions())
+    sql = str(stmt.compile(dialect=postgresql.dialect()))
+
+    assert sql.count("EXISTS") == 4
+    assert "NOT (EXISTS" in sql
+    assert "users.language IS NULL" in sql  # ru — язык по умолчанию
+    assert "user_balances.balance_rub >" in sql
+
+
+@pytest.mark.asyncio
+async def test_language_backfill_from_redis():
+    """Язык, выбранный до колонки users.language, переносится из Redis (только в NULL)."""
+    from contextlib import asynccontextmanager
+    from unittest.mock import AsyncMock, MagicMock, patch
+    from app.core.startup import _backfill_languages
+
+    async def scan_iter(**kwargs):
+        for key in ("lang:1", "lang:2", "lang:bad", "lang:3"):
+            yield key
+
+    redis = MagicMock(scan_iter=scan_iter, mget=AsyncMock(return_value=["en", "ru", "en", "xx"]))
+    session = MagicMock(execute=AsyncMock(return_value=MagicMock(rowcount=1)))
+
+    @asynccontextmanager
+    async def uow():
+        yield session
+
+    with patch("app.core.redis.get_redis", AsyncMock(return_value=redis)), \
+         patch("app.core.database.unit_of_work", uow):
+        await _backfill_languages()
+
+    sqls = {
+        str(c.args[0].compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+        for c in session.execute.await_args_list
+    }
+    assert len(sqls) == 2
+    assert any("language='en'" in s and "IN (1)" in s and "language IS NULL" in s for s in sqls)
+    assert any("language='ru'" in s and "IN (2)" in s for s in sqls)
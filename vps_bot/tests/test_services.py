@@ -103,3 +103,74 @@ async def test_stats_format_contains_sections():
     assert "IP пул" in text
     assert "100" in text   # total users
     assert "42" in text    # active VPS
+
+
+@pytest.mark.asyncio
+async def test_discard_container_releases_ip_only_when_gone():
+    """После сбоя создания IP возвращается в пул, только если контейнера нет."""
+    from app.services.vps_provision import _discard_container
+
+    with patch("app.services.vps_provision.proxmox_service") as px:
+        px.lxc_hostname = AsyncMock(return_value="vps-1-101")
+        px.delete_lxc = AsyncMock()
+        assert await _discard_container(101, "pve", "vps-1-101") is None
+        px.delete_lxc.assert_awaited_once_with(101, node="pve")
+
+        px.delete_lxc = AsyncMock(side_effect=RuntimeError("CT is locked (create)"))
+        reason = await _discard_container(101, "pve", "vps-1-101")
+        assert "101" in reason and "locked" in reason
+
+        px.delete_lxc = AsyncMock()
+        px.lxc_hostname = AsyncMock(return_value="vps-2-101")   # vmid чужой — не трогаем
+        assert await _discard_container(101, "pve", "vps-1-101") is None
+        px.lxc_hostname = AsyncMock(return_value=None)
+        assert await _discard_container(101, "pve", "vps-1-101") is None
+        px.delete_lxc.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_provision_keeps_vps_when_credentials_not_delivered():
+    """VPS закоммичен, а сообщение с доступами не дошло — контейнер и IP не трогаем."""
+    from app.services import vps_provision as vp
+
+    session = AsyncMock()
+    session.__aenter__ = AsyncMock(return_value=session)
+    session.__aexit__ = AsyncMock(return_value=False)
+    session.in_transaction = MagicMock(return_value=True)
+    session.info = {}
+    vps_repo = MagicMock()
+    vps_repo.acquire_ip = AsyncMock(return_value="5.9.1.10")
+    vps_repo.create = AsyncMock(return_value=MagicMock(id=7))
+    vps_repo.release_ip = AsyncMock()
+    pay_repo = MagicMock()
+    pay_repo.get_by_external_id = AsyncMock(return_value=None)
+    px = MagicMock()
+    px.place = AsyncMock(return_value="pve")
+    px.next_vmid = AsyncMock(return_value=101)
+    px.create_lxc = AsyncMock(return_value=True)
+    px.delete_lxc = AsyncMock()
+    px.lxc_hostname = AsyncMock(return_value="vps-1-101")
+    delivery = MagicMock()
+    delivery.send_message = AsyncMock(side_effect=RuntimeError("Forbidden: bot was blocked by the user"))
+    notify_error = AsyncMock()
+
+    with patch.object(vp, "check_duplicate_payment", AsyncMock()), \
+         patch.object(vp, "AsyncSessionLocal", MagicMock(return_value=session)), \
+         patch.object(vp, "VpsRepository", MagicMock(return_value=vps_repo)), \
+         patch.object(vp, "PaymentRepository", MagicMock(return_value=pay_repo)), \
+         patch.object(vp, "proxmox_service", px), \
+         patch.object(vp, "n8n_notify", AsyncMock()), \
+         patch.object(vp, "notify_new_vps", AsyncMock()), \
+         patch.object(vp, "delivery", delivery), \
+         patch.object(vp.settings, "REFERRAL_ENABLED", False), \
+         patch("app.repositories.user.UserRepository") as user_repo, \
+         patch("app.services.notify.notify_error", notify_error):
+        user_repo.return_value.get_by_telegram_id = AsyncMock(return_value=None)
+        await vp.provision_vps(MagicMock(), 1, next(iter(vp.TARIFFS)), "inv-1")
+
+    vps_repo.create.assert_awaited_once()
+    px.delete_lxc.assert_not_awaited()
+    px.lxc_hostname.assert_not_awaited()
+    vps_repo.release_ip.assert_not_awaited()
+    assert delivery.send_message.await_count == 1        # без «ошибка создания» пользователю
+    notify_error.assert_awaited_once()
@@ -0,0 +1,53 @@
+"""
+Тесты для in-process кеша пользователей.
+"""
+import pytest
+from unittest.mock import AsyncMock, patch
+from app.services.user_cache import UserCache
+
+
+def test_cache_hit_returns_ban_flag():
+    cache = UserCache(maxsize=10, ttl=60)
+    cache.put(1, "alice", "Alice", True)
+    assert cache.get(1, "alice", "Alice") is True
+
+
+def test_cache_miss_on_profile_change():
+    """Смена username — промах, middleware должен обновить профиль в БД."""
+    cache = UserCache(maxsize=10, ttl=60)
+    cache.put(1, "alice", "Alice", False)
+    assert cache.get(1, "alice_new", "Alice") is None
+
+
+def test_cache_expires_by_ttl():
+    cache = UserCache(maxsize=10, ttl=60)
+    with patch("app.services.user_cache.time.monotonic", return_value=1000.0):
+        cache.put(1, "alice", "Alice", False)
+    with patch("app.services.user_cache.time.monotonic", return_value=1061.0):
+        assert cache.get(1, "alice", "Alice") is None
+    assert len(cache) == 0
+
+
+def test_cache_evicts_least_recently_used():
+    cache = UserCache(maxsize=2, ttl=60)
+    cache.put(1, None, None, False)
+    cache.put(2, None, None, False)
+    cache.get(1, None, None)          # 1 становится самым свежим
+    cache.put(3, None, None, False)   # вытесняется 2
+    assert cache.get(2, None, None) is None
+    assert cache.get(1, None, None) is False
+    assert cache.get(3, None, None) is False
+
+
+@pytest.mark.asyncio
+async def test_publish_invalidation_drops_local_entry():
+    from app.services.user_cache import user_cache, publish_invalidation, USER_CACHE_CHANNEL
+
+    mock_redis = AsyncMock()
+    user_cache.put(42, "bob", "Bob", False)
+
+    with patch("app.services.user_cache.get_redis", return_value=mock_redis):
+        await publish_invalidation(42)
+
+    assert user_cache.get(42, "bob", "Bob") is None
+    mock_redis.publish.assert_awaited_once_with(USER_CACHE_CHANNEL, "42")
@@ -0,0 +1,41 @@
+"""
+Тесты для склейки уведомлений: одно сообщение на пользователя за прогон.
+"""
+from datetime import datetime
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+from app.core.scheduler import _render_deleted, _render_expiring
+from app.services import user_notices
+from app.services.autorenew import _render_renewed
+from app.services.user_notices import UserNotices
+
+
+def test_one_message_per_recipient():
+    delivery = MagicMock()
+    notices = UserNotices()
+    for telegram_id, ip in [(1, "a"), (2, "b"), (1, "c"), (1, "d")]:
+        notices.add(telegram_id, ip)
+
+    with patch.object(user_notices, "delivery", delivery):
+        sent = notices.send(MagicMock(), lambda ips: ",".join(ips), wait=False)
+
+    assert [(tid, items) for tid, items, _ in sent] == [(1, ["a", "c", "d"]), (2, ["b"])]
+    texts = [c.args[2] for c in delivery.send_message.call_args_list]
+    assert texts == ["a,c,d", "b"]
+    assert len(notices) == 0
+
+
+def test_renderers_list_all_servers():
+    exp = datetime(2025, 3, 1)
+    rows = [SimpleNamespace(ip=f"10.0.0.{i}", tariff="basic", expires_at=exp) for i in (1, 2, 3)]
+    text = _render_expiring(3, rows)
+    assert "3 твоих VPS истекают через 3 дня" in text
+    assert all(r.ip in text for r in rows)
+    assert "Твой VPS истекает через 1 день" in _render_expiring(1, rows[:1])
+
+    assert "Серверы удалены (2)" in _render_deleted(["a", "b"])
+    assert "Сервер удалён" in _render_deleted(["a"])
+
+    renewed = _render_renewed([("a", 100.0, exp, 50.0), ("b", 100.0, exp, 0.0)])
+    assert "Списано с баланса: <b>200 ₽</b>" in renewed
+    assert "Остаток баланса: <b>0.00 ₽</b>" in renewed
@@ -0,0 +1,67 @@
+"""
+Тесты для UserRepository.get_or_create (upsert в один запрос).
+"""
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from sqlalchemy.dialects import postgresql
+from app.repositories.user import UserRepository, UserState
+
+
+def _session(first, one=None) -> AsyncMock:
+    session = AsyncMock()
+    session.info = {}
+    result = MagicMock()
+    result.first.return_value = first
+    result.one.return_value = one
+    session.execute = AsyncMock(return_value=result)
+    return session
+
+
+@pytest.mark.asyncio
+async def test_upsert_is_single_statement():
+    row = MagicMock(id=7, is_banned=False, is_new=True, written=True)
+    session = _session(row)
+
+    state, is_new = await UserRepository(session).get_or_create(1, "bob", "Bob")
+
+    assert state == UserState(7, False)
+    assert is_new
+    session.execute.assert_awaited_once()
+    session.commit.assert_awaited_once()
+
+    sql = str(session.execute.await_args.args[0].compile(dialect=postgresql.dialect()))
+    assert "ON CONFLICT (telegram_id) DO UPDATE" in sql
+    assert "IS DISTINCT FROM" in sql
+    assert "xmax = 0" in sql
+    # Пишет боту снова — флаг недоступности снимается тем же upsert
+    assert "unreachable_since IS NOT NULL" in sql
+
+
+@pytest.mark.asyncio
+async def test_unchanged_profile_does_not_commit():
+    row = MagicMock(id=7, is_banned=True, is_new=False, written=False)
+    session = _session(row)
+
+    state, is_new = await UserRepository(session).get_or_create(1, "bob", "Bob")
+
+    assert state.is_banned
+    assert not is_new
+    session.commit.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_reminders_skip_unreachable_chats():
+    """Напоминания не уходят в недоступные чаты — иначе повтор каждые 6 ч."""
+    from app.repositories.vps import VpsRepository
+
+    session = _session(None)
+    await VpsRepository(session).get_expiring(3)
+    sql = str(session.execute.await_args.args[0].compile(dialect=postgresql.dialect()))
+    assert "JOIN users ON users.telegram_id = vps.telegram_id" in sql
+    assert "users.unreachable_since IS NULL" in sql
+
+    session = _session(None)
+    session.execute.return_value.scalars.return_value.all.return_value = [5]
+    assert await UserRepository(session).get_unreachable([5, 6]) == {5}
+    assert await UserRepository(session).get_unreachable([]) == set()
+    session.execute.assert_awaited_once()
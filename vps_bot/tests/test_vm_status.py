@@ -0,0 +1,48 @@
+"""
+Тесты для снимка статусов контейнеров: разбор, свежесть, прямой запрос.
+"""
+import pytest
+import time
+from unittest.mock import AsyncMock, patch
+from app.services.vm_status import VmSnapshot
+
+MB = 1024 ** 2
+RESOURCES = [
+    {"type": "lxc", "vmid": 101, "node": "pve1", "status": "running",
+     "cpu": 0.125, "mem": 256 * MB, "maxmem": 1024 * MB, "uptime": 7200},
+    {"type": "lxc", "vmid": 102, "node": "pve2", "status": "stopped",
+     "cpu": 0, "mem": 0, "maxmem": 2048 * MB, "uptime": 0},
+]
+
+
+@pytest.mark.asyncio
+async def test_snapshot_serves_status_without_per_vm_calls():
+    snap = VmSnapshot(interval=5, max_age=30)
+    with patch("app.services.proxmox.proxmox_service.cluster_vms", AsyncMock(return_value=RESOURCES)), \
+         patch("app.services.proxmox.proxmox_service.status_lxc", AsyncMock()) as status_lxc:
+        assert await snap.refresh() == 2
+        st = await snap.status(101)
+        assert (st.running, st.node, st.cpu_pct, st.mem_used_mb) == (True, "pve1", 12.5, 256)
+        assert not (await snap.status(102)).running
+    status_lxc.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_stale_or_forced_status_goes_to_node():
+    snap = VmSnapshot(interval=5, max_age=30)
+    direct = AsyncMock(return_value={
+        "running": False, "status": "stopped", "cpu_pct": 0, "mem_used_mb": 0,
+        "mem_total_mb": 1024, "uptime_sec": 0,
+    })
+    with patch("app.services.proxmox.proxmox_service.cluster_vms", AsyncMock(return_value=RESOURCES)), \
+         patch("app.services.proxmox.proxmox_service.status_lxc", direct):
+        await snap.refresh()
+        st = await snap.status(101, node="pve1", fresh=True)   # «🔄 Обновить»
+        assert st.status == "stopped"
+        assert snap.get(101).status == "stopped"              # результат лёг в снимок
+        assert direct.await_args.kwargs["fresh"] is True      # и мимо кеша чтений Proxmox
+
+        with patch("app.services.vm_status.time.monotonic", return_value=time.monotonic() + 60):
+            assert snap.get(102) is None                      # устарел
+            await snap.status(102, node="pve2")
+    assert direct.await_count == 2